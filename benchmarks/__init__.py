@@ -0,0 +1,8 @@
+from . import generate
+from . import run
+
+
+__all__ = [
+    "generate",
+    "run",
+]
@@ -0,0 +1,5 @@
+from .run import main
+
+
+if __name__ == "__main__":
+    main()
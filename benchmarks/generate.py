@@ -0,0 +1,193 @@
+import hashlib
+import json
+import random
+from base64 import b64encode
+
+
+# Generated files are the same on every run
+SEED = 0
+
+
+def get_packages(count: int) -> list[tuple[str, str]]:
+    """Generate names and versions of packages.
+
+    Args:
+        count: number of packages
+
+    Returns:
+        list[tuple[str, str]]: names and x.y.z versions of packages
+
+    """
+    rng = random.Random(SEED)
+    return [
+        (
+            f"package-{i}",
+            f"{rng.randrange(10)}.{rng.randrange(30)}.{rng.randrange(30)}",
+        )
+        for i in range(count)
+    ]
+
+
+def get_hash(name: str, version: str, n: int) -> str:
+    """Generate a hash of a distribution of a package.
+
+    Args:
+        name: name of the package
+        version: version of the package
+        n: index of the distribution
+
+    Returns:
+        str: a SHA256 hash, as pip-compile writes it
+
+    """
+    digest = hashlib.sha256(f"{name}-{version}-{n}".encode()).hexdigest()
+    return f"sha256:{digest}"
+
+
+def generate_poetry_lock(count: int, hashes: int = 4) -> str:
+    """Generate a poetry.lock.
+
+    Args:
+        count: number of packages
+        hashes: optional; number of distributions of each package
+
+    Returns:
+        str: contents of the poetry.lock
+
+    """
+    blocks = []
+    for name, version in get_packages(count):
+        files = ",\n".join(
+            f'    {{file = "{name}-{version}-{n}.whl", '
+            f'hash = "{get_hash(name, version, n)}"}}'
+            for n in range(hashes)
+        )
+        blocks.append(
+            "[[package]]\n"
+            f'name = "{name}"\n'
+            f'version = "{version}"\n'
+            f'description = "Package {name}"\n'
+            "optional = false\n"
+            'python-versions = ">=3.8"\n'
+            f"files = [\n{files},\n]\n\n"
+            "[package.dependencies]\n"
+            'requests = ">=2.0"\n'
+        )
+    blocks.append(
+        "[metadata]\n"
+        'lock-version = "2.0"\n'
+        'python-versions = "^3.11"\n'
+        f'content-hash = "{get_hash("metadata", "0", 0)}"\n'
+    )
+
+    return "\n".join(blocks)
+
+
+def generate_requirements_txt(count: int, hashes: int = 4) -> str:
+    """Generate a hash-pinned requirements.txt, as from pip-compile.
+
+    Args:
+        count: number of packages
+        hashes: optional; number of hashes of each package
+
+    Returns:
+        str: contents of the requirements.txt
+
+    """
+    lines = [
+        "#",
+        "# This file is autogenerated by pip-compile with Python 3.11",
+        "#",
+    ]
+    for name, version in get_packages(count):
+        lines.append(f"{name}=={version} \\")
+        lines.extend(
+            f"    --hash={get_hash(name, version, n)}"
+            + (" \\" if n < hashes - 1 else "")
+            for n in range(hashes)
+        )
+        lines.append("    # via -r requirements.in")
+
+    return "\n".join(lines) + "\n"
+
+
+def generate_response(contents: str) -> str:
+    """Generate a response of the Gitea API with the contents of a file.
+
+    Args:
+        contents: contents of the file
+
+    Returns:
+        str: the response, with the contents in Base64
+
+    """
+    return json.dumps(
+        {
+            "name": "poetry.lock",
+            "path": "poetry.lock",
+            "type": "file",
+            "size": len(contents),
+            "encoding": "base64",
+            "content": b64encode(contents.encode()).decode(),
+        }
+    )
+
+
+def generate_search_page(count: int) -> bytes:
+    """Generate a page of `repos/search`, as sent by the Gitea API.
+
+    Args:
+        count: number of repositories
+
+    Returns:
+        bytes: the page, in JSON
+
+    """
+    repos = [
+        {
+            "id": i,
+            "owner": {"id": 1, "login": "user", "full_name": "User"},
+            "name": name,
+            "full_name": f"user/{name}",
+            "description": f"Repository {name}",
+            "empty": False,
+            "private": bool(i % 2),
+            "fork": False,
+            "template": False,
+            "mirror": False,
+            "size": 1024 + i,
+            "language": "Python",
+            "html_url": f"https://gitea.example.com/user/{name}",
+            "default_branch": "main",
+            "archived": False,
+            "created_at": "2024-01-01T00:00:00Z",
+            "updated_at": "2024-05-20T12:00:00Z",
+            "permissions": {"admin": True, "push": True, "pull": True},
+            "topics": ["python", version],
+        }
+        for i, (name, version) in enumerate(get_packages(count))
+    ]
+    return json.dumps({"ok": True, "data": repos}).encode()
+
+
+def generate_versions(count: int) -> list[str]:
+    """Generate versions, some with letter suffixes.
+
+    Args:
+        count: number of versions
+
+    Returns:
+        list[str]: x.y.z versions
+
+    """
+    rng = random.Random(SEED)
+    versions = []
+    for _ in range(count):
+        version = (
+            f"{rng.randrange(10)}.{rng.randrange(30)}.{rng.randrange(30)}"
+        )
+        if rng.random() < 0.1:
+            version += rng.choice("abc")
+        versions.append(version)
+
+    return versions
@@ -0,0 +1,222 @@
+import argparse
+import json
+import sys
+import timeit
+from collections.abc import Callable
+from pathlib import Path
+
+from gitea_api_tools.gitea import api
+from gitea_api_tools.package import python
+from gitea_api_tools.package.version import Version
+
+from . import generate
+
+
+Benchmark = Callable[[], object]
+# Seconds per call of each benchmark
+Timings = dict[str, float]
+
+BASELINES = Path(__file__).parent / "baselines.json"
+# Number of packages or versions in generated inputs
+SIZE = 2000
+# A benchmark fails if it's this many times slower than its baseline
+THRESHOLD = 1.5
+# Each benchmark is timed this many times, keeping the fastest
+REPEAT = 5
+
+
+def get_benchmarks(size: int) -> dict[str, Benchmark]:
+    """Generate inputs and get the benchmarks using them.
+
+    Args:
+        size: number of packages or versions in generated inputs
+
+    Returns:
+        dict[str, Benchmark]: benchmarks by name
+
+    """
+    poetry_lock = generate.generate_poetry_lock(size)
+    requirements_txt = generate.generate_requirements_txt(size)
+    response = generate.generate_response(poetry_lock)
+    search_page = generate.generate_search_page(size)
+    ver_strs = generate.generate_versions(size)
+    versions = [Version(ver_str) for ver_str in ver_strs]
+    # Versions with different numbers of components can't be compared
+    pairs = [
+        (this, that)
+        for this, that in zip(versions, versions[1:])
+        if len(this.parts) == len(that.parts)
+    ]
+
+    def init_versions() -> None:
+        for ver_str in ver_strs:
+            Version(ver_str)
+
+    def compare_versions() -> None:
+        for this, that in pairs:
+            this < that
+            this == that
+
+    return {
+        "process_poetry_lock": lambda: python.process_poetry_lock(poetry_lock),
+        "process_requirements_txt": lambda: python.process_requirements_txt(
+            requirements_txt
+        ),
+        "api.decode": lambda: api.decode(response),
+        "api.load_json (search page)": lambda: api.load_json(search_page),
+        "Version.__init__": init_versions,
+        "Version comparisons": compare_versions,
+    }
+
+
+def time_benchmark(benchmark: Benchmark, repeat: int = REPEAT) -> float:
+    """Time a benchmark.
+
+    Args:
+        benchmark: the benchmark
+        repeat: optional; number of times to time the benchmark
+
+    Returns:
+        float: seconds per call, in the fastest of the repeats
+
+    """
+    timer = timeit.Timer(benchmark)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def read_baselines(file: Path, size: int) -> Timings:
+    """Read baselines stored with the same size of inputs.
+
+    Args:
+        file: path to the baselines
+        size: number of packages or versions in generated inputs
+
+    Returns:
+        Timings: the baselines
+
+    Raises:
+        ValueError: the baselines were stored with a different size
+
+    """
+    with file.open() as f:
+        baselines = json.load(f)
+
+    if baselines["size"] != size:
+        raise ValueError(
+            f"Baselines were stored with size {baselines['size']}, not {size}"
+        )
+
+    return baselines["timings"]
+
+
+def write_baselines(timings: Timings, file: Path, size: int) -> None:
+    """Store timings as baselines.
+
+    Args:
+        timings: timings of the benchmarks
+        file: path to the baselines
+        size: number of packages or versions in generated inputs
+
+    """
+    with file.open("w") as f:
+        json.dump({"size": size, "timings": timings}, f, indent=4)
+        f.write("\n")
+
+
+def get_slowdowns(
+    timings: Timings, baselines: Timings, threshold: float = THRESHOLD
+) -> dict[str, float]:
+    """Get the benchmarks slower than their baselines past a threshold.
+
+    Benchmarks without baselines are skipped.
+
+    Args:
+        timings: timings of the benchmarks
+        baselines: stored timings of the benchmarks
+        threshold: optional; how many times slower a benchmark may be
+
+    Returns:
+        dict[str, float]: how many times slower each failed benchmark was
+
+    """
+    ratios = {
+        name: seconds / baselines[name]
+        for name, seconds in timings.items()
+        if name in baselines
+    }
+    return {name: ratio for name, ratio in ratios.items() if ratio > threshold}
+
+
+def main() -> None:
+    """Run the benchmarks and compare them against the baselines."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time parsers and versions on generated inputs",
+    )
+    parser.add_argument(
+        "--baselines",
+        type=Path,
+        default=BASELINES,
+        help="path to the stored baselines",
+    )
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help="store the timings as the new baselines",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="fail if a benchmark is this many times slower than its baseline",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=SIZE,
+        help="number of packages or versions in generated inputs",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=REPEAT,
+        help="number of times to time each benchmark",
+    )
+    parser.add_argument(
+        "-k",
+        dest="only",
+        help="only run benchmarks with this in their names",
+    )
+    args = parser.parse_args()
+
+    baselines: Timings = {}
+    if args.baselines.exists():
+        try:
+            baselines = read_baselines(args.baselines, args.size)
+        except ValueError:
+            # Baselines of another size are replaced when saving
+            if not args.save:
+                raise
+
+    timings: Timings = {}
+    for name, benchmark in get_benchmarks(args.size).items():
+        if args.only and args.only not in name:
+            continue
+        timings[name] = time_benchmark(benchmark, args.repeat)
+        line = f"{name}: {timings[name] * 1000:.3f} ms"
+        if name in baselines:
+            line += f" ({timings[name] / baselines[name]:.2f}x baseline)"
+        print(line)
+
+    if args.save:
+        # Keep baselines of benchmarks that weren't run
+        write_baselines(baselines | timings, args.baselines, args.size)
+        print(f"Baselines written to {args.baselines}")
+        return
+
+    slowdowns = get_slowdowns(timings, baselines, args.threshold)
+    for name, ratio in slowdowns.items():
+        print(f"{name} is {ratio:.2f}x slower than its baseline")
+    if slowdowns:
+        sys.exit(1)
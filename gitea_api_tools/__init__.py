@@ -1,9 +1,41 @@
 import argparse
+from pathlib import Path
 
+from . import export
 from . import gitea
+from . import merge
 from . import package
+from . import profiles
+from . import profiling
+from . import progress
+from . import scan
+from . import serve
+from . import stats
+from . import config
+from . import deadline
 from .config import configure
-from .package import version
+from .package import specifier
+
+
+def is_multi_profile(args: argparse.Namespace) -> bool:
+    """Check whether several instances are scanned at once with --profile."""
+    return bool(args.profile) and len(args.profile) > 1
+
+
+def check_mirror(mirror: Path) -> package.mirror.Mirror:
+    """Read a mirror from --mirror before scanning, exiting if it's bad."""
+    try:
+        return package.mirror.Mirror(mirror)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def get_mirror_version(mirror: Path, pkg: str) -> specifier.Specifier:
+    """Get the latest version of a package in a mirror, to restrict with."""
+    try:
+        return check_mirror(mirror).get_version(pkg)
+    except ValueError as e:
+        parser.error(str(e))
 
 
 # These functions serve purely as wrappers for the sub-commands' function.
@@ -12,7 +44,22 @@ def wrap_subparser_configure(args: argparse.Namespace) -> None:
 
 
 def wrap_subparser_get_deploykeys(args: argparse.Namespace) -> None:
-    gitea.repo.deploy_key.get_keyed_repos()
+    if args.server:
+        serve.get_keyed_repos(args.server, args.output)
+        return
+    if is_multi_profile(args):
+        profiles.get_keyed_repos(
+            args.profile,
+            args.shard,
+            args.output,
+            args.workers,
+            args.since,
+            args.resume,
+        )
+        return
+    gitea.repo.deploy_key.get_keyed_repos(
+        args.shard, args.output, args.workers, args.since, args.resume
+    )
 
 
 def wrap_subparser_get_uid(args: argparse.Namespace) -> None:
@@ -20,12 +67,275 @@ def wrap_subparser_get_uid(args: argparse.Namespace) -> None:
 
 
 def wrap_subparser_list_python(args: argparse.Namespace) -> None:
-    package.python.list_dependent_repos(args.package, args.version)
+    ver_restrict = args.version
+    if args.mirror and not ver_restrict:
+        ver_restrict = get_mirror_version(args.mirror, args.package)
+    if args.server:
+        serve.list_dependent_repos(
+            args.server, args.package, ver_restrict, args.output
+        )
+        return
+    if is_multi_profile(args):
+        profiles.list_dependent_repos(
+            args.profile,
+            args.package,
+            ver_restrict,
+            args.shard,
+            args.output,
+            args.workers,
+            args.processes,
+            args.since,
+            args.resume,
+        )
+        return
+    package.python.list_dependent_repos(
+        args.package,
+        ver_restrict,
+        args.shard,
+        args.output,
+        args.workers,
+        args.processes,
+        args.since,
+        args.resume,
+    )
+
+
+def wrap_subparser_outdated(args: argparse.Namespace) -> None:
+    if args.mirror:
+        check_mirror(args.mirror)
+    if args.server:
+        serve.list_outdated_repos(args.server, args.output, args.mirror)
+        return
+    if is_multi_profile(args):
+        profiles.list_outdated_repos(
+            args.profile,
+            args.shard,
+            args.output,
+            args.workers,
+            args.processes,
+            args.mirror,
+            args.since,
+            args.resume,
+        )
+        return
+    package.outdated.list_outdated_repos(
+        args.shard,
+        args.output,
+        args.workers,
+        args.processes,
+        args.mirror,
+        args.since,
+        args.resume,
+    )
+
+
+def wrap_subparser_scan(args: argparse.Namespace) -> None:
+    if args.server or is_multi_profile(args):
+        parser.error("scan can't be used with --server or several profiles")
+    if not (
+        args.deploy_keys or args.python or args.outdated or args.languages
+    ):
+        parser.error(
+            "scan needs at least one of --keys, --python, --outdated or"
+            " --languages"
+        )
+    ver_restrict = args.version
+    if args.mirror:
+        check_mirror(args.mirror)
+    if args.python and args.mirror and not ver_restrict:
+        ver_restrict = get_mirror_version(args.mirror, args.python)
+    collectors = scan.Collectors(
+        args.deploy_keys,
+        args.python,
+        ver_restrict,
+        args.outdated,
+        args.languages,
+        args.mirror,
+    )
+    scan.scan_repos(
+        collectors,
+        args.shard,
+        args.output,
+        args.workers,
+        args.processes,
+        args.since,
+    )
+
+
+def wrap_subparser_merge(args: argparse.Namespace) -> None:
+    try:
+        merge.merge_results(args.files)
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+
+def wrap_subparser_snapshot(args: argparse.Namespace) -> None:
+    export.export_snapshot(args.file, args.workers)
+
+
+def wrap_subparser_serve(args: argparse.Namespace) -> None:
+    serve.serve(args.host, args.port, args.interval, args.workers, args.secret)
 
 
 parser = argparse.ArgumentParser(description="A toolbox for Gitea API")
+parser.add_argument(
+    "--stats",
+    action="store_true",
+    help="show statistics (e.g. throughput of each stage) after running",
+)
+parser.add_argument(
+    "--progress",
+    action="store_true",
+    help="show repositories scanned, requests per second and time left while"
+    " running, if stderr is a terminal",
+)
+parser.add_argument(
+    "--deadline",
+    type=float,
+    metavar="SECONDS",
+    help="stop scanning after this many seconds, listing partial results and"
+    " the repositories that were skipped",
+)
+parser.add_argument(
+    "--offline",
+    type=Path,
+    metavar="SNAPSHOT",
+    help="answer requests from a file made by snapshot, not the instance",
+)
+parser.add_argument(
+    "--server",
+    metavar="URL",
+    help="query a server started with serve (e.g. http://127.0.0.1:8734)"
+    " instead of scanning",
+)
+parser.add_argument(
+    "--profile-cpu",
+    action="store_true",
+    help="profile CPU time and write a report to the state directory",
+)
+parser.add_argument(
+    "--profile-mem",
+    action="store_true",
+    help="trace memory allocations and write a report to the state directory",
+)
+parser.add_argument(
+    "--profile",
+    type=gitea.instance.parse_profiles,
+    metavar="PROFILES",
+    help="use the instances of these profiles from the configuration"
+    " (e.g. a,b,c); several instances are scanned at once",
+)
 subparsers = parser.add_subparsers(required=True)
 
+# Options shared by sub-commands that scan all repositories
+parser_scan = argparse.ArgumentParser(add_help=False)
+parser_scan.add_argument(
+    "--shard",
+    type=gitea.shard.parse,
+    help="only scan shard i of N (e.g. 1/4), split by repository name",
+)
+parser_scan.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    help="number of threads fetching from the instance; defaults to the"
+    " profile's workers, or 1",
+)
+parser_scan.add_argument(
+    "--since",
+    type=gitea.since.parse,
+    help="only scan repositories updated since a timestamp"
+    " (e.g. 2024-05-20T10:00:00Z) or duration (e.g. 1h30m)",
+)
+
+# Options shared by sub-commands with a single report
+parser_report = argparse.ArgumentParser(add_help=False)
+parser_report.add_argument(
+    "-o",
+    "--output",
+    type=Path,
+    help="write results to a JSON file, to be combined with merge",
+)
+parser_report.add_argument(
+    "--resume",
+    action="store_true",
+    help="resume an interrupted scan, reusing the results of repositories it"
+    " finished",
+)
+
+# Options shared by sub-commands that list repositories, to narrow them down
+parser_filter = argparse.ArgumentParser(add_help=False)
+parser_filter.add_argument(
+    "--query", help="only repositories with this keyword in their name"
+)
+parser_filter.add_argument(
+    "--topic",
+    action="store_true",
+    help="with --query, only repositories with the keyword as a topic",
+)
+parser_filter.add_argument(
+    "--mode",
+    choices=gitea.filters.MODES,
+    help="only repositories of this type",
+)
+group_private = parser_filter.add_mutually_exclusive_group()
+group_private.add_argument(
+    "--private",
+    action="store_const",
+    const=True,
+    help="only private repositories",
+)
+group_private.add_argument(
+    "--public",
+    action="store_const",
+    const=False,
+    dest="private",
+    help="only public repositories",
+)
+parser_filter.add_argument(
+    "--exclusive",
+    action="store_true",
+    help="only repositories owned by the configured user ID",
+)
+parser_filter.add_argument(
+    "--no-templates",
+    action="store_false",
+    dest="template",
+    help="skip template repositories",
+)
+parser_filter.add_argument(
+    "--include",
+    action="append",
+    default=[],
+    metavar="GLOB",
+    help="only repositories with full names matching a glob (e.g. org/*);"
+    " can be repeated",
+)
+parser_filter.add_argument(
+    "--exclude",
+    action="append",
+    default=[],
+    metavar="GLOB",
+    help="skip repositories with full names matching a glob; can be repeated",
+)
+
+# Options shared by sub-commands that parse Python package files
+parser_parse = argparse.ArgumentParser(add_help=False)
+parser_parse.add_argument(
+    "-p",
+    "--processes",
+    type=int,
+    default=0,
+    help="number of processes decoding and parsing package files;"
+    " defaults to 0, using a thread for each",
+)
+parser_parse.add_argument(
+    "--mirror",
+    type=Path,
+    help="local PyPI mirror (json/ or simple/) or JSON metadata dump to"
+    " compare against the latest versions of packages",
+)
+
 # Sub-commands that take no arguments
 parser_configure = subparsers.add_parser("configure")
 parser_configure.set_defaults(func=wrap_subparser_configure)
@@ -34,6 +344,7 @@ parser_deploy_keys = subparsers.add_parser(
     "deploy_keys",
     aliases=["dep", "keys", "dk"],
     description="View deploy keys",
+    parents=[parser_scan, parser_report, parser_filter],
 )
 parser_deploy_keys.set_defaults(func=wrap_subparser_get_deploykeys)
 
@@ -42,9 +353,20 @@ parser_user_id = subparsers.add_parser(
 )
 parser_user_id.set_defaults(func=wrap_subparser_get_uid)
 
+parser_outdated = subparsers.add_parser(
+    "outdated",
+    description="View repositories using older versions of packages than"
+    " other repositories",
+    parents=[parser_scan, parser_report, parser_filter, parser_parse],
+)
+parser_outdated.set_defaults(func=wrap_subparser_outdated)
+
 # Sub-commands that require at least one argument
 parser_python = subparsers.add_parser(
-    "python", aliases=["py"], description="View your Python repositories"
+    "python",
+    aliases=["py"],
+    description="View your Python repositories",
+    parents=[parser_scan, parser_report, parser_filter, parser_parse],
 )
 parser_python.add_argument(
     "package", help="dependent package (e.g. from PyPI)"
@@ -52,12 +374,115 @@ parser_python.add_argument(
 parser_python.add_argument(
     "-v",
     "--version",
-    type=version.Version,
-    default=version.SENTINEL_VERSION,
-    help="optional version string like 1.0.0; don't prefix with 'v'",
+    type=specifier.Specifier,
+    default=specifier.ANY_VERSION,
+    help="optional version like 1.0.0 to list older versions only, or PEP 440"
+    " specifiers like '>=2.0,<2.31.1' or '!=1.4.*'; don't prefix with 'v'",
 )
 parser_python.set_defaults(func=wrap_subparser_list_python)
 
+parser_scan_all = subparsers.add_parser(
+    "scan",
+    description="Run several reports in one pass over your repositories",
+    parents=[parser_scan, parser_filter, parser_parse],
+)
+parser_scan_all.add_argument(
+    "-o",
+    "--output",
+    type=Path,
+    metavar="DIR",
+    help="write each report to a JSON file in a directory, to be combined"
+    " with merge",
+)
+parser_scan_all.add_argument(
+    "--keys",
+    dest="deploy_keys",
+    action="store_true",
+    help="view deploy keys, as with deploy_keys",
+)
+parser_scan_all.add_argument(
+    "--python",
+    metavar="PACKAGE",
+    help="view repositories dependent on a package, as with python",
+)
+parser_scan_all.add_argument(
+    "-v",
+    "--version",
+    type=specifier.Specifier,
+    default=specifier.ANY_VERSION,
+    help="optional version or PEP 440 specifiers restricting --python",
+)
+parser_scan_all.add_argument(
+    "--outdated",
+    action="store_true",
+    help="view outdated packages, as with outdated",
+)
+parser_scan_all.add_argument(
+    "--languages",
+    action="store_true",
+    help="view languages by the number of repositories using them",
+)
+parser_scan_all.set_defaults(func=wrap_subparser_scan)
+
+parser_merge = subparsers.add_parser(
+    "merge", description="Merge results from sharded sub-commands"
+)
+parser_merge.add_argument(
+    "files", nargs="+", type=Path, help="JSON files written with --output"
+)
+parser_merge.set_defaults(func=wrap_subparser_merge)
+
+parser_snapshot = subparsers.add_parser(
+    "snapshot",
+    description="Store a full scan in a SQLite file",
+    parents=[parser_filter],
+)
+parser_snapshot.add_argument("file", type=Path, help="path to the snapshot")
+parser_snapshot.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    help="number of threads fetching from the instance; defaults to the"
+    " profile's workers, or 1",
+)
+parser_snapshot.set_defaults(func=wrap_subparser_snapshot)
+
+parser_serve = subparsers.add_parser(
+    "serve",
+    description="Serve queries from an index kept in memory",
+    parents=[parser_filter],
+)
+parser_serve.add_argument(
+    "--host",
+    default=serve.DEFAULT_HOST,
+    help=f"host to listen on; defaults to {serve.DEFAULT_HOST}",
+)
+parser_serve.add_argument(
+    "--port",
+    type=int,
+    default=serve.DEFAULT_PORT,
+    help=f"port to listen on; defaults to {serve.DEFAULT_PORT}",
+)
+parser_serve.add_argument(
+    "--interval",
+    type=float,
+    default=serve.DEFAULT_INTERVAL,
+    help="seconds between refreshes of the index;"
+    f" defaults to {serve.DEFAULT_INTERVAL}",
+)
+parser_serve.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    help="number of threads fetching from the instance; defaults to the"
+    " profile's workers, or 1",
+)
+parser_serve.add_argument(
+    "--secret",
+    help="secret of the Gitea webhooks delivered to /webhook, if any",
+)
+parser_serve.set_defaults(func=wrap_subparser_serve)
+
 
 def main() -> None:
     """Run the Gitea API toolkit.
@@ -67,10 +492,62 @@ def main() -> None:
 
     """
     args = parser.parse_args()
-    try:
-        args.func(args)
-    except AttributeError:
-        raise RuntimeError("Invalid option provided")
+    if args.profile and (args.offline or args.server):
+        parser.error("--profile can't be used with --offline or --server")
+    # Only sub-commands with --shard scan instances; others use one instance
+    if is_multi_profile(args) and "shard" not in args:
+        parser.error("this sub-command can only use one profile")
+    if args.deadline is not None and args.deadline <= 0:
+        parser.error("--deadline must be positive")
+    if args.deadline is not None and args.func is wrap_subparser_serve:
+        parser.error("--deadline can't be used with serve")
+    profile_workers = None
+    if args.profile and not is_multi_profile(args):
+        instance = gitea.instance.Instance(config.get_profile(args.profile[0]))
+        gitea.instance.activate(instance)
+        profile_workers = instance.workers
+    # -w wins over profiles; several profiles each default to their own
+    if "workers" in args and args.workers is None:
+        if not is_multi_profile(args):
+            args.workers = profile_workers or 1
+
+    if args.offline:
+        gitea.api.use_snapshot(args.offline)
+    if "include" in args:
+        gitea.api.use_filter(
+            gitea.filters.RepoFilter(
+                args.query,
+                args.topic,
+                args.mode,
+                args.private,
+                args.exclusive,
+                args.template,
+                args.include,
+                args.exclude,
+            )
+        )
+
+    deadline.start(args.deadline)
+    with (
+        progress.report(args.progress),
+        profiling.profile(args.profile_cpu, args.profile_mem),
+    ):
+        try:
+            args.func(args)
+        except AttributeError:
+            raise RuntimeError("Invalid option provided")
+        except profiles.ProfilesFailed as e:
+            # The report was made from the other instances
+            config.logger.error(f"{e}; the report is incomplete")
+            parser.exit(1)
+        except gitea.api.AccessDenied as e:
+            # Scans stopped with their checkpoints saved, so they can resume
+            config.logger.error(f"{e}; check the token in the configuration")
+            parser.exit(1)
+
+    deadline.report()
+    if args.stats:
+        stats.log_stats()
 
 
 if __name__ == "__main__":
@@ -63,6 +63,10 @@ class Config:
             error = f"{file} exists but is malformed. More info:\n{e}"
             raise InvalidConfiguration(error) from e
 
+        self._set_fields(contents)
+
+    def _set_fields(self, contents: dict[str, object]) -> None:
+        """Set the fields of the configuration as attributes."""
         for attr, val in contents.items():
             setattr(self, attr, val)
             if attr == "host":
@@ -81,6 +85,11 @@ class Config:
         for field in _example.fields:
             as_dict[field] = getattr(self, field)
 
+        # Fields not in the example, like profiles, are kept as they are
+        for field in self.fields:
+            if field not in as_dict:
+                as_dict[field] = getattr(self, field)
+
         return as_dict
 
     def write_config(self) -> None:
@@ -102,6 +111,43 @@ class Config:
             f.write("\n")
 
 
+class Profile(Config):
+    """Represents a named profile in the configuration file.
+
+    Profiles configure other Gitea instances, with the same fields as the top
+    level of the configuration, under "profiles":
+
+        "profiles": {
+            "work": {"host": "https://git.example.com", "token": "..."}
+        }
+
+    A profile may also set "workers", the number of threads fetching from its
+    instance.
+
+    """
+
+    def __init__(self, name: str, contents: dict[str, object]) -> None:
+        """Initialize the profile with its fields.
+
+        Args:
+            name: name of the profile
+            contents: fields of the profile
+
+        """
+        self.name = name
+        self.file = user_config_path
+        self._set_fields(contents)
+
+    def write_config(self) -> None:
+        """Profiles can't be written on their own.
+
+        Raises:
+            RuntimeError: always
+
+        """
+        raise RuntimeError("Profiles must be edited in the configuration")
+
+
 config_dir, cache_dir = paths.get_os_dirs(_PROJECT_NAME)
 logger = logging.create_logger(_PROJECT_NAME, cache_dir)
 
@@ -151,6 +197,45 @@ def validate(u_config: Config = user_config) -> bool:
     return True
 
 
+def get_profile_names() -> list[str]:
+    """Get the names of the profiles in the configuration.
+
+    Returns:
+        list[str]: names of the profiles; empty if there are none
+
+    """
+    profiles = getattr(user_config, "profiles", {})
+    return list(profiles) if isinstance(profiles, dict) else []
+
+
+def get_profile(name: str) -> Profile:
+    """Get a profile from the configuration.
+
+    Args:
+        name: name of the profile
+
+    Returns:
+        Profile: the profile
+
+    Raises:
+        ValueError: the profile doesn't exist or is invalid
+
+    """
+    profiles = getattr(user_config, "profiles", {})
+    if not isinstance(profiles, dict) or name not in profiles:
+        raise ValueError(f"Profile {name} does not exist")
+
+    contents = profiles[name]
+    if not isinstance(contents, dict):
+        raise ValueError(f"Profile {name} is malformed")
+
+    profile = Profile(name, contents)
+    if not validate(profile):
+        raise ValueError(f"Profile {name} is invalid")
+
+    return profile
+
+
 # Post-validation variables
 
 # Other configuration
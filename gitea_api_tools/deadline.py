@@ -0,0 +1,117 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from . import config
+from . import stats
+
+
+# Most repositories listed by name in the report; the rest are counted
+MAX_LISTED = 50
+# Section of --stats counting the repositories skipped at the deadline
+STATS_SECTION = "deadline"
+
+
+class Expired(TimeoutError):
+    """The deadline passed before a request could be sent or answered."""
+
+
+class _Deadline:
+    """The time budget of a run, and the repositories it skipped."""
+
+    def __init__(self, seconds: float) -> None:
+        """Start the budget.
+
+        Args:
+            seconds: the budget
+
+        """
+        self.budget = seconds
+        self.deadline = time.monotonic() + seconds
+        self.skipped: list[str] = []
+        self.lock = threading.Lock()
+
+
+# The deadline of the current context; threads of pipelines and clients
+# started from it share it (see pipeline._spawn())
+_current: ContextVar[_Deadline | None] = ContextVar("deadline", default=None)
+
+
+def start(seconds: float | None) -> None:
+    """Start the time budget of the run in the current context.
+
+    Args:
+        seconds: the budget; if None, there's no deadline
+
+    """
+    _current.set(None if seconds is None else _Deadline(seconds))
+
+
+def remaining() -> float | None:
+    """Get the time left before the deadline.
+
+    Returns:
+        float | None: seconds left, at least 0; None if there's no deadline
+
+    """
+    current = _current.get()
+    if current is None:
+        return None
+    return max(0.0, current.deadline - time.monotonic())
+
+
+def expired() -> bool:
+    """Check whether the deadline passed.
+
+    Returns:
+        bool: True if there's a deadline and it passed
+
+    """
+    current = _current.get()
+    return current is not None and time.monotonic() >= current.deadline
+
+
+def skip(item: object) -> None:
+    """Record a repository that was skipped because the deadline passed.
+
+    Args:
+        item: the repository, e.g. its full name or its record
+
+    """
+    current = _current.get()
+    if current is None:
+        return
+    with current.lock:
+        current.skipped.append(str(item))
+    stats.increment(STATS_SECTION, "skipped repos")
+
+
+def get_skipped() -> list[str]:
+    """Get the repositories skipped because the deadline passed.
+
+    Returns:
+        list[str]: full names of the repositories, sorted
+
+    """
+    current = _current.get()
+    if current is None:
+        return []
+    with current.lock:
+        return sorted(current.skipped)
+
+
+def report() -> None:
+    """Log the repositories skipped because the deadline passed, if any."""
+    skipped = get_skipped()
+    current = _current.get()
+    if not skipped or current is None:
+        return
+
+    config.logger.warning(
+        f"The deadline of {current.budget:g}s passed; results are partial."
+        f" {len(skipped)} repo(s) were skipped:"
+    )
+    for u_repo in skipped[:MAX_LISTED]:
+        config.logger.warning(f"    {u_repo}")
+    if len(skipped) > MAX_LISTED:
+        config.logger.warning(f"    ... and {len(skipped) - MAX_LISTED} more")
@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, TypeAlias
+
+from . import config
+from . import deadline
+from . import gitea
+from . import package
+from . import pipeline
+
+
+# Everything scanned from one repository, stored in the snapshot at once
+RepoScan: TypeAlias = dict[str, Any]
+
+
+def scan_repo(record: dict[str, Any]) -> list[RepoScan]:
+    """Scan a repository for everything stored in a snapshot.
+
+    This is a pipeline stage. Empty repositories have no languages or files,
+    and only admins can read deploy keys, so those requests are skipped.
+
+    Args:
+        record: the repository as returned by `repos/search`
+
+    Returns:
+        list[RepoScan]: the scanned repository
+
+    """
+    u_repo = record["full_name"]
+    repo_record = gitea.records.RepoRecord(record)
+    scan: RepoScan = {
+        "record": record,
+        "languages": None,
+        "root_files": {},
+        "manifests": [],
+        "keys": None,
+    }
+
+    try:
+        if repo_record.has_files():
+            scan["languages"] = gitea.api.get_response(
+                f"repos/{u_repo}/languages"
+            )
+    except gitea.api.EX_NO_RESPONSE:
+        # Repository may not have any code
+        pass
+
+    if scan["languages"] and "Python" in scan["languages"]:
+        root_files = gitea.repo.get_root_files(u_repo)
+        scan["root_files"] = root_files
+        # Unlike scans, every package file is kept, not just the preferred
+        for pkg_file in package.manifests.get_files():
+            if pkg_file not in root_files:
+                continue
+            try:
+                contents = gitea.repo.get_file_contents(u_repo, pkg_file)
+            except gitea.repo.ERR_NO_FILE:
+                continue
+            try:
+                requirements = package.manifests.parse(pkg_file, contents)
+            except ValueError:
+                config.logger.warning(f"{pkg_file} in {u_repo} isn't parsed")
+                requirements = {}
+            scan["manifests"].append(
+                (pkg_file, root_files[pkg_file], contents, requirements)
+            )
+
+    if not repo_record.can_read_keys():
+        return [scan]
+
+    try:
+        scan["keys"] = gitea.api.get_json(f"repos/{u_repo}/keys")
+    except gitea.api.EX_NO_RESPONSE:
+        config.logger.warning(f"Could not access keys for {u_repo}")
+
+    return [scan]
+
+
+def export_snapshot(file: Path, workers: int = 1) -> None:
+    """Scan all repositories into a snapshot.
+
+    The snapshot can be used with `gitea-api --offline` or queried directly
+    with SQLite.
+
+    Args:
+        file: path to the snapshot; it's replaced once the scan finishes
+        workers: optional; number of threads fetching from the instance
+
+    """
+    scan = pipeline.Pipeline(
+        "snapshot", [pipeline.Stage("fetch", scan_repo, workers)]
+    )
+    scanned = 0
+    # The previous snapshot is only replaced if every repository was stored
+    with gitea.snapshot.Snapshot(file, writable=True) as snapshot:
+        host = getattr(gitea.api.get_config(), "host", "")
+        snapshot.set_meta("host", str(host))
+        snapshot.set_meta("created", datetime.now(timezone.utc).isoformat())
+
+        for repo_scan in scan.run(gitea.api.search_repos()):
+            u_repo = repo_scan["record"]["full_name"]
+            snapshot.add_repo(repo_scan["record"], repo_scan["languages"])
+            snapshot.add_root_files(u_repo, repo_scan["root_files"])
+            for manifest in repo_scan["manifests"]:
+                snapshot.add_manifest(u_repo, *manifest)
+            if repo_scan["keys"] is not None:
+                snapshot.add_keys(u_repo, repo_scan["keys"])
+            scanned += 1
+
+        if deadline.get_skipped():
+            snapshot.discard()
+            config.logger.warning(
+                f"The deadline passed before every repository was stored;"
+                f" {file} was not replaced"
+            )
+            return
+
+    config.logger.info(f"Stored {scanned} repositories in {file}")
@@ -1,4 +1,5 @@
 import argparse
+from pathlib import Path
 
 from . import config
 from . import gitea
@@ -13,6 +14,12 @@ parser = argparse.ArgumentParser(
 )
 parser.add_argument("package", type=str, help="package name on PyPI")
 parser.add_argument("version", type=str, help="package version")
+parser.add_argument(
+    "--offline",
+    type=Path,
+    metavar="SNAPSHOT",
+    help="answer requests from a file made by `gitea-api snapshot`",
+)
 
 
 def get_outdated_dep_version(
@@ -76,12 +83,11 @@ def compare_dependency(
     outdated = 0
     for user, repo in repos:
         u_repo = f"{user}/{repo}"
-        current_repo = f"{config.user_config.host_api}/repos/{u_repo}"
-        if not gitea.repo.uses_language(current_repo, "Python"):
+        if not gitea.repo.uses_language(u_repo, "Python"):
             continue
 
         try:
-            requirements = package.python.process_requirements(current_repo)
+            requirements = package.python.process_requirements(u_repo)
         except ValueError:
             # Silently ignore missing requirements
             continue
@@ -109,6 +115,8 @@ def oldmain() -> None:
 
     """
     args = parser.parse_args()
+    if args.offline:
+        gitea.api.use_snapshot(args.offline)
     main(args.package, args.version)
 
 
@@ -1,10 +1,28 @@
 from . import api
+from . import checkpoint
+from . import client
+from . import concurrency
+from . import filters
+from . import instance
+from . import local
+from . import records
 from . import repo
+from . import shard
+from . import since
 from . import user
 
 
 __all__ = [
     "api",
+    "checkpoint",
+    "client",
+    "concurrency",
+    "filters",
+    "instance",
+    "local",
+    "records",
     "repo",
+    "shard",
+    "since",
     "user",
 ]
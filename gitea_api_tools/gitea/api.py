@@ -1,26 +1,42 @@
 import json
 import time
 from base64 import b64decode
-from typing import TypeAlias
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TypeAlias
+from urllib.parse import urlencode
 
 import requests
 
-from .. import config
-
-
-session = requests.Session()
-
 try:
-    session.headers = {
-        "Authorization": f"token {getattr(config.user_config, 'token')}",
-        "Accept": "application/json",
-    }
-except AttributeError:
-    config.logger.error("Could not load token. gitea.api disabled")
-    REQUESTS_AVAILABLE = False
-else:
-    REQUESTS_AVAILABLE = True
-
+    # orjson is optional; it parses JSON from bytes several times faster
+    from orjson import loads as load_json
+except ImportError:
+    from json import loads as load_json
+
+from . import filters as _filters
+from . import instance as _instance
+from . import records as _records
+from . import shard as _shard
+from . import since as _since
+from . import snapshot as _snapshot
+from .. import config
+from .. import deadline
+from .. import profiling
+from .. import progress
+
+
+# When set, requests of the current context are answered from this snapshot
+# instead of the instance
+_offline: ContextVar[_snapshot.Snapshot | None] = ContextVar(
+    "offline", default=None
+)
+# When set, only repositories passing this filter are listed in the current
+# context
+_repo_filter: ContextVar[_filters.RepoFilter | None] = ContextVar(
+    "repo_filter", default=None
+)
 
 Repos: TypeAlias = list[tuple[str, str]]
 
@@ -28,41 +44,164 @@ ERR_NO_TOKEN = "Can't execute requests without token"
 ERR_NO_ENCODING = "No encoding was detected when {}"
 
 EX_NO_RESPONSE = (RuntimeError, FileNotFoundError, ValueError)
+# Raised when the token is refused; not in EX_NO_RESPONSE, so it stops scans
+AccessDenied = _instance.AccessDenied
 
 
-def get_response(url: str) -> str:
-    """Request a file from the Gitea instance given the `url`.
+def get_instance() -> _instance.Instance:
+    """Get the instance requests are sent to.
 
-    It also decodes the immediate response for handling later.
+    Returns:
+        _instance.Instance: the instance of the current context, if a
+            profile or client is in use (see gitea.instance); otherwise, the
+            instance at the top level of the configuration
+
+    Raises:
+        RuntimeError: no token, no requests
+
+    """
+    instance = _instance.current()
+    if instance:
+        return instance
+
+    try:
+        return _instance.get_default()
+    except ValueError as e:
+        config.logger.error("Could not load token. gitea.api disabled")
+        raise RuntimeError(ERR_NO_TOKEN) from e
+
+
+def send_request(url: str) -> requests.Response:
+    """Request a file from the Gitea instance given the `url`.
 
     Because this is the most basic function of this module, no requests will
     be served if token is unavailable.
 
+    Requests go to the instance of the current context (see get_instance()).
+    With a deadline (see deadline.start()), requests time out when it passes.
+
+    Requests in flight to each instance are limited by a limiter that
+    adapts to its latency and errors (see gitea.concurrency).
+
     Args:
         url: URL fragment excluding the hostname
 
     Returns:
-        str: decoded response
+        requests.Response: the response, if it succeeded
 
     Raises:
         RuntimeError: no token, no requests
+        AccessDenied: the token was refused, or lacks permissions
         FileNotFoundError: instance does not have a file at the given url
         ValueError: no encoding provided
+        deadline.Expired: the deadline passed
 
     """
-    if not REQUESTS_AVAILABLE:
-        raise RuntimeError(ERR_NO_TOKEN)
+    return get_instance().send_request(url)
+
+
+def get_response(url: str) -> str:
+    """Request a file from the Gitea instance given the `url`.
+
+    It also decodes the immediate response for handling later. In offline
+    mode, requests are answered from the snapshot instead, so no token is
+    needed.
+
+    Args:
+        url: URL fragment excluding the hostname
+
+    Returns:
+        str: decoded response
+
+    Raises:
+        RuntimeError: no token, no requests
+        FileNotFoundError: instance does not have a file at the given url
+        ValueError: no encoding provided
 
-    response = session.get(f"{config.user_config.host_api}/{url}")
-    if response.status_code != 200:
-        raise FileNotFoundError(f"Project does not have file at {url}")
-    elif not response.encoding:
-        raise ValueError("Could not decode file")
+    """
+    offline = get_offline()
+    if offline:
+        return offline.get_response(url)
 
+    response = send_request(url)
     return response.content.decode(response.encoding).strip()
 
 
-def decode(response: str) -> str:
+def get_content(url: str) -> bytes:
+    """Request a file from the Gitea instance given the `url`, as bytes.
+
+    Unlike get_response(), the response isn't decoded, which saves a copy
+    when it's parsed or passed on as is (e.g. to api.decode()).
+
+    Args:
+        url: URL fragment excluding the hostname
+
+    Returns:
+        bytes: undecoded response
+
+    Raises:
+        RuntimeError: no token, no requests
+        FileNotFoundError: instance does not have a file at the given url
+        ValueError: no encoding provided
+
+    """
+    offline = get_offline()
+    if offline:
+        return offline.get_response(url).encode()
+
+    return send_request(url).content
+
+
+def get_json(url: str) -> Any:
+    """Request JSON from the Gitea instance given the `url`.
+
+    The response is parsed straight from bytes, without decoding it to a
+    string first. orjson is used if it's installed.
+
+    Args:
+        url: URL fragment excluding the hostname
+
+    Returns:
+        Any: the parsed response
+
+    Raises:
+        RuntimeError: no token, no requests
+        FileNotFoundError: instance does not have a file at the given url
+        ValueError: no encoding provided, or the response isn't JSON
+
+    """
+    return load_json(get_content(url))
+
+
+def get_page(url: str) -> tuple[Any, int | None]:
+    """Request a page of results as JSON, with the total number of results.
+
+    Gitea sends the total number of results of paged endpoints (e.g.
+    `repos/search`) in the X-Total-Count header.
+
+    Args:
+        url: URL fragment excluding the hostname
+
+    Returns:
+        tuple[Any, int | None]: the parsed page, and the total number of
+            results; None if it's unknown, e.g. offline
+
+    Raises:
+        RuntimeError: no token, no requests
+        FileNotFoundError: instance does not have a file at the given url
+        ValueError: no encoding provided, or the response isn't JSON
+
+    """
+    if get_offline():
+        return get_json(url), None
+
+    response = send_request(url)
+    total = response.headers.get("X-Total-Count", "")
+    return load_json(response.content), int(total) if total.isdigit() else None
+
+
+@profiling.phase("decode")
+def decode(response: str | bytes) -> str:
     """Decode provided text with its encoding.
 
     This function is to be used with API calls that may not return encoding in
@@ -82,7 +221,7 @@ def decode(response: str) -> str:
 
     """
     try:
-        full_response = json.loads(response)
+        full_response = load_json(response)
         content = full_response["content"]
         encoding = full_response["encoding"]
     except json.decoder.JSONDecodeError:
@@ -100,50 +239,218 @@ def decode(response: str) -> str:
     return known_encodings[encoding](content).strip()
 
 
-def list_repos() -> Repos:
-    """List the repositories on the host.
+def get_config() -> config.Config:
+    """Get the configuration of the instance requests are sent to.
 
     Returns:
-        Repos: list of repositories in the format (owner, repo_name)
+        config.Config: the profile of the current instance, if any;
+            otherwise, the user configuration
+
+    """
+    instance = _instance.current()
+    return instance.config if instance else config.user_config
+
+
+def get_offline() -> _snapshot.Snapshot | None:
+    """Get the snapshot answering requests of the current context.
+
+    Returns:
+        _snapshot.Snapshot | None: the snapshot; None if requests go to the
+            instance
+
+    """
+    return _offline.get()
+
+
+def get_filter() -> _filters.RepoFilter | None:
+    """Get the filter of repositories listed in the current context.
+
+    Returns:
+        _filters.RepoFilter | None: the filter; None if every repository is
+            listed
+
+    """
+    return _repo_filter.get()
+
+
+def use_snapshot(file: Path) -> None:
+    """Answer requests from a snapshot instead of the instance from now on.
+
+    Only requests of the current context (and threads started from it, like
+    pipelines) are answered from the snapshot; clients (see gitea.client)
+    aren't affected.
+
+    Args:
+        file: path to a snapshot from `gitea-api snapshot`
+
+    """
+    _offline.set(_snapshot.open_offline(file))
+
+
+def use_filter(new_filter: _filters.RepoFilter) -> None:
+    """Only list repositories passing a filter from now on.
+
+    Like use_snapshot(), the filter only applies to the current context.
+
+    Args:
+        new_filter: the filter
+
+    """
+    _repo_filter.set(new_filter)
+
+
+@profiling.phase("list repos")
+def search_repos(
+    shard: _shard.Shard | None = None, since: datetime | None = None
+) -> list[dict[str, Any]]:
+    """Search the repositories on the host.
+
+    With `since`, repositories are searched from the most recently updated,
+    and paging stops at the first repository updated before the cutoff, so
+    the rest of the instance is never listed.
+
+    If a filter is in use (see use_filter()), it's sent along with the search
+    where the API supports it, and its globs are checked right after.
+
+    Args:
+        shard: optional; if provided, only list repositories in this shard
+        since: optional; if provided, only list repositories updated after this
+            time
+
+    Returns:
+        list[dict[str, Any]]: repositories as returned by the API
 
     Raises:
         RuntimeError: no encoding detected in request; request may be invalid
 
     """
+    u_config = get_config()
+    offline = get_offline()
+    repo_filter = get_filter()
     try:
-        search_archived_repos = getattr(
-            config.user_config, "search_archived_repos"
-        )
+        search_archived_repos = getattr(u_config, "search_archived_repos")
     except AttributeError as e:
-        raise RuntimeError("Configuration is malformed") from e
+        if not offline:
+            raise RuntimeError("Configuration is malformed") from e
+        search_archived_repos = True
 
     url = f"repos/search?archived={search_archived_repos}"
 
-    uid = getattr(config.user_config, "uid", None)
+    uid = getattr(u_config, "uid", None)
     if uid:
         url = f"{url}&uid={uid}"
 
+    if since:
+        url = f"{url}&sort=updated&order=desc"
+
+    if repo_filter:
+        params = repo_filter.get_params()
+        if params:
+            url = f"{url}&{urlencode(params)}"
+
     page = 0
     repos_left = True
     all_repos = []
+    # Repositories expected by --progress, until they're all listed
+    expected = 0
     while repos_left:
         page += 1
         paged_url = f"{url}&page={page}"
 
         try:
-            response = get_response(paged_url)
+            response, total = get_page(paged_url)
         except ValueError:
             raise RuntimeError(ERR_NO_ENCODING.format("fetching repos"))
+        except deadline.Expired:
+            # Unlisted repositories can't be reported, but they're counted
+            config.logger.warning(
+                f"The deadline passed while listing; only {len(all_repos)}"
+                f" of {expected or 'all'} repos were listed"
+            )
+            break
+
+        if page == 1 and total:
+            expected = total
+            progress.add_total(expected)
 
         try:
-            repos = json.loads(response)["data"]
-        except KeyError:
+            repos = response["data"]
+        except (KeyError, TypeError):
             raise RuntimeError(f"Page {page} of repositories is missing data")
 
+        if since:
+            recent = [r for r in repos if _since.is_updated_since(r, since)]
+            if len(recent) < len(repos):
+                # Older repositories follow; no need to keep paging
+                repos = recent
+                repos_left = False
+
         if repos:
             all_repos.extend(repos)
-            time.sleep(1)
+            if repos_left and not offline:
+                time.sleep(1)
         else:
             repos_left = False
 
-    return [repo["full_name"].split("/") for repo in all_repos]
+    if repo_filter and offline:
+        # Snapshots ignore the search parameters, so every filter is checked
+        all_repos = [
+            repo for repo in all_repos if repo_filter.match(repo, uid)
+        ]
+    elif repo_filter:
+        all_repos = [
+            repo
+            for repo in all_repos
+            if repo_filter.match_name(repo["full_name"])
+        ]
+
+    listed = [
+        repo
+        for repo in all_repos
+        if not shard or _shard.in_shard(repo["full_name"], shard)
+    ]
+    progress.add_total(len(listed) - expected)
+
+    return listed
+
+
+def list_records(
+    shard: _shard.Shard | None = None, since: datetime | None = None
+) -> list[_records.RepoRecord]:
+    """List the repositories on the host, with their metadata.
+
+    Args:
+        shard: optional; if provided, only list repositories in this shard
+        since: optional; if provided, only list repositories updated after this
+            time
+
+    Returns:
+        list[_records.RepoRecord]: records of the repositories
+
+    Raises:
+        RuntimeError: no encoding detected in request; request may be invalid
+
+    """
+    return [_records.RepoRecord(repo) for repo in search_repos(shard, since)]
+
+
+def list_repos(
+    shard: _shard.Shard | None = None, since: datetime | None = None
+) -> Repos:
+    """List the repositories on the host.
+
+    Args:
+        shard: optional; if provided, only list repositories in this shard
+        since: optional; if provided, only list repositories updated after this
+            time
+
+    Returns:
+        Repos: list of repositories in the format (owner, repo_name)
+
+    Raises:
+        RuntimeError: no encoding detected in request; request may be invalid
+
+    """
+    return [
+        repo["full_name"].split("/") for repo in search_repos(shard, since)
+    ]
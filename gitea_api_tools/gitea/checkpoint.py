@@ -0,0 +1,177 @@
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+from . import api
+from . import records as _records
+from . import shard as _shard
+from .. import config
+from .. import deadline
+from .. import progress
+from .. import stats
+
+
+CHECKPOINT_DIR = config.cache_dir / "checkpoints"
+# Seconds between saves of a checkpoint while scanning
+SAVE_INTERVAL = 30.0
+# Section of --stats counting the repositories reused from checkpoints
+STATS_SECTION = "checkpoint"
+
+
+def get_file(command: str, shard: _shard.Shard | None = None) -> Path:
+    """Get the checkpoint file of a scan.
+
+    Scans of different instances or shards have their own checkpoints, so
+    they can be interrupted and resumed independently.
+
+    Args:
+        command: the sub-command scanning, e.g. python
+        shard: optional; the shard being scanned
+
+    Returns:
+        Path: path to the checkpoint file in the state directory
+
+    """
+    host = getattr(api.get_config(), "host_api", "")
+    scope = f"{host} {_shard.to_str(shard) if shard else ''}"
+    digest = hashlib.sha256(scope.encode()).hexdigest()[:16]
+    return CHECKPOINT_DIR / f"{command}-{digest}.json"
+
+
+class Checkpoint:
+    """Records the repositories finished by a scan, with their results.
+
+    The checkpoint is saved periodically and when the scan fails (e.g. the
+    token expired), and removed once the scan finishes. A resumed scan skips
+    the repositories in the checkpoint and reuses their results, unless they
+    were updated since.
+
+    Results must be serializable to JSON.
+
+    """
+
+    def __init__(
+        self, file: Path, resume: bool = False, interval: float = SAVE_INTERVAL
+    ) -> None:
+        """Initialize the checkpoint.
+
+        Args:
+            file: path to the checkpoint
+            resume: optional; if True, load the finished repositories from
+                the file; otherwise, start over
+            interval: optional; seconds between saves
+
+        """
+        self.file = file
+        self.interval = interval
+        # Finished repositories mapped to their last update and result
+        self.repos: dict[str, dict[str, Any]] = {}
+        # Last update of repositories being scanned
+        self._updated: dict[str, str | None] = {}
+        self._saved = time.monotonic()
+        self._lock = threading.Lock()
+
+        if not resume:
+            return
+        try:
+            with file.open() as f:
+                self.repos = json.load(f)["repos"]
+        except FileNotFoundError:
+            config.logger.info("No checkpoint to resume from; starting over")
+        except (OSError, KeyError, TypeError, json.decoder.JSONDecodeError):
+            config.logger.warning(f"{file} is malformed; starting over")
+
+    def __enter__(self) -> "Checkpoint":
+        """Start the scan."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Save the checkpoint if the scan failed; otherwise, remove it.
+
+        A scan cut short by the deadline is saved too, so it can be resumed.
+
+        """
+        if exc_type or deadline.get_skipped():
+            self.save()
+            config.logger.info(
+                f"Scan stopped after {len(self.repos)} repos;"
+                " use --resume to continue"
+            )
+        else:
+            self.file.unlink(missing_ok=True)
+
+    def split(
+        self, records: Iterable[_records.RepoRecord]
+    ) -> tuple[list[_records.RepoRecord], dict[str, Any]]:
+        """Split repositories into those left to scan and those finished.
+
+        Args:
+            records: records of the repositories to scan
+
+        Returns:
+            tuple[list[_records.RepoRecord], dict[str, Any]]: records
+                left to scan, and finished repositories mapped to their
+                results
+
+        """
+        pending = []
+        finished = {}
+        with self._lock:
+            for record in records:
+                entry = self.repos.get(record.full_name)
+                if entry and (
+                    record.updated is None
+                    or entry["updated"] == record.updated
+                ):
+                    finished[record.full_name] = entry["result"]
+                else:
+                    pending.append(record)
+                    self._updated[record.full_name] = record.updated
+
+        if finished:
+            stats.increment(STATS_SECTION, "resumed", len(finished))
+            progress.advance(len(finished))
+
+        return pending, finished
+
+    def add(self, u_repo: str, result: Any = None) -> None:
+        """Record a finished repository, saving the checkpoint periodically.
+
+        Args:
+            u_repo: full repository name
+            result: optional; the result of the repository, if any
+
+        """
+        with self._lock:
+            self.repos[u_repo] = {
+                "updated": self._updated.get(u_repo),
+                "result": result,
+            }
+            due = time.monotonic() - self._saved >= self.interval
+        if due:
+            self.save()
+
+    def save(self) -> None:
+        """Write the checkpoint to its file.
+
+        The file is replaced at once, so a scan stopped while saving leaves
+        the previous checkpoint intact.
+
+        """
+        with self._lock:
+            self.file.parent.mkdir(parents=True, exist_ok=True)
+            partial = self.file.with_suffix(".tmp")
+            with partial.open("w") as f:
+                json.dump({"repos": self.repos}, fp=f)
+            partial.replace(self.file)
+            self._saved = time.monotonic()
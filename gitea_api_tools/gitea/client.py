@@ -0,0 +1,234 @@
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any, TypeVar
+
+from . import api
+from . import concurrency as _concurrency
+from . import filters as _filters
+from . import instance as _instance
+from . import repo as _repo
+from . import shard as _shard
+from . import user as _user
+from .. import config
+
+
+T = TypeVar("T")
+
+# Seconds a client reuses a response
+CACHE_TTL = 300
+# Most responses a client caches; the least recently used are dropped
+CACHE_SIZE = 1024
+
+
+class GiteaClient(_instance.Instance):
+    """A client of a Gitea instance, for use in other programs.
+
+    The functions of gitea.api and the modules built on it send requests to
+    the instance of the current context. A client always requests its own
+    instance instead, so a long-running program can hold several clients and
+    use them from any thread at once. Each client has its own host, token,
+    sessions (one per thread) and, optionally, its own limiter and filter.
+
+    The user ID, file contents and deploy keys are cached by the client for
+    `cache_ttl` seconds, so a program asking for the same ones again (e.g. on
+    every request it handles) doesn't request them each time. Failures aren't
+    cached.
+
+    Calls run in a context of their own, so snapshots, filters and deadlines
+    of the caller (e.g. from api.use_snapshot()) don't apply to clients.
+
+    """
+
+    def __init__(
+        self,
+        u_config: config.Config,
+        limiter: _concurrency.Limiter | None = None,
+        repo_filter: _filters.RepoFilter | None = None,
+        cache_ttl: float = CACHE_TTL,
+    ) -> None:
+        """Initialize the client.
+
+        Args:
+            u_config: the configuration of the instance, e.g. a profile
+            limiter: optional; limits the requests in flight; defaults to the
+                limiter shared by every client of the same host
+            repo_filter: optional; if provided, only repositories passing
+                this filter are listed
+            cache_ttl: optional; seconds responses are reused for; if 0,
+                nothing is cached
+
+        Raises:
+            ValueError: the configuration has no host or token
+
+        """
+        super().__init__(u_config, limiter)
+        self.repo_filter = repo_filter
+        self.cache_ttl = cache_ttl
+        # Results of calls by function and arguments, with when they were made
+        self._cache: OrderedDict[tuple[Any, ...], tuple[float, Any]] = (
+            OrderedDict()
+        )
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def connect(
+        cls,
+        host: str,
+        token: str,
+        limiter: _concurrency.Limiter | None = None,
+        repo_filter: _filters.RepoFilter | None = None,
+        cache_ttl: float = CACHE_TTL,
+        **fields: object,
+    ) -> "GiteaClient":
+        """Create a client from a host and token, without a configuration.
+
+        Args:
+            host: the URL of the instance, without the API path
+            token: the API token
+            limiter: optional; limits the requests in flight; defaults to the
+                limiter shared by every client of the same host
+            repo_filter: optional; if provided, only repositories passing
+                this filter are listed
+            cache_ttl: optional; seconds responses are reused for; if 0,
+                nothing is cached
+            fields: optional; other fields of a configuration, e.g. uid or
+                search_archived_repos
+
+        Returns:
+            GiteaClient: the client
+
+        """
+        fields.setdefault("search_archived_repos", False)
+        profile = config.Profile(
+            host, {"host": host, "token": token, **fields}
+        )
+        return cls(profile, limiter, repo_filter, cache_ttl)
+
+    def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Run a function of the tools against the client's instance.
+
+        Args:
+            func: the function, e.g. gitea.repo.get_root_files
+            args: arguments of `func`
+
+        Returns:
+            T: what `func` returns
+
+        """
+
+        def call() -> T:
+            _instance.activate(self)
+            if self.repo_filter:
+                api.use_filter(self.repo_filter)
+            return func(*args)
+
+        return contextvars.Context().run(call)
+
+    def run_cached(self, func: Callable[..., T], *args: Any) -> T:
+        """Run a function like run(), reusing its result for `cache_ttl`.
+
+        Args:
+            func: the function, e.g. gitea.repo.get_file_contents
+            args: arguments of `func`; must be hashable
+
+        Returns:
+            T: what `func` returns, or returned within `cache_ttl` seconds
+
+        """
+        key = (func, *args)
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached and now - cached[0] < self.cache_ttl:
+                self._cache.move_to_end(key)
+                return cached[1]
+
+        result = self.run(func, *args)
+        if self.cache_ttl > 0:
+            with self._cache_lock:
+                self._cache[key] = (now, result)
+                self._cache.move_to_end(key)
+                while len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return result
+
+    def clear_cache(self) -> None:
+        """Drop every cached response, e.g. after changing repositories."""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def close(self) -> None:
+        """Close the sessions of every thread, and drop cached responses."""
+        super().close()
+        self.clear_cache()
+
+    def list_repos(
+        self,
+        shard: _shard.Shard | None = None,
+        since: datetime | None = None,
+    ) -> api.Repos:
+        """List the repositories on the instance.
+
+        Args:
+            shard: optional; if provided, only list repositories in this shard
+            since: optional; if provided, only list repositories updated after
+                this time
+
+        Returns:
+            api.Repos: list of repositories in the format (owner, repo_name)
+
+        Raises:
+            RuntimeError: no encoding detected in request
+
+        """
+        return self.run(api.list_repos, shard, since)
+
+    def get_file_contents(self, repo: str, file: str) -> str:
+        """Get contents of a file from a repository.
+
+        Args:
+            repo: full repository name
+            file: file that may belong to the repository
+
+        Returns:
+            str: contents of file in repo
+
+        Raises:
+            ValueError: the response failed, or couldn't be decoded
+
+        """
+        return self.run_cached(_repo.get_file_contents, repo, file)
+
+    def get_repo_keys(self, u_repo: str) -> list[tuple[str, str]]:
+        """Get the deploy keys of a repository.
+
+        Args:
+            u_repo: full name of a repository in the format user/repo
+
+        Returns:
+            list[tuple[str, str]]: fingerprint and public key of each key
+
+        Raises:
+            RuntimeError: could not access deploy keys at all
+            ValueError: missing encoding for response
+            KeyError: key response is missing "key" field
+
+        """
+        # Callers may change the list, but not the cached one
+        return list(self.run_cached(_repo.deploy_key.get_repo_keys, u_repo))
+
+    def get_id(self) -> int:
+        """Get the ID of the user the token belongs to.
+
+        Returns:
+            int: user ID
+
+        Raises:
+            RuntimeError: could not get the ID
+
+        """
+        return self.run_cached(_user.get_id)
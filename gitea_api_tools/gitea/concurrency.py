@@ -0,0 +1,274 @@
+import threading
+import time
+from collections import deque
+
+from .. import stats
+
+
+# Requests allowed in flight to an instance at first, and at least and most
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+MAX_LIMIT = 64
+# Latencies of requests that make up a window, whose percentiles are taken
+WINDOW = 20
+# Previous windows whose median latencies make up the baseline
+BASELINE_WINDOWS = 50
+# Percentile of the previous medians taken as the baseline; low, so latency
+# rising slowly with load still stands out
+BASELINE_PERCENTILE = 0.1
+# The limit is decreased when the median latency of a window goes past the
+# baseline by this factor
+LATENCY_TOLERANCE = 2.0
+# Windows in a row that must be slow to decrease the limit, so one unlucky
+# window doesn't
+SLOW_WINDOWS = 2
+# Factor the limit is multiplied by when it's decreased
+BACKOFF = 0.7
+
+
+def is_overloaded(status_code: int) -> bool:
+    """Check whether a response means that the instance is overloaded.
+
+    Args:
+        status_code: HTTP status code of the response
+
+    Returns:
+        bool: True if the instance throttled (429) or failed (5xx) the request
+
+    """
+    return status_code == 429 or status_code >= 500
+
+
+def get_percentile(latencies: list[float], percentile: float) -> float:
+    """Get a percentile of latencies.
+
+    Args:
+        latencies: the latencies, sorted
+        percentile: the percentile between 0 and 1, e.g. 0.9
+
+    Returns:
+        float: the latency at the percentile
+
+    """
+    return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+
+class Limiter:
+    """Limits the requests in flight to an instance, adapting to its load.
+
+    The limit follows AIMD (additive increase, multiplicative decrease), like
+    TCP congestion control. While requests are held back by the limit and
+    the instance keeps up, it grows by one per round of requests. When the
+    instance throttles or fails requests (429 or 5xx), or its latency rises
+    well past its baseline, the limit is multiplied by BACKOFF. Requests sent
+    before a decrease don't adjust the limit again, so a burst of errors
+    decreases it once.
+
+    Latency is compared median to median: each window of WINDOW requests
+    against a low percentile of the medians of previous windows. Slow
+    requests in the tail (e.g. large files) are normal for an instance, so
+    they don't decrease the limit by themselves.
+
+    Threads fetching from the instance (-w) are the upper bound of requests
+    in flight, so the limit can only use the workers it's given.
+
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: float = INITIAL_LIMIT,
+        minimum: int = MIN_LIMIT,
+        maximum: int = MAX_LIMIT,
+    ) -> None:
+        """Initialize the limiter.
+
+        Args:
+            name: name of the instance, used in statistics
+            initial: optional; requests allowed in flight at first
+            minimum: optional; fewest requests allowed in flight
+            maximum: optional; most requests allowed in flight
+
+        """
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        # Requests waiting to be sent, in the order they're sent
+        self._waiting: deque[object] = deque()
+
+        self.completed = 0
+        self.latencies: list[float] = []
+        self.medians: deque[float] = deque(maxlen=BASELINE_WINDOWS)
+        # Slow windows in a row
+        self._slow_windows = 0
+        # Whether requests were held back by the limit since it last changed
+        self._saturated = False
+        # When the limit was last decreased
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+        self._record_limit()
+
+    @property
+    def section(self) -> str:
+        """Get the section of the limiter in the statistics."""
+        return f"concurrency ({self.name})"
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """Wait until a request can be sent.
+
+        Args:
+            timeout: optional; most seconds to wait; if None, wait until a
+                request can be sent
+
+        Returns:
+            bool: True if the request can be sent; False if it timed out
+
+        """
+        with self._condition:
+            # Requests already waiting go first, in order, so none of them
+            # starve; Condition doesn't wake waiters in order by itself
+            if self.in_flight >= int(self.limit) or self._waiting:
+                self._saturated = True
+                stats.increment(self.section, "waits")
+                ticket = object()
+                self._waiting.append(ticket)
+                try:
+                    sent = self._condition.wait_for(
+                        lambda: (
+                            self._waiting[0] is ticket
+                            and self.in_flight < int(self.limit)
+                        ),
+                        timeout,
+                    )
+                finally:
+                    self._waiting.remove(ticket)
+                    # The next request may be able to go now
+                    self._condition.notify_all()
+                if not sent:
+                    return False
+            self.in_flight += 1
+            if self.in_flight >= int(self.limit):
+                self._saturated = True
+            return True
+
+    def release(self, latency: float, overloaded: bool = False) -> None:
+        """Finish a request, adjusting the limit to how it went.
+
+        Args:
+            latency: seconds the request took
+            overloaded: optional; whether the instance throttled or failed
+                the request, or couldn't be reached
+
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self.completed += 1
+            slow = False
+            if overloaded:
+                stats.increment(self.section, "overloaded responses")
+            else:
+                self.latencies.append(latency)
+                if len(self.latencies) >= WINDOW:
+                    slow = self._end_window()
+
+            # Requests sent before the last decrease say nothing about the
+            # current limit
+            if time.monotonic() - latency <= self._last_decrease:
+                pass
+            elif overloaded:
+                self._decrease("errors")
+            elif slow:
+                self._decrease("latency")
+            elif self._saturated:
+                self._increase()
+            self._condition.notify_all()
+
+    def _end_window(self) -> bool:
+        """Record the percentiles of a full window, and start the next one.
+
+        The condition must be held.
+
+        Returns:
+            bool: True if the median latency of the last SLOW_WINDOWS
+                windows rose well past the baseline of previous windows
+
+        """
+        latencies = sorted(self.latencies)
+        self.latencies.clear()
+        median = get_percentile(latencies, 0.5)
+        stats.record(self.section, "p50 latency (ms)", round(median * 1000))
+        stats.record(
+            self.section,
+            "p90 latency (ms)",
+            round(get_percentile(latencies, 0.9) * 1000),
+        )
+
+        if self.medians and median > LATENCY_TOLERANCE * get_percentile(
+            sorted(self.medians), BASELINE_PERCENTILE
+        ):
+            self._slow_windows += 1
+        else:
+            self._slow_windows = 0
+        self.medians.append(median)
+        return self._slow_windows >= SLOW_WINDOWS
+
+    def _increase(self) -> None:
+        """Increase the limit by one per round of requests.
+
+        The condition must be held.
+
+        """
+        before = int(self.limit)
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        if int(self.limit) > before:
+            self._saturated = False
+            stats.increment(self.section, "increases")
+            self._record_limit()
+
+    def _decrease(self, reason: str) -> None:
+        """Multiply the limit by BACKOFF.
+
+        The condition must be held.
+
+        Args:
+            reason: why the limit is decreased, e.g. errors
+
+        """
+        self.limit = max(self.minimum, self.limit * BACKOFF)
+        self._saturated = False
+        self._last_decrease = time.monotonic()
+        self._slow_windows = 0
+        # Latencies under the previous limit no longer apply
+        self.latencies.clear()
+        stats.increment(self.section, f"decreases ({reason})")
+        self._record_limit()
+
+    def _record_limit(self) -> None:
+        """Record the current limit in the statistics.
+
+        The condition must be held.
+
+        """
+        stats.record(self.section, "limit", int(self.limit))
+
+
+_limiters: dict[str, Limiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host: str) -> Limiter:
+    """Get the limiter of an instance.
+
+    Args:
+        host: the instance, e.g. its API URL
+
+    Returns:
+        Limiter: the limiter, shared by every request to the instance
+
+    """
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = Limiter(host)
+        return _limiters[host]
@@ -0,0 +1,160 @@
+import fnmatch
+import re
+from collections.abc import Iterable
+from typing import Any
+
+
+# Repository types that `repos/search` can be limited to
+MODES = ("fork", "source", "mirror", "collaborative")
+
+
+def compile_globs(patterns: Iterable[str]) -> re.Pattern[str] | None:
+    """Compile glob patterns into a single regular expression.
+
+    Args:
+        patterns: glob patterns like org/* or */*-deprecated
+
+    Returns:
+        re.Pattern[str] | None: matches anything that matches any pattern;
+            None if there are no patterns
+
+    """
+    translated = [fnmatch.translate(pattern) for pattern in patterns]
+    if not translated:
+        return None
+    return re.compile("|".join(translated))
+
+
+class RepoFilter:
+    """Narrows down the repositories to scan before any are requested.
+
+    Filters supported by `repos/search` are sent with the search, so the
+    instance never returns the repositories they exclude. Include and exclude
+    globs on full repository names are checked as soon as repositories are
+    listed, before any request is made for them.
+
+    """
+
+    def __init__(
+        self,
+        query: str | None = None,
+        topic: bool = False,
+        mode: str | None = None,
+        private: bool | None = None,
+        exclusive: bool = False,
+        template: bool = True,
+        include: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+    ) -> None:
+        """Initialize the filter.
+
+        Args:
+            query: optional; keyword to search for
+            topic: optional; if True, the keyword must be a topic
+            mode: optional; only search repositories of this type, one of
+                MODES
+            private: optional; if True, only search private repositories; if
+                False, only public ones; if None, both
+            exclusive: optional; if True, only search repositories owned by
+                the configured user ID
+            template: optional; if False, skip template repositories
+            include: optional; glob patterns; if any, only search repositories
+                with full names matching one of them
+            exclude: optional; glob patterns; skip repositories with full
+                names matching any of them
+
+        Raises:
+            ValueError: mode is not one of MODES
+
+        """
+        if mode and mode not in MODES:
+            raise ValueError(f"{mode} is not one of {', '.join(MODES)}")
+
+        self.query = query
+        self.topic = topic
+        self.mode = mode
+        self.private = private
+        self.exclusive = exclusive
+        self.template = template
+        self.include = compile_globs(include)
+        self.exclude = compile_globs(exclude)
+
+    def get_params(self) -> dict[str, str]:
+        """Get the parameters to send with `repos/search`.
+
+        Returns:
+            dict[str, str]: query parameters, with only the filters in use
+
+        """
+        params: dict[str, str] = {}
+        if self.query:
+            params["q"] = self.query
+            if self.topic:
+                params["topic"] = "true"
+        if self.mode:
+            params["mode"] = self.mode
+        if self.private is not None:
+            params["is_private"] = str(self.private).lower()
+        if self.exclusive:
+            params["exclusive"] = "true"
+        if not self.template:
+            params["template"] = "false"
+        return params
+
+    def match_name(self, full_name: str) -> bool:
+        """Check a full repository name against the globs.
+
+        Args:
+            full_name: full name of a repository in the format user/repo
+
+        Returns:
+            bool: True if the repository should be scanned; False otherwise
+
+        """
+        if self.include and not self.include.match(full_name):
+            return False
+        return not (self.exclude and self.exclude.match(full_name))
+
+    def match(self, record: dict[str, Any], uid: int | None = None) -> bool:
+        """Check a repository against every filter, without the instance.
+
+        This is used where `repos/search` can't apply the filters itself,
+        e.g. when answering from a snapshot.
+
+        Args:
+            record: the repository as returned by `repos/search`
+            uid: optional; the configured user ID, for exclusive searches
+
+        Returns:
+            bool: True if the repository should be scanned; False otherwise
+
+        """
+        if not self.match_name(record["full_name"]):
+            return False
+
+        if self.query:
+            query = self.query.lower()
+            if self.topic:
+                topics = [topic.lower() for topic in record.get("topics", [])]
+                if query not in topics:
+                    return False
+            elif query not in record["full_name"].split("/")[-1].lower():
+                return False
+
+        match self.mode:
+            case "fork" if not record.get("fork"):
+                return False
+            case "mirror" if not record.get("mirror"):
+                return False
+            case "source" if record.get("fork") or record.get("mirror"):
+                return False
+
+        if self.private is not None and (
+            bool(record.get("private")) != self.private
+        ):
+            return False
+
+        if self.exclusive and uid and record.get("owner", {}).get("id") != uid:
+            return False
+
+        return self.template or not record.get("template")
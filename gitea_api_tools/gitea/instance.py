@@ -0,0 +1,266 @@
+import argparse
+import threading
+import time
+import weakref
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import TracebackType
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import concurrency as _concurrency
+from .. import config
+from .. import deadline
+from .. import progress
+
+
+class AccessDenied(PermissionError):
+    """The instance refused the token (401) or its permissions (403).
+
+    Unlike missing files, this usually affects every request (e.g. the token
+    expired or was revoked), so scans stop instead of skipping repositories.
+
+    """
+
+    def __init__(self, url: str, status_code: int) -> None:
+        """Initialize the error.
+
+        Args:
+            url: URL fragment of the request
+            status_code: HTTP status code of the response, 401 or 403
+
+        """
+        super().__init__(f"Access denied ({status_code}) to {url}")
+        self.status_code = status_code
+
+
+class Instance:
+    """Represents a Gitea instance from a configuration, with its sessions.
+
+    Requests are sent to the instance of the current context (see use()), so
+    several instances can be scanned at once in different threads. An
+    instance is safe to share between threads: requests.Session isn't, so
+    each thread sends requests with its own session, keeping its connection
+    to the instance alive until the thread exits. Requests in flight are
+    limited by the instance's limiter (see gitea.concurrency).
+
+    """
+
+    def __init__(
+        self,
+        u_config: config.Config,
+        limiter: _concurrency.Limiter | None = None,
+    ) -> None:
+        """Initialize the instance.
+
+        Args:
+            u_config: the configuration of the instance, e.g. a profile
+            limiter: optional; limits the requests in flight; defaults to the
+                limiter shared by every client of the same host
+
+        Raises:
+            ValueError: the configuration has no host or token
+
+        """
+        self.name: str | None = getattr(u_config, "name", None)
+        self.config = u_config
+        self.workers: int | None = getattr(u_config, "workers", None)
+
+        try:
+            self.host_api: str = getattr(u_config, "host_api")
+            token = getattr(u_config, "token")
+        except AttributeError as e:
+            raise ValueError("Configuration has no host or token") from e
+
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/json",
+        }
+        self.limiter = limiter or _concurrency.get_limiter(self.host_api)
+        self._local = threading.local()
+        # Sessions are only held by their threads, so they're closed when
+        # their threads exit; these are the ones still open
+        self._sessions: weakref.WeakSet[requests.Session] = weakref.WeakSet()
+        self._sessions_lock = threading.Lock()
+
+    def __enter__(self) -> "Instance":
+        """Use the instance in a with statement, closing it afterwards."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the sessions of the instance."""
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        """Get the session of the current thread, creating it if needed."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            # The session is only used by this thread, so one connection
+            # to the instance is enough
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            weakref.finalize(session, adapter.close)
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.add(session)
+        return session
+
+    def close(self) -> None:
+        """Close the sessions of every thread."""
+        with self._sessions_lock:
+            sessions = list(self._sessions)
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
+
+    def send_request(self, url: str) -> requests.Response:
+        """Request a file from the instance given the `url`.
+
+        With a deadline (see deadline.start()), requests time out when it
+        passes.
+
+        Args:
+            url: URL fragment excluding the hostname
+
+        Returns:
+            requests.Response: the response, if it succeeded
+
+        Raises:
+            AccessDenied: the token was refused, or lacks permissions
+            FileNotFoundError: instance does not have a file at the given url
+            ValueError: no encoding provided
+            deadline.Expired: the deadline passed
+
+        """
+        if deadline.remaining() == 0 or not self.limiter.acquire(
+            deadline.remaining()
+        ):
+            raise deadline.Expired(f"Deadline passed before requesting {url}")
+
+        progress.count("requests")
+        start = time.perf_counter()
+        overloaded = True
+        try:
+            response = self.session.get(
+                f"{self.host_api}/{url}", timeout=deadline.remaining()
+            )
+            overloaded = _concurrency.is_overloaded(response.status_code)
+        except requests.exceptions.Timeout as e:
+            if deadline.expired():
+                # The deadline passed, not the instance
+                overloaded = False
+                raise deadline.Expired(
+                    f"Deadline passed requesting {url}"
+                ) from e
+            raise
+        finally:
+            self.limiter.release(time.perf_counter() - start, overloaded)
+
+        if response.status_code in (401, 403):
+            raise AccessDenied(url, response.status_code)
+        elif response.status_code != 200:
+            raise FileNotFoundError(f"Project does not have file at {url}")
+        elif not response.encoding:
+            raise ValueError("Could not decode file")
+
+        return response
+
+
+_current: ContextVar[Instance | None] = ContextVar("instance", default=None)
+# The instance at the top level of the configuration, created when needed
+_default: Instance | None = None
+_default_lock = threading.Lock()
+
+
+def current() -> Instance | None:
+    """Get the instance of the current context.
+
+    Returns:
+        Instance | None: the instance; None if requests go to the instance
+            at the top level of the configuration
+
+    """
+    return _current.get()
+
+
+def get_default() -> Instance:
+    """Get the instance at the top level of the configuration.
+
+    It's created on first use, so the tools can be imported without a token.
+
+    Returns:
+        Instance: the instance
+
+    Raises:
+        ValueError: the configuration has no host or token
+
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Instance(config.user_config)
+        return _default
+
+
+def activate(instance: Instance) -> None:
+    """Send requests of the current context to an instance from now on.
+
+    Args:
+        instance: the instance
+
+    """
+    _current.set(instance)
+
+
+@contextmanager
+def use(instance: Instance) -> Iterator[Instance]:
+    """Send requests of the current context to an instance, temporarily.
+
+    Args:
+        instance: the instance
+
+    Returns:
+        Iterator[Instance]: the instance, for use in a with statement
+
+    """
+    token = _current.set(instance)
+    try:
+        yield instance
+    finally:
+        _current.reset(token)
+
+
+def parse_profiles(text: str) -> list[str]:
+    """Parse profiles from the command line, separated by commas.
+
+    Args:
+        text: profile names like a,b,c
+
+    Returns:
+        list[str]: names of the profiles, without duplicates
+
+    Raises:
+        argparse.ArgumentTypeError: a profile doesn't exist
+
+    """
+    names = list(dict.fromkeys(name.strip() for name in text.split(",")))
+    known = config.get_profile_names()
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"Unknown profile(s): {', '.join(unknown)}"
+        )
+
+    return names
@@ -0,0 +1,345 @@
+import atexit
+import json
+import subprocess
+import threading
+from base64 import b64encode
+from collections import OrderedDict
+from pathlib import Path
+
+from . import api
+
+
+# Most cat-file processes kept open at once; the least recently used closes
+MAX_PROCESSES = 16
+# File modes of regular files in a tree; symlinks and submodules are skipped
+FILE_MODES = (b"100644", b"100755")
+
+
+class GitUnavailable(RuntimeError):
+    """git couldn't be started, or its cat-file process stopped.
+
+    Unlike FileNotFoundError from reads, this says nothing about the
+    repository, so it's read from the API instead.
+
+    """
+
+
+class CatFile:
+    """Reads objects from a bare repository with `git cat-file --batch`.
+
+    The process is long-lived, so each object costs a round trip through a
+    pipe instead of starting git. Reads are serialized, since the process
+    answers one object at a time.
+
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Start the process.
+
+        Args:
+            path: path to the bare repository
+
+        Raises:
+            GitUnavailable: git couldn't be started, e.g. it isn't installed
+
+        """
+        self.path = path
+        # Number of reads waiting for or using the process
+        self.users = 0
+        self._lock = threading.Lock()
+        try:
+            self._process = subprocess.Popen(
+                ["git", "--git-dir", str(path), "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise GitUnavailable(f"git could not be started: {e}") from e
+
+    def read(self, obj: str) -> tuple[str, str, bytes]:
+        """Read an object.
+
+        Args:
+            obj: name of the object, e.g. HEAD:requirements.txt
+
+        Returns:
+            tuple[str, str, bytes]: hash of the object, its type (e.g. blob),
+                and its contents
+
+        Raises:
+            FileNotFoundError: the object doesn't exist
+            GitUnavailable: the process stopped
+
+        """
+        with self._lock:
+            stdin = self._process.stdin
+            stdout = self._process.stdout
+            if not stdin or not stdout:
+                raise GitUnavailable(f"{self.path} can't be read")
+
+            try:
+                stdin.write(f"{obj}\n".encode())
+                stdin.flush()
+                line = stdout.readline()
+            except OSError as e:
+                raise GitUnavailable(f"git cat-file stopped: {e}") from e
+            if not line:
+                raise GitUnavailable(f"git cat-file stopped in {self.path}")
+
+            header = line.decode().split()
+            if len(header) != 3:
+                # e.g. "HEAD:setup.py missing"
+                raise FileNotFoundError(f"{obj} is not in {self.path}")
+
+            sha, kind, size = header
+            contents = stdout.read(int(size))
+            # Each object ends with a newline
+            stdout.read(1)
+
+        return sha, kind, contents
+
+    def close(self) -> None:
+        """Stop the process."""
+        with self._lock:
+            if self._process.stdin:
+                self._process.stdin.close()
+            self._process.wait()
+
+
+def parse_tree(contents: bytes, hash_size: int) -> dict[str, str]:
+    """Parse the files of a tree object.
+
+    Each entry of a tree is "<mode> <name>\\0" followed by the hash of the
+    object in binary.
+
+    Args:
+        contents: contents of the tree
+        hash_size: size of hashes in bytes; 20 for SHA-1, 32 for SHA-256
+
+    Returns:
+        dict[str, str]: names of regular files mapped to their blob hashes
+
+    """
+    files = {}
+    i = 0
+    while i < len(contents):
+        space = contents.index(b" ", i)
+        nul = contents.index(b"\0", space)
+        mode = contents[i:space]
+        name = contents[space + 1 : nul].decode(errors="replace")
+        i = nul + 1 + hash_size
+        if mode in FILE_MODES:
+            files[name] = contents[nul + 1 : i].hex()
+
+    return files
+
+
+class LocalMirrors:
+    """Reads repositories from a directory of bare mirrors on disk.
+
+    Repositories are found at <owner>/<repo>.git (as Gitea stores them) or
+    <owner>/<repo>, and read at HEAD. Each repository gets its own cat-file
+    process, kept in a pool of at most MAX_PROCESSES.
+
+    """
+
+    def __init__(self, root: Path, max_processes: int = MAX_PROCESSES) -> None:
+        """Initialize the mirrors.
+
+        Args:
+            root: directory of the mirrors
+            max_processes: optional; most cat-file processes kept open at once
+
+        """
+        self.root = root
+        self.max_processes = max_processes
+        self._processes: OrderedDict[Path, CatFile] = OrderedDict()
+        self._lock = threading.Lock()
+        # Cleared if git can't be started, so repositories use the API
+        self.available = True
+
+    def find(self, u_repo: str) -> Path | None:
+        """Find the mirror of a repository.
+
+        Args:
+            u_repo: full repository name
+
+        Returns:
+            Path | None: path to the bare repository; None if it isn't mirrored
+                or git can't be started
+
+        """
+        if not self.available:
+            return None
+
+        for name in dict.fromkeys([u_repo, u_repo.lower()]):
+            for path in (self.root / f"{name}.git", self.root / name):
+                if (path / "HEAD").is_file():
+                    return path
+
+        return None
+
+    def read(self, u_repo: str, obj: str) -> tuple[str, str, bytes] | None:
+        """Read an object from the mirror of a repository.
+
+        Args:
+            u_repo: full repository name
+            obj: name of the object, e.g. HEAD:requirements.txt
+
+        Returns:
+            tuple[str, str, bytes] | None: hash, type and contents of the
+                object; None if the repository isn't mirrored, or couldn't be
+                read with git
+
+        Raises:
+            FileNotFoundError: the object doesn't exist
+
+        """
+        path = self.find(u_repo)
+        if not path:
+            return None
+
+        with self._lock:
+            cat_file = self._processes.get(path)
+            if not cat_file:
+                try:
+                    cat_file = CatFile(path)
+                except GitUnavailable as e:
+                    self.available = False
+                    api.config.logger.warning(
+                        f"{e}; reading repositories from the API instead"
+                    )
+                    return None
+                self._processes[path] = cat_file
+                self._evict()
+            self._processes.move_to_end(path)
+            cat_file.users += 1
+
+        try:
+            return cat_file.read(obj)
+        except GitUnavailable as e:
+            api.config.logger.warning(
+                f"{e}; reading {u_repo} from the API instead"
+            )
+            with self._lock:
+                if self._processes.get(path) is cat_file:
+                    del self._processes[path]
+            return None
+        finally:
+            with self._lock:
+                cat_file.users -= 1
+
+    def _evict(self) -> None:
+        """Close the least recently used processes that aren't in use.
+
+        The pool's lock must be held.
+
+        """
+        idle = [
+            path
+            for path, cat_file in self._processes.items()
+            if not cat_file.users
+        ]
+        for path in idle[: len(self._processes) - self.max_processes]:
+            self._processes.pop(path).close()
+
+    def get_root_files(self, u_repo: str) -> dict[str, str] | None:
+        """Get the files in the root directory of a repository.
+
+        Args:
+            u_repo: full repository name
+
+        Returns:
+            dict[str, str] | None: file names mapped to their blob SHA, like
+                gitea.repo.get_root_files(); None if the repository isn't
+                mirrored
+
+        """
+        try:
+            read = self.read(u_repo, "HEAD^{tree}")
+        except FileNotFoundError:
+            # cat-file answered "missing": the mirror has no commits
+            return {}
+        if read is None:
+            return None
+
+        sha, _, contents = read
+        return parse_tree(contents, len(sha) // 2)
+
+    def get_file_response(self, u_repo: str, file: str) -> str | None:
+        """Get a file from a repository, in the form of an API response.
+
+        The response can be decoded with api.decode(), like one from the API.
+
+        Args:
+            u_repo: full repository name
+            file: name of the file
+
+        Returns:
+            str | None: the response; None if the repository isn't mirrored
+
+        Raises:
+            FileNotFoundError: the file isn't in the repository
+
+        """
+        read = self.read(u_repo, f"HEAD:{file}")
+        if read is None:
+            return None
+
+        sha, kind, contents = read
+        if kind != "blob":
+            raise FileNotFoundError(f"{file} in {u_repo} is not a file")
+
+        return json.dumps(
+            {
+                "name": file.rsplit("/", 1)[-1],
+                "path": file,
+                "sha": sha,
+                "type": "file",
+                "size": len(contents),
+                "encoding": "base64",
+                "content": b64encode(contents).decode(),
+            }
+        )
+
+    def close(self) -> None:
+        """Stop every cat-file process."""
+        with self._lock:
+            while self._processes:
+                _, cat_file = self._processes.popitem()
+                cat_file.close()
+
+
+_mirrors: dict[Path, LocalMirrors] = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirrors() -> LocalMirrors | None:
+    """Get the local mirrors of the instance requests are sent to.
+
+    Mirrors are configured with "git_mirrors", the path to a directory of
+    bare repositories, at the top level of the configuration or in a
+    profile. They aren't used offline, since snapshots answer every request.
+
+    Returns:
+        LocalMirrors | None: the mirrors; None if they aren't configured
+
+    """
+    root = getattr(api.get_config(), "git_mirrors", None)
+    if not root or api.get_offline():
+        return None
+
+    path = Path(root).expanduser()
+    with _mirrors_lock:
+        if path not in _mirrors:
+            _mirrors[path] = LocalMirrors(path)
+        return _mirrors[path]
+
+
+@atexit.register
+def close_mirrors() -> None:
+    """Stop the cat-file processes of every mirror."""
+    with _mirrors_lock:
+        for mirrors in _mirrors.values():
+            mirrors.close()
@@ -0,0 +1,104 @@
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from .. import progress
+from .. import stats
+
+
+# Section of --stats counting the repositories skipped by scans
+STATS_SECTION = "skipped repos"
+
+
+class RepoRecord:
+    """Defines a repository as listed by `repos/search`.
+
+    Besides the full name, the search already returns metadata like whether
+    a repository is empty or whether the user is an admin of it. Scans use it
+    to skip repositories that can't have results, without requesting
+    anything.
+
+    Fields missing from a record (e.g. from older Gitea versions) are treated
+    as unknown, so the repository isn't skipped.
+
+    """
+
+    def __init__(self, record: dict[str, Any]) -> None:
+        """Initialize the record from the search result.
+
+        Args:
+            record: the repository as returned by `repos/search`
+
+        """
+        self.full_name: str = record["full_name"]
+        self.updated: str | None = record.get("updated_at")
+        self.empty: bool = bool(record.get("empty", False))
+        # Size in KiB
+        self.size: int | None = record.get("size")
+        self.fork: bool = bool(record.get("fork", False))
+        self.mirror: bool = bool(record.get("mirror", False))
+        # The primary language only; others may be used too
+        self.language: str | None = record.get("language") or None
+
+        permissions = record.get("permissions")
+        self.admin: bool | None = (
+            permissions.get("admin") if isinstance(permissions, dict) else None
+        )
+
+    def __str__(self) -> str:
+        """Return the full repository name."""
+        return self.full_name
+
+    def has_files(self) -> bool:
+        """Check whether the repository may have any files.
+
+        Returns:
+            bool: False if the repository is empty (i.e. has no commits)
+
+        """
+        return not self.empty
+
+    def can_read_keys(self) -> bool:
+        """Check whether the deploy keys of the repository may be read.
+
+        Only admins of a repository can read its deploy keys; otherwise, the
+        request is rejected.
+
+        Returns:
+            bool: False if the user isn't an admin of the repository
+
+        """
+        return self.admin is not False
+
+
+def keep(
+    records: Iterable[RepoRecord],
+    check: Callable[[RepoRecord], bool],
+    reason: str,
+) -> list[RepoRecord]:
+    """Keep the records passing a check, counting the others in --stats.
+
+    Skipped records are also counted as done by --progress.
+
+    Args:
+        records: the records
+        check: function returning False for records to skip, e.g.
+            RepoRecord.has_files
+        reason: why records are skipped, e.g. empty
+
+    Returns:
+        list[RepoRecord]: the records that passed
+
+    """
+    kept = []
+    skipped = 0
+    for record in records:
+        if check(record):
+            kept.append(record)
+        else:
+            skipped += 1
+
+    if skipped:
+        stats.increment(STATS_SECTION, reason, skipped)
+        progress.advance(skipped)
+
+    return kept
@@ -1,10 +1,15 @@
-from collections.abc import Iterable
+import json
+from collections.abc import Container, Iterable
+from typing import TypeAlias
 
 from . import (
     deploy_key,
 )
 
 from .. import api
+from .. import local
+from .. import shard as _shard
+from ... import profiling
 
 
 __all__ = [
@@ -16,30 +21,78 @@ ERR_NO_FILE = (
     ValueError,
 )
 
+# Repository name, package file name, blob SHA, undecoded response (if any)
+PkgResponse: TypeAlias = tuple[str, str, str, str | bytes | None]
 
-def uses_language(repo: str, language: str) -> bool:
-    """Check whether a repository is using the requested programming language.
+
+@profiling.phase("language check")
+def get_languages(repo: str) -> dict[str, int]:
+    """Get the programming languages used by a repository.
 
     Args:
         repo: full repository name
-        language: programming language
 
     Returns:
-        bool: True if the repository is using the language; False otherwise
+        dict[str, int]: languages mapped to the bytes of code in each; empty
+            if the repository has no code or its languages couldn't be read
 
     """
     try:
-        languages = api.get_response(f"repos/{repo}/languages")
+        languages = api.get_json(f"repos/{repo}/languages")
     except FileNotFoundError:
         # Repository may not have any code
-        return False
+        return {}
     except ValueError:
         api.config.logger.error(
             api.ERR_NO_ENCODING.format("checking languages")
         )
-        return False
+        return {}
+
+    return languages if isinstance(languages, dict) else {}
+
+
+def uses_language(repo: str, language: str) -> bool:
+    """Check whether a repository is using the requested programming language.
+
+    Args:
+        repo: full repository name
+        language: programming language
+
+    Returns:
+        bool: True if the repository is using the language; False otherwise
+
+    """
+    return language in get_languages(repo)
+
+
+@profiling.phase("fetch")
+def get_file_response(repo: str, file: str) -> str | bytes:
+    """Get the response for a file from a repository, without decoding it.
+
+    The response can be decoded with api.decode() later, possibly in another
+    process. If the repository has a local mirror (see gitea.local), it's read
+    from the mirror instead of the API.
+
+    Args:
+        repo: full repository name
+        file: file that may belong to the repository; if not, raises exceptions
+
+    Returns:
+        str | bytes: undecoded response for the file in repo
 
-    return language in languages
+    Raises:
+        ValueError: response failed
+
+    """
+    try:
+        mirrors = local.get_mirrors()
+        response = mirrors.get_file_response(repo, file) if mirrors else None
+        if response is None:
+            response = api.get_content(f"repos/{repo}/contents/{file}")
+    except api.EX_NO_RESPONSE as e:
+        raise ValueError("Response failed") from e
+
+    return response
 
 
 def get_file_contents(repo: str, file: str) -> str:
@@ -58,34 +111,139 @@ def get_file_contents(repo: str, file: str) -> str:
             2. file encoding not available, so file could not be decoded
 
     """
+    response = get_file_response(repo, file)
     try:
-        response = api.get_response(f"repos/{repo}/contents/{file}")
         return api.decode(response)
-    except api.EX_NO_RESPONSE as e:
-        raise ValueError("Response failed") from e
     except ValueError as e:
         raise ValueError(f"{file} could not be decoded") from e
 
 
-def get_all_python_pkg_files() -> Iterable[tuple[str, str, str]]:
+@profiling.phase("fetch")
+def get_root_files(repo: str) -> dict[str, str]:
+    """Get the files in the root directory of a repository.
+
+    Only metadata is returned by the API, not the contents of the files. If
+    the repository has a local mirror (see gitea.local), it's read from the
+    mirror instead.
+
+    Args:
+        repo: full repository name
+
+    Returns:
+        dict[str, str]: file names mapped to their blob SHA; empty if the
+            repository has no files or couldn't be read
+
+    """
+    mirrors = local.get_mirrors()
+    root_files = mirrors.get_root_files(repo) if mirrors else None
+    if root_files is not None:
+        return root_files
+
+    try:
+        entries = api.get_json(f"repos/{repo}/contents")
+    except FileNotFoundError:
+        # Repository may be empty
+        return {}
+    except json.decoder.JSONDecodeError:
+        api.config.logger.error(f"Could not list root files of {repo}")
+        return {}
+    except ValueError:
+        api.config.logger.error(
+            api.ERR_NO_ENCODING.format("listing root files")
+        )
+        return {}
+
+    return {
+        entry["name"]: entry["sha"]
+        for entry in entries
+        if isinstance(entry, dict) and entry.get("type") == "file"
+    }
+
+
+def get_python_pkg_responses(
+    u_repo: str,
+    pkg_files: Iterable[str],
+    skip: Container[tuple[str, str]] = (),
+    check_language: bool = True,
+) -> list[PkgResponse]:
+    """Get the Python package file response of a repository.
+
+    The root directory is listed first, so only the package file with the
+    highest priority (the first in `pkg_files`) that exists is requested.
+    Repositories with a local mirror aren't checked for their languages, since
+    listing their root directory costs no request.
+
+    Args:
+        u_repo: full repository name
+        pkg_files: names of package files, from highest to lowest priority,
+            e.g. from package.manifests.get_files()
+        skip: optional; names and blob SHAs of files that shouldn't be
+            downloaded, e.g. because they're already cached
+        check_language: optional; if False, the repository is known to use
+            Python (e.g. from its record), so its languages aren't requested
+
+    Returns:
+        list[PkgResponse]: if a package file was found: repository name,
+            package file name, blob SHA, undecoded response; the response is
+            None if the file was in `skip`
+
+    """
+    mirrors = local.get_mirrors()
+    if mirrors and mirrors.find(u_repo):
+        check_language = False
+    if check_language and not uses_language(u_repo, "Python"):
+        return []
+
+    # It is possible for a Python repository not to have either files, so
+    # no error message will be shown.
+    root_files = get_root_files(u_repo)
+    for pkg_file in pkg_files:
+        if pkg_file not in root_files:
+            continue
+        sha = root_files[pkg_file]
+        if (pkg_file, sha) in skip:
+            return [(u_repo, pkg_file, sha, None)]
+        try:
+            return [
+                (u_repo, pkg_file, sha, get_file_response(u_repo, pkg_file))
+            ]
+        except ERR_NO_FILE:
+            continue
+
+    return []
+
+
+def get_all_python_pkg_files(
+    pkg_files: Iterable[str] | None = None,
+    shard: _shard.Shard | None = None,
+) -> Iterable[tuple[str, str, str]]:
     """Get all Python package files.
 
+    Args:
+        pkg_files: optional; names of package files, from highest to lowest
+            priority; defaults to package.manifests.get_files()
+        shard: optional; if provided, only search repositories in this shard
+
     Returns:
         Iterable[tuple[str, str]]: for each iteration:
             repository name, package file name, contents
 
     """
-    repos = api.list_repos()
-    pkg_files = ("poetry.lock", "requirements.txt")
-    for user, repo in repos:
-        u_repo = f"{user}/{repo}"
-        if not uses_language(u_repo, "Python"):
-            continue
-
-        # It is possible for a Python repository not to have either files, so
-        # no error message will be shown.
-        for pkg_file in pkg_files:
+    if pkg_files is None:
+        # package imports gitea, so it can't be imported with this module
+        from ...package import manifests
+
+        pkg_files = manifests.get_files()
+    pkg_files = tuple(pkg_files)
+    for user, repo in api.list_repos(shard):
+        responses = get_python_pkg_responses(f"{user}/{repo}", pkg_files)
+        for u_repo, pkg_file, _, response in responses:
+            if response is None:
+                continue
             try:
-                yield (u_repo, pkg_file, get_file_contents(u_repo, pkg_file))
-            except ERR_NO_FILE:
+                yield (u_repo, pkg_file, api.decode(response))
+            except ValueError:
+                api.config.logger.warning(
+                    f"{pkg_file} in {u_repo} was skipped"
+                )
                 continue
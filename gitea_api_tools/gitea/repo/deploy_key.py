@@ -1,9 +1,17 @@
 import json
 from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime
+from pathlib import Path
 from typing import TypeAlias
 
 from .. import api
+from .. import checkpoint as _checkpoint
+from .. import records as _records
+from .. import shard as _shard
 from ..api import config
+from ... import pipeline
+from ... import profiling
 
 
 config.validate()
@@ -32,7 +40,7 @@ def list_keyed_repos(repos_keys: ReposKeys) -> None:
 
     """
     for (fingerprint, pubkey), repos in repos_keys.items():
-        s_repos = "\n- ".join(repos)
+        s_repos = "\n- ".join(sorted(repos))
         config.logger.info(KEY_MESSAGE.format(pubkey, fingerprint, s_repos))
 
 
@@ -51,6 +59,7 @@ def get_repo_keys(user_repo: str) -> list[tuple[str, str]]:
         RuntimeError: could not access deploy keys at all
         ValueError: missing encoding for response
         KeyError: key response is missing "key" field
+        api.AccessDenied: the token was refused
 
     """
     pubkey_words = 2
@@ -58,7 +67,13 @@ def get_repo_keys(user_repo: str) -> list[tuple[str, str]]:
 
     curr_repo_keys = f"repos/{user_repo}/keys"
     try:
-        response = api.get_response(curr_repo_keys)
+        key_data = api.get_json(curr_repo_keys)
+    except api.AccessDenied as e:
+        if e.status_code != 403:
+            raise
+        # Only admins of a repository can read its keys
+        config.logger.warning(f"Could not access keys for {user_repo}")
+        raise RuntimeError from e
     except FileNotFoundError as e:
         config.logger.warning(f"Could not access keys for {user_repo}")
         raise RuntimeError from e
@@ -66,7 +81,6 @@ def get_repo_keys(user_repo: str) -> list[tuple[str, str]]:
         config.logger.error(api.ERR_NO_ENCODING.format("getting deploy keys"))
         raise ValueError("Could not decode file")
 
-    key_data = json.loads(response)
     for key in key_data:
         if not isinstance(key, dict):
             config.logger.warning(f"{user_repo} response was not a dict/JSON")
@@ -82,19 +96,178 @@ def get_repo_keys(user_repo: str) -> list[tuple[str, str]]:
     return keys
 
 
-def get_keyed_repos() -> None:
-    """Get the deploy keys for all repositories."""
+def dump_results(
+    repos_keys: ReposKeys,
+) -> list[dict[str, str | list[str]]]:
+    """Convert the repositories that belong to each key to JSON results.
+
+    Args:
+        repos_keys: keys tied to repositories
+
+    Returns:
+        list[dict[str, str | list[str]]]: results, readable with
+            load_keyed_repos()
+
+    """
+    return [
+        {"fingerprint": fingerprint, "key": pubkey, "repos": repos}
+        for (fingerprint, pubkey), repos in repos_keys.items()
+    ]
+
+
+def dump_keyed_repos(
+    repos_keys: ReposKeys,
+    file: Path,
+    shard: _shard.Shard | None = None,
+    failed: Iterable[str] = (),
+) -> None:
+    """Write the repositories that belong to each key to a JSON file.
+
+    The file can later be combined with others using `gitea-api merge`.
+
+    Args:
+        repos_keys: keys tied to repositories
+        file: path to the JSON file
+        shard: optional; the shard the results were collected from
+        failed: optional; profiles that couldn't be scanned, so the results
+            are missing them
+
+    """
+    with file.open("w") as f:
+        json.dump(
+            {
+                "command": "deploy_keys",
+                "shard": _shard.to_str(shard) if shard else None,
+                "failed_profiles": sorted(failed),
+                "results": dump_results(repos_keys),
+            },
+            fp=f,
+            indent=4,
+        )
+
+
+def load_keyed_repos(results: list[dict[str, str | list[str]]]) -> ReposKeys:
+    """Load the repositories that belong to each key from JSON results.
+
+    Args:
+        results: results from dump_results()
+
+    Returns:
+        ReposKeys: keys tied to repositories
+
+    Raises:
+        ValueError: results are malformed
+
+    """
     repos_keys: ReposKeys = defaultdict(list)
+    try:
+        for result in results:
+            key = (str(result["fingerprint"]), str(result["key"]))
+            repos_keys[key].extend(result["repos"])
+    except (KeyError, TypeError) as e:
+        raise ValueError("Deploy key results are malformed") from e
 
-    repos = api.list_repos()
-    for user, repo in repos:
-        u_repo = f"{user}/{repo}"
-        try:
-            keys = get_repo_keys(u_repo)
-        except EX_REPO_KEYS:
-            config.logger.error(f"Due to errors, {u_repo} has been skipped")
-            continue
-        for key in keys:
-            repos_keys[key].append(u_repo)
+    return repos_keys
+
+
+@profiling.phase("fetch")
+def get_keys_of_repo(u_repo: str) -> list[tuple[str, list[tuple[str, str]]]]:
+    """Get the keys of a repository, skipping it if there are errors.
+
+    This is a pipeline stage.
+
+    Args:
+        u_repo: full name of a repository in the format user/repo
+
+    Returns:
+        list[tuple[str, list[tuple[str, str]]]]: repository name and its keys
+            from get_repo_keys(); empty if the repository was skipped
+
+    """
+    try:
+        return [(u_repo, get_repo_keys(u_repo))]
+    except EX_REPO_KEYS:
+        config.logger.error(f"Due to errors, {u_repo} has been skipped")
+        return []
+
+
+def find_keyed_repos(
+    shard: _shard.Shard | None = None,
+    workers: int = 1,
+    since: datetime | None = None,
+    resume: bool = False,
+) -> ReposKeys:
+    """Find the deploy keys of all repositories.
+
+    Repositories that the user isn't an admin of are skipped, since their
+    keys can't be read. Finished repositories are recorded in a checkpoint,
+    so an interrupted scan can be resumed.
+
+    Args:
+        shard: optional; if provided, only search repositories in this shard
+        workers: optional; number of threads fetching from the instance
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, resume an interrupted scan from its
+            checkpoint
+
+    Returns:
+        ReposKeys: keys tied to repositories
+
+    """
+    repos_keys: ReposKeys = defaultdict(list)
+    checkpoint = _checkpoint.Checkpoint(
+        _checkpoint.get_file("deploy_keys", shard), resume
+    )
+
+    # Deploy keys of repositories can only be read by their admins
+    records, finished = checkpoint.split(
+        _records.keep(
+            api.list_records(shard, since),
+            _records.RepoRecord.can_read_keys,
+            "not admin",
+        )
+    )
+    for u_repo, keys in finished.items():
+        for fingerprint, pubkey in keys:
+            repos_keys[(fingerprint, pubkey)].append(u_repo)
+
+    repos = (record.full_name for record in records)
+    scan = pipeline.Pipeline(
+        "deploy_keys", [pipeline.Stage("fetch", get_keys_of_repo, workers)]
+    )
+    with checkpoint:
+        for u_repo, keys in scan.run(repos):
+            for key in keys:
+                repos_keys[key].append(u_repo)
+            checkpoint.add(u_repo, keys)
+
+    return repos_keys
+
+
+def get_keyed_repos(
+    shard: _shard.Shard | None = None,
+    output: Path | None = None,
+    workers: int = 1,
+    since: datetime | None = None,
+    resume: bool = False,
+) -> None:
+    """Get the deploy keys for all repositories.
+
+    Args:
+        shard: optional; if provided, only search repositories in this shard
+        output: optional; if provided, write results to this JSON file
+            instead of listing them
+        workers: optional; number of threads fetching from the instance
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, resume an interrupted scan from its
+            checkpoint
+
+    """
+    repos_keys = find_keyed_repos(shard, workers, since, resume)
 
-    list_keyed_repos(repos_keys)
+    if output:
+        dump_keyed_repos(repos_keys, output, shard)
+    else:
+        list_keyed_repos(repos_keys)
@@ -0,0 +1,69 @@
+import argparse
+import zlib
+from typing import TypeAlias
+
+
+# A shard is represented as (index, count), where index is 1-based; e.g. the
+# first of four shards is (1, 4).
+Shard: TypeAlias = tuple[int, int]
+
+
+def parse(text: str) -> Shard:
+    """Parse a shard from the command line in the format i/N.
+
+    Args:
+        text: shard string like 1/4
+
+    Returns:
+        Shard: the shard index (1-based) and total number of shards
+
+    Raises:
+        argparse.ArgumentTypeError: shard could not be parsed or is out of
+            range
+
+    """
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            f"{text} is not a shard in the format i/N"
+        ) from e
+
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(
+            f"{text} is out of range; i must be between 1 and N"
+        )
+
+    return (index, count)
+
+
+def in_shard(full_name: str, shard: Shard) -> bool:
+    """Check whether a repository belongs to the shard.
+
+    The repository is assigned by a stable hash of its full name, so every
+    runner splitting the same repositories agrees on the assignment. Python's
+    built-in hash() is salted per process, so it can't be used here.
+
+    Args:
+        full_name: full name of a repository in the format user/repo
+        shard: the shard to check against
+
+    Returns:
+        bool: True if the repository belongs to the shard; False otherwise
+
+    """
+    index, count = shard
+    return zlib.crc32(full_name.encode()) % count == index - 1
+
+
+def to_str(shard: Shard) -> str:
+    """Convert the shard back to its command line format.
+
+    Args:
+        shard: the shard
+
+    Returns:
+        str: the shard in the format i/N
+
+    """
+    return "{}/{}".format(*shard)
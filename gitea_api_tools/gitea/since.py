@@ -0,0 +1,84 @@
+import argparse
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+
+# A duration like 90m, 2d or 1h30m
+DURATION_PATTERN = re.compile(r"^(?:[0-9]+[smhdw])+$")
+DURATION_PART = re.compile(r"([0-9]+)([smhdw])")
+DURATION_UNITS = {
+    "s": "seconds",
+    "m": "minutes",
+    "h": "hours",
+    "d": "days",
+    "w": "weeks",
+}
+
+
+def parse(text: str) -> datetime:
+    """Parse a cutoff from the command line, as a timestamp or duration.
+
+    Durations are counted back from now, e.g. 1h is an hour ago.
+
+    Args:
+        text: an ISO 8601 timestamp like 2024-05-20T10:00:00Z, or a duration
+            like 90m, 2d or 1h30m
+
+    Returns:
+        datetime: the cutoff, aware of its time zone; timestamps without a
+            time zone are in local time
+
+    Raises:
+        argparse.ArgumentTypeError: cutoff could not be parsed
+
+    """
+    if DURATION_PATTERN.match(text):
+        duration = timedelta(
+            **{
+                DURATION_UNITS[unit]: int(amount)
+                for amount, unit in DURATION_PART.findall(text)
+            }
+        )
+        return datetime.now(timezone.utc) - duration
+
+    try:
+        return datetime.fromisoformat(text).astimezone()
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            f"{text} is neither a timestamp nor a duration like 1h30m"
+        ) from e
+
+
+def get_updated(record: dict[str, Any]) -> datetime | None:
+    """Get when a repository was last updated.
+
+    Args:
+        record: the repository as returned by `repos/search`
+
+    Returns:
+        datetime | None: when the repository was updated; None if unknown
+
+    """
+    try:
+        return datetime.fromisoformat(record["updated_at"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def is_updated_since(record: dict[str, Any], since: datetime) -> bool:
+    """Check whether a repository was updated since the cutoff.
+
+    Repositories without a known update time are treated as updated, so they
+    aren't missed.
+
+    Args:
+        record: the repository as returned by `repos/search`
+        since: the cutoff
+
+    Returns:
+        bool: True if the repository was updated at or after the cutoff
+
+    """
+    updated = get_updated(record)
+    return updated is None or updated >= since
@@ -0,0 +1,377 @@
+import json
+import re
+import sqlite3
+import threading
+from base64 import b64encode
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from .. import config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS repos (
+    full_name TEXT PRIMARY KEY,
+    record TEXT NOT NULL,
+    languages TEXT
+);
+CREATE TABLE IF NOT EXISTS root_files (
+    repo TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    PRIMARY KEY (repo, name)
+);
+CREATE TABLE IF NOT EXISTS manifests (
+    repo TEXT NOT NULL,
+    file TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    contents TEXT NOT NULL,
+    PRIMARY KEY (repo, file)
+);
+CREATE TABLE IF NOT EXISTS requirements (
+    repo TEXT NOT NULL,
+    file TEXT NOT NULL,
+    package TEXT NOT NULL,
+    version TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requirements_package ON requirements (package);
+CREATE TABLE IF NOT EXISTS keys_readable (
+    repo TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS deploy_keys (
+    repo TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    key TEXT NOT NULL,
+    title TEXT
+);
+"""
+
+# Let SQLite memory-map up to this many bytes of the snapshot when reading
+MMAP_SIZE = 1 << 30
+
+# API endpoints of a repository that can be answered from a snapshot
+REPO_URL = re.compile(
+    r"^repos/(?P<repo>[^/?]+/[^/?]+)/(?P<endpoint>languages|contents|keys)"
+    r"(?:/(?P<path>[^?]+))?$"
+)
+
+
+class Snapshot:
+    """Represents a scan of the instance stored in a single SQLite file.
+
+    Repositories, languages, root files, Python package files (with parsed
+    requirements) and deploy keys are stored in tables, so the file can be
+    queried directly. When used for `gitea-api --offline`, get_response()
+    answers API requests from those tables instead of the instance.
+
+    A writable snapshot is written to a temporary file, which replaces the
+    snapshot only once it's closed without an error. Use it as a context
+    manager, so a failed scan keeps the previous snapshot.
+
+    """
+
+    def __init__(self, file: Path, writable: bool = False) -> None:
+        """Initialize the snapshot from its file.
+
+        Args:
+            file: path to the snapshot
+            writable: optional; if True, the snapshot is created or replaced;
+                otherwise, it's opened read-only
+
+        Raises:
+            FileNotFoundError: snapshot doesn't exist and isn't writable
+
+        """
+        self.file = file
+        self.writable = writable
+        self._local = threading.local()
+
+        # Written to until the snapshot is closed, then moved to `file`
+        self.partial = file.with_name(f"{file.name}.tmp")
+
+        if writable:
+            self.partial.unlink(missing_ok=True)
+            self.connection.executescript(SCHEMA)
+        elif not file.is_file():
+            raise FileNotFoundError(f"Snapshot {file} does not exist")
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Get the connection to the snapshot for the current thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.writable:
+                connection = sqlite3.connect(self.partial)
+            else:
+                connection = sqlite3.connect(
+                    f"{self.file.resolve().as_uri()}?mode=ro", uri=True
+                )
+                connection.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        """Commit and close the connection of the current thread.
+
+        A writable snapshot then replaces the previous one.
+
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.commit()
+            connection.close()
+            self._local.connection = None
+        if self.writable and self.partial.exists():
+            self.partial.replace(self.file)
+
+    def discard(self) -> None:
+        """Close the connection of the current thread, dropping any writes.
+
+        The previous snapshot, if any, is kept.
+
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+        if self.writable:
+            self.partial.unlink(missing_ok=True)
+
+    def __enter__(self) -> "Snapshot":
+        """Use the snapshot until the block exits."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the snapshot, discarding writes if the block failed."""
+        if exc_type:
+            self.discard()
+        else:
+            self.close()
+
+    # Writing
+
+    def set_meta(self, key: str, value: str) -> None:
+        """Store metadata about the snapshot, like the host.
+
+        Args:
+            key: name of the metadata
+            value: value of the metadata
+
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value)
+        )
+
+    def add_repo(self, record: dict[str, Any], languages: str | None) -> None:
+        """Store a repository.
+
+        Args:
+            record: the repository as returned by `repos/search`
+            languages: response from the languages endpoint; None if the
+                languages couldn't be read
+
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO repos VALUES (?, ?, ?)",
+            (record["full_name"], json.dumps(record), languages),
+        )
+
+    def add_root_files(self, repo: str, root_files: dict[str, str]) -> None:
+        """Store the files in the root directory of a repository.
+
+        Args:
+            repo: full repository name
+            root_files: file names mapped to their blob SHA
+
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO root_files VALUES (?, ?, ?)",
+            [(repo, name, sha) for name, sha in root_files.items()],
+        )
+
+    def add_manifest(
+        self,
+        repo: str,
+        file: str,
+        sha: str,
+        contents: str,
+        requirements: dict[str, str],
+    ) -> None:
+        """Store a package file and its parsed requirements.
+
+        Args:
+            repo: full repository name
+            file: package file name
+            sha: blob SHA of the package file
+            contents: contents of the package file
+            requirements: dictionary of packages to versions
+
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO manifests VALUES (?, ?, ?, ?)",
+            (repo, file, sha, contents),
+        )
+        self.connection.executemany(
+            "INSERT INTO requirements VALUES (?, ?, ?, ?)",
+            [(repo, file, pkg, ver) for pkg, ver in requirements.items()],
+        )
+
+    def add_keys(self, repo: str, keys: list[dict[str, Any]]) -> None:
+        """Store the deploy keys of a repository.
+
+        Args:
+            repo: full repository name
+            keys: keys as returned by the keys endpoint
+
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO keys_readable VALUES (?)", (repo,)
+        )
+        self.connection.executemany(
+            "INSERT INTO deploy_keys VALUES (?, ?, ?, ?)",
+            [
+                (repo, key["fingerprint"], key["key"], key.get("title"))
+                for key in keys
+                if isinstance(key, dict)
+            ],
+        )
+
+    # Reading
+
+    def get_response(self, url: str) -> str:
+        """Answer an API request from the snapshot.
+
+        Args:
+            url: URL fragment excluding the hostname, as in api.get_response()
+
+        Returns:
+            str: the response the instance would have given
+
+        Raises:
+            FileNotFoundError: the snapshot has nothing at the given url
+
+        """
+        if url.startswith("repos/search"):
+            return self._search(url)
+
+        parts = REPO_URL.match(url)
+        if not parts:
+            raise FileNotFoundError(f"Snapshot does not have {url}")
+
+        repo = parts.group("repo")
+        path = parts.group("path")
+        match parts.group("endpoint"), path:
+            case "languages", None:
+                return self._languages(repo)
+            case "contents", None:
+                return self._root_files(repo)
+            case "contents", str():
+                return self._manifest(repo, path)
+            case "keys", None:
+                return self._keys(repo)
+
+        raise FileNotFoundError(f"Snapshot does not have {url}")
+
+    def _search(self, url: str) -> str:
+        """Answer `repos/search` with all repositories on the first page.
+
+        Sorting by when repositories were updated is supported, since scans
+        with `--since` rely on it.
+
+        """
+        query = parse_qs(urlsplit(url).query)
+        page = int(query.get("page", ["1"])[0])
+        if page != 1:
+            return json.dumps({"ok": True, "data": []})
+
+        rows = self.connection.execute(
+            "SELECT record FROM repos ORDER BY full_name"
+        )
+        records = [json.loads(record) for (record,) in rows]
+        if query.get("sort") == ["updated"]:
+            records.sort(
+                key=lambda record: record.get("updated_at") or "",
+                reverse=query.get("order") == ["desc"],
+            )
+        return json.dumps({"ok": True, "data": records})
+
+    def _languages(self, repo: str) -> str:
+        row = self.connection.execute(
+            "SELECT languages FROM repos WHERE full_name = ?", (repo,)
+        ).fetchone()
+        if not row or row[0] is None:
+            raise FileNotFoundError(f"Snapshot does not have {repo} languages")
+        return str(row[0])
+
+    def _root_files(self, repo: str) -> str:
+        rows = self.connection.execute(
+            "SELECT name, sha FROM root_files WHERE repo = ?", (repo,)
+        ).fetchall()
+        if not rows:
+            raise FileNotFoundError(f"Snapshot does not have {repo} files")
+        return json.dumps(
+            [{"name": name, "type": "file", "sha": sha} for name, sha in rows]
+        )
+
+    def _manifest(self, repo: str, file: str) -> str:
+        row = self.connection.execute(
+            "SELECT sha, contents FROM manifests WHERE repo = ? AND file = ?",
+            (repo, file),
+        ).fetchone()
+        if not row:
+            raise FileNotFoundError(f"Snapshot does not have {repo}/{file}")
+        sha, contents = row
+        return json.dumps(
+            {
+                "name": file,
+                "sha": sha,
+                "encoding": "base64",
+                "content": b64encode(contents.encode()).decode(),
+            }
+        )
+
+    def _keys(self, repo: str) -> str:
+        if not self.connection.execute(
+            "SELECT 1 FROM keys_readable WHERE repo = ?", (repo,)
+        ).fetchone():
+            raise FileNotFoundError(f"Snapshot does not have {repo} keys")
+        rows = self.connection.execute(
+            "SELECT fingerprint, key, title FROM deploy_keys WHERE repo = ?",
+            (repo,),
+        )
+        return json.dumps(
+            [
+                {"fingerprint": fingerprint, "key": key, "title": title}
+                for fingerprint, key, title in rows
+            ]
+        )
+
+
+def open_offline(file: Path) -> Snapshot:
+    """Open a snapshot for offline use, logging where it came from.
+
+    Args:
+        file: path to the snapshot
+
+    Returns:
+        Snapshot: the snapshot, opened read-only
+
+    """
+    snapshot = Snapshot(file)
+    meta = dict(snapshot.connection.execute("SELECT key, value FROM meta"))
+    config.logger.info(
+        f"Offline: using snapshot of {meta.get('host') or 'unknown host'}"
+        f" from {meta.get('created') or 'unknown time'}"
+    )
+    return snapshot
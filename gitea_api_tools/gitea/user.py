@@ -1,6 +1,5 @@
-import json
-
 from . import api
+from . import instance as _instance
 from .. import config
 
 
@@ -15,13 +14,12 @@ def get_id() -> int:
 
     """
     try:
-        response = api.get_response("user")
+        user = api.get_json("user")
     except FileNotFoundError:
         raise RuntimeError("Could not user information")
     except ValueError:
         raise RuntimeError(api.ERR_NO_ENCODING.format("user"))
 
-    user = json.loads(response)
     try:
         return int(user["id"])
     except KeyError:
@@ -32,6 +30,14 @@ def get_id() -> int:
 
 def store_retrieved_id() -> None:
     """Get the user ID and optionally store it into the configuration."""
+    instance = _instance.current()
+    if instance:
+        config.logger.info(f"Your user ID is {get_id()}.")
+        config.logger.info(
+            f'Add it as "uid" to the profile {instance.name} in config.json.'
+        )
+        return
+
     old_uid = getattr(config.user_config, "uid")
     if old_uid:
         config.logger.warning(
@@ -0,0 +1,195 @@
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from . import config
+from . import gitea
+from . import package
+from . import scan
+
+
+def read_partial(file: Path) -> dict[str, Any]:
+    """Read a partial result file written by a sharded sub-command.
+
+    Args:
+        file: path to the JSON file
+
+    Returns:
+        dict[str, Any]: the contents of the file
+
+    Raises:
+        ValueError: file is missing, malformed or not a partial result
+
+    """
+    try:
+        with file.open() as f:
+            partial = json.load(f)
+    except (OSError, json.decoder.JSONDecodeError) as e:
+        raise ValueError(f"{file} could not be read") from e
+
+    if not isinstance(partial, dict) or "command" not in partial:
+        raise ValueError(f"{file} is not a partial result")
+
+    return partial
+
+
+def check_shards(partials: list[dict[str, Any]]) -> None:
+    """Warn if the shards of the partial results are incomplete or repeated.
+
+    Args:
+        partials: partial results from read_partial()
+
+    """
+    shards = [partial.get("shard") for partial in partials]
+    if None in shards:
+        if len(shards) > 1:
+            config.logger.warning("Some results were not sharded")
+        return
+
+    parsed = [gitea.shard.parse(shard) for shard in shards]
+    counts = {count for _, count in parsed}
+    if len(counts) != 1:
+        config.logger.warning("Results have different numbers of shards")
+        return
+
+    count = counts.pop()
+    indices = [index for index, _ in parsed]
+    missing = sorted(set(range(1, count + 1)) - set(indices))
+    if missing:
+        s_missing = ", ".join(f"{index}/{count}" for index in missing)
+        config.logger.warning(f"Results are missing shards: {s_missing}")
+    if len(indices) != len(set(indices)):
+        config.logger.warning("Some shards were provided more than once")
+
+
+def check_profiles(partials: list[dict[str, Any]]) -> None:
+    """Warn if instances of the partial results couldn't be scanned.
+
+    Args:
+        partials: partial results from read_partial()
+
+    """
+    failed = sorted(
+        {
+            profile
+            for partial in partials
+            for profile in partial.get("failed_profiles", [])
+        }
+    )
+    if failed:
+        config.logger.warning(
+            f"Results are missing profiles that failed: {', '.join(failed)}"
+        )
+
+
+def merge_deploy_keys(partials: list[dict[str, Any]]) -> None:
+    """Merge and list partial results from `gitea-api deploy_keys`.
+
+    Args:
+        partials: partial results from read_partial()
+
+    """
+    repos_keys: gitea.repo.deploy_key.ReposKeys = defaultdict(list)
+    for partial in partials:
+        loaded = gitea.repo.deploy_key.load_keyed_repos(partial["results"])
+        for key, repos in loaded.items():
+            repos_keys[key].extend(repos)
+
+    gitea.repo.deploy_key.list_keyed_repos(repos_keys)
+
+
+def merge_python(partials: list[dict[str, Any]]) -> None:
+    """Merge and list partial results from `gitea-api python`.
+
+    Args:
+        partials: partial results from read_partial()
+
+    Raises:
+        ValueError: results were searched with different packages or versions
+
+    """
+    searches = {
+        (partial["package"], partial["version"]) for partial in partials
+    }
+    if len(searches) != 1:
+        raise ValueError("Results are from different packages or versions")
+
+    _, ver_str = searches.pop()
+    ver_restrict = package.specifier.Specifier(ver_str or "")
+
+    dependents: package.formats.Dependents = {}
+    for partial in partials:
+        dependents.update(partial["results"])
+
+    package.python.list_found_repos(dependents, ver_restrict)
+
+
+def merge_outdated(partials: list[dict[str, Any]]) -> None:
+    """Merge and list partial results from `gitea-api outdated`.
+
+    Args:
+        partials: partial results from read_partial()
+
+    Raises:
+        ValueError: results were compared against different mirrors
+
+    """
+    mirrors = {partial.get("mirror") for partial in partials}
+    if len(mirrors) != 1:
+        raise ValueError("Results are from different mirrors")
+
+    histograms: package.outdated.Histograms = {}
+    for partial in partials:
+        package.outdated.merge_histograms(histograms, partial["results"])
+
+    mirror = mirrors.pop()
+    get_latest = (
+        package.mirror.Mirror(Path(mirror)).get_latest if mirror else None
+    )
+    package.outdated.list_outdated(histograms, get_latest)
+
+
+def merge_languages(partials: list[dict[str, Any]]) -> None:
+    """Merge and list partial results of languages from `gitea-api scan`.
+
+    Args:
+        partials: partial results from read_partial()
+
+    """
+    languages: scan.Languages = {}
+    for partial in partials:
+        languages.update(partial["results"])
+
+    scan.list_languages(languages)
+
+
+def merge_results(files: list[Path]) -> None:
+    """Merge partial results from sharded runs into one report.
+
+    Args:
+        files: paths to JSON files written with `--output`
+
+    Raises:
+        ValueError: results are from different sub-commands
+
+    """
+    partials = [read_partial(file) for file in files]
+    commands = {partial["command"] for partial in partials}
+    if len(commands) != 1:
+        raise ValueError("Results are from different sub-commands")
+
+    check_shards(partials)
+    check_profiles(partials)
+
+    match commands.pop():
+        case "deploy_keys":
+            merge_deploy_keys(partials)
+        case "python":
+            merge_python(partials)
+        case "outdated":
+            merge_outdated(partials)
+        case "languages":
+            merge_languages(partials)
+        case command:
+            raise ValueError(f"Results from {command} can't be merged")
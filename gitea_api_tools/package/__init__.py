@@ -1,11 +1,21 @@
+from . import cache
 from . import formats
+from . import manifests
+from . import mirror
+from . import outdated
 from . import python
+from . import specifier
 from . import version
 
 
 __all__ = [
+    "cache",
     "formats",
+    "manifests",
+    "mirror",
+    "outdated",
     "python",
+    "specifier",
     "version",
 ]
 
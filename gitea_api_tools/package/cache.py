@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from . import formats
+from . import manifests
+from .. import config
+from .. import progress
+from .. import stats
+
+
+CACHE_FILE = config.cache_dir / "requirements-cache.json"
+# Format of the cache file; files in other formats are started over
+CACHE_VERSION = 2
+# Entries not used for this many days are dropped when the cache is saved
+MAX_AGE = 90
+# Only this many entries are kept, dropping the least recently used
+MAX_ENTRIES = 50_000
+# Entries are marked as used again once they're this many days old, so scans
+# that only hit the cache don't rewrite it every time
+TOUCH_AFTER = 7
+# Held while a cache is written, so concurrent scans don't lose entries
+_file_lock = threading.Lock()
+
+
+def get_key(file: str, sha: str) -> str:
+    """Get the key of a package file in the cache.
+
+    Args:
+        file: name of the package file
+        sha: blob SHA of the package file
+
+    Returns:
+        str: the key, with the version of the file's parser
+
+    Raises:
+        ValueError: no parser is registered for the file
+
+    """
+    return f"{file}:{manifests.get_version(file)}:{sha}"
+
+
+def get_day() -> int:
+    """Get the current day, counted from the epoch."""
+    return int(time.time() // 86400)
+
+
+class RequirementsCache:
+    """Caches parsed requirements by the name and blob SHA of package files.
+
+    Identical package files (e.g. from templates or forks) have the same blob
+    SHA, so they only need to be downloaded and parsed once. A changed file
+    has a new SHA, and a changed parser has a new version (see
+    manifests.register()), so stale entries are never used.
+
+    The cache is stored as JSON in the state directory. Entries that haven't
+    been used for MAX_AGE days are pruned, and at most MAX_ENTRIES are kept.
+
+    """
+
+    def __init__(self, file: Path = CACHE_FILE) -> None:
+        """Initialize the cache, loading existing entries from `file`.
+
+        Args:
+            file: optional; path to the cache file; defaults to CACHE_FILE
+
+        """
+        self.file = file
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._modified = False
+        self.entries = self._load()
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        """Load the entries saved to the cache file.
+
+        Returns:
+            dict[str, dict[str, Any]]: keys mapped to their requirements and
+                the day they were last used; empty if the file is missing,
+                malformed or in another format
+
+        """
+        try:
+            with self.file.open() as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.decoder.JSONDecodeError):
+            config.logger.warning(f"{self.file} is malformed; starting over")
+            return {}
+
+        if not (
+            isinstance(saved, dict)
+            and saved.get("version") == CACHE_VERSION
+            and isinstance(saved.get("entries"), dict)
+        ):
+            return {}
+        return saved["entries"]
+
+    def check(self, file: str, sha: str) -> bool:
+        """Check whether requirements of a package file are cached.
+
+        The result is counted as a hit or miss.
+
+        Args:
+            file: name of the package file
+            sha: blob SHA of the package file
+
+        Returns:
+            bool: True if the requirements are cached; False otherwise
+
+        """
+        key = get_key(file, sha)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                progress.count("cache misses")
+                return False
+
+            self.hits += 1
+            progress.count("cache hits")
+            day = get_day()
+            if day - entry["used"] >= TOUCH_AFTER:
+                entry["used"] = day
+                self._modified = True
+            return True
+
+    def __contains__(self, pkg_file: object) -> bool:
+        """Check whether requirements of a (file name, blob SHA) are cached."""
+        if not isinstance(pkg_file, tuple):
+            return False
+        return self.check(*pkg_file)
+
+    def get(self, file: str, sha: str) -> formats.Requirements:
+        """Get cached requirements.
+
+        Args:
+            file: name of the package file
+            sha: blob SHA of the package file
+
+        Returns:
+            formats.Requirements: dictionary of packages to versions
+
+        Raises:
+            KeyError: requirements aren't cached
+
+        """
+        key = get_key(file, sha)
+        with self._lock:
+            return self.entries[key]["requirements"]
+
+    def put(
+        self, file: str, sha: str, requirements: formats.Requirements
+    ) -> None:
+        """Cache requirements.
+
+        Args:
+            file: name of the package file
+            sha: blob SHA of the package file
+            requirements: dictionary of packages to versions
+
+        """
+        key = get_key(file, sha)
+        with self._lock:
+            self.entries[key] = {
+                "requirements": requirements,
+                "used": get_day(),
+            }
+            self._modified = True
+
+    def prune(self) -> None:
+        """Drop entries not used for MAX_AGE days, then past MAX_ENTRIES."""
+        oldest = get_day() - MAX_AGE
+        kept = [
+            (key, entry)
+            for key, entry in self.entries.items()
+            if entry["used"] >= oldest
+        ]
+        if len(kept) > MAX_ENTRIES:
+            kept.sort(key=lambda item: item[1]["used"], reverse=True)
+            del kept[MAX_ENTRIES:]
+        self.entries = dict(kept)
+
+    def save(self) -> None:
+        """Write the cache back to its file, if it changed.
+
+        Entries saved to the file by other caches in the meantime (e.g. from
+        scans of other instances) are kept, unless they're pruned. The file is
+        replaced at once, so a scan stopped while saving leaves the previous
+        cache intact.
+
+        """
+        with self._lock, _file_lock:
+            if not self._modified:
+                return
+            self.entries = self._load() | self.entries
+            self.prune()
+
+            partial = self.file.with_suffix(".tmp")
+            with partial.open("w") as f:
+                json.dump(
+                    {"version": CACHE_VERSION, "entries": self.entries}, fp=f
+                )
+            partial.replace(self.file)
+            self._modified = False
+
+    def record_stats(self) -> None:
+        """Record hits and misses in the statistics."""
+        total = self.hits + self.misses
+        section = "requirements cache"
+        stats.record(section, "hits", self.hits)
+        stats.record(section, "misses", self.misses)
+        stats.record(
+            section, "hit rate", f"{self.hits / total:.0%}" if total else "n/a"
+        )
+        stats.record(section, "entries", len(self.entries))
+        config.logger.debug(
+            f"Requirements cache: {self.hits} hits, {self.misses} misses"
+        )
@@ -4,3 +4,5 @@ from typing import TypeAlias
 Package: TypeAlias = str
 Version: TypeAlias = str
 Requirements: TypeAlias = dict[Package, Version]
+# Repositories that depend on a package, mapped to the version they use
+Dependents: TypeAlias = dict[str, Version]
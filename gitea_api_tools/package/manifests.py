@@ -0,0 +1,140 @@
+from collections.abc import Callable, Iterable
+
+from . import formats
+from .. import profiling
+
+
+Parser = Callable[[str], formats.Requirements]
+
+
+class Manifest:
+    """Defines a package file (manifest) and how to parse it.
+
+    When a repository has several manifests, only the one with the highest
+    priority is read. Lock files have higher priorities than files listing
+    loose requirements, since they pin exact versions.
+
+    """
+
+    def __init__(
+        self, file: str, priority: int, parse: Parser, version: int = 1
+    ) -> None:
+        """Initialize the manifest.
+
+        Args:
+            file: name of the file in the root of a repository
+            priority: higher priorities are preferred
+            parse: function parsing the contents of the file
+            version: optional; version of the parser, part of the keys of
+                cached requirements (see package.cache)
+
+        """
+        self.file = file
+        self.priority = priority
+        self.parse = parse
+        self.version = version
+
+
+_registry: dict[str, Manifest] = {}
+
+
+def register(
+    file: str, priority: int, version: int = 1
+) -> Callable[[Parser], Parser]:
+    """Register a parser for a manifest, as a decorator.
+
+    Args:
+        file: name of the file in the root of a repository
+        priority: higher priorities are preferred
+        version: optional; version of the parser; increase it whenever the
+            parser returns different requirements for the same file, so
+            requirements cached by older versions aren't used
+
+    Returns:
+        Callable[[Parser], Parser]: decorator registering the parser
+
+    Raises:
+        ValueError: a parser was already registered for the file
+
+    """
+
+    def decorator(parse: Parser) -> Parser:
+        if file in _registry:
+            raise ValueError(f"{file} already has a parser")
+        _registry[file] = Manifest(file, priority, parse, version)
+        return parse
+
+    return decorator
+
+
+def get_files() -> tuple[str, ...]:
+    """Get the names of registered manifests.
+
+    Returns:
+        tuple[str, ...]: file names, from highest to lowest priority
+
+    """
+    manifests = sorted(_registry.values(), key=lambda m: -m.priority)
+    return tuple(manifest.file for manifest in manifests)
+
+
+def get_version(file: str) -> int:
+    """Get the version of the parser of a manifest.
+
+    Args:
+        file: name of the manifest
+
+    Returns:
+        int: version of the parser
+
+    Raises:
+        ValueError: no parser is registered for the file
+
+    """
+    try:
+        return _registry[file].version
+    except KeyError as e:
+        raise ValueError(f"Unknown package file {file}") from e
+
+
+def select(files: Iterable[str]) -> str | None:
+    """Select the manifest with the highest priority among files.
+
+    Args:
+        files: names of files, e.g. in the root of a repository
+
+    Returns:
+        str | None: name of the manifest to read; None if there are none
+
+    """
+    present = [_registry[file] for file in files if file in _registry]
+    if not present:
+        return None
+    return max(present, key=lambda m: m.priority).file
+
+
+@profiling.phase("parse")
+def parse(file: str, contents: str) -> formats.Requirements:
+    """Parse the contents of a manifest.
+
+    Args:
+        file: name of the manifest
+        contents: contents of the manifest
+
+    Returns:
+        formats.Requirements: dictionary of packages to versions
+
+    Raises:
+        ValueError: no parser is registered for the file, or the contents
+            could not be parsed
+
+    """
+    try:
+        manifest = _registry[file]
+    except KeyError as e:
+        raise ValueError(f"Unknown package file {file}") from e
+
+    try:
+        return manifest.parse(contents)
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"{file} is malformed: {e}") from e
@@ -0,0 +1,337 @@
+import json
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any
+
+from . import formats
+from . import outdated
+from . import specifier
+from .. import config
+
+
+CACHE_FILE = config.cache_dir / "mirror-cache.json"
+
+# Directories of a mirror with one PyPI JSON API document per package, e.g.
+# as written by bandersnatch
+JSON_DIRS = ("json", "web/json")
+# Directories of a mirror with a PEP 503 simple index
+SIMPLE_DIRS = ("simple", "web/simple")
+# Distribution file names, e.g. requests-2.31.0.tar.gz or
+# requests-2.31.0-py3-none-any.whl; the name is already stripped
+DIST_VERSION = re.compile(
+    r"^-(?P<version>[^-]+?)(?:-.+\.whl|\.tar\.gz|\.zip)$"
+)
+
+
+def normalize(name: str) -> str:
+    """Normalize a package name, as in PEP 503.
+
+    Args:
+        name: name of a package
+
+    Returns:
+        str: the name in lower case, with runs of -, _ and . replaced by -
+
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+class _LinkParser(HTMLParser):
+    """Collects the text of links in a PEP 503 simple index page."""
+
+    def __init__(self) -> None:
+        """Initialize the parser."""
+        super().__init__()
+        self.links: list[str] = []
+        self._in_link = False
+
+    def handle_starttag(
+        self, tag: str, attrs: list[tuple[str, str | None]]
+    ) -> None:
+        """Start collecting the text of a link."""
+        if tag == "a":
+            self._in_link = True
+            self.links.append("")
+
+    def handle_endtag(self, tag: str) -> None:
+        """Stop collecting the text of a link."""
+        if tag == "a":
+            self._in_link = False
+
+    def handle_data(self, data: str) -> None:
+        """Collect the text of a link."""
+        if self._in_link:
+            self.links[-1] += data
+
+
+def read_dump(file: Path) -> dict[str, formats.Version]:
+    """Read latest versions from a bulk metadata dump.
+
+    The dump is a JSON object mapping package names to either their latest
+    version, or their PyPI JSON API document.
+
+    Args:
+        file: path to the dump
+
+    Returns:
+        dict[str, formats.Version]: normalized package names mapped to their
+            latest versions
+
+    Raises:
+        ValueError: the dump could not be read
+
+    """
+    try:
+        with file.open() as f:
+            dump = json.load(f)
+    except (OSError, json.decoder.JSONDecodeError) as e:
+        raise ValueError(f"{file} could not be read") from e
+
+    if not isinstance(dump, dict):
+        raise ValueError(f"{file} is not a metadata dump")
+
+    latest: dict[str, formats.Version] = {}
+    for name, metadata in dump.items():
+        ver = get_document_version(metadata)
+        if ver:
+            latest[normalize(name)] = ver
+
+    return latest
+
+
+def get_document_version(document: Any) -> formats.Version | None:
+    """Get the latest version from a PyPI JSON API document.
+
+    Args:
+        document: the document; a plain version string is also accepted
+
+    Returns:
+        formats.Version | None: the latest version; None if there is none
+
+    """
+    if isinstance(document, str):
+        return document
+    try:
+        return str(document["info"]["version"]) or None
+    except (KeyError, TypeError):
+        return None
+
+
+def read_json_dir(directory: Path) -> dict[str, formats.Version]:
+    """Read latest versions from PyPI JSON API documents in a directory.
+
+    Args:
+        directory: directory with one document per package, named after it
+
+    Returns:
+        dict[str, formats.Version]: normalized package names mapped to their
+            latest versions
+
+    """
+    latest: dict[str, formats.Version] = {}
+    for file in directory.iterdir():
+        try:
+            with file.open() as f:
+                ver = get_document_version(json.load(f))
+        except (OSError, json.decoder.JSONDecodeError):
+            config.logger.warning(f"{file} could not be read from the mirror")
+            continue
+        if ver:
+            latest[normalize(file.name)] = ver
+
+    return latest
+
+
+def read_simple_dir(directory: Path) -> dict[str, formats.Version]:
+    """Read latest versions from a PEP 503 simple index in a directory.
+
+    Versions are taken from the file names of each package's distributions.
+
+    Args:
+        directory: directory with one subdirectory per package, each with an
+            index.html
+
+    Returns:
+        dict[str, formats.Version]: normalized package names mapped to their
+            latest versions
+
+    """
+    latest: dict[str, formats.Version] = {}
+    for page in directory.glob("*/index.html"):
+        name = normalize(page.parent.name)
+        parser = _LinkParser()
+        try:
+            parser.feed(page.read_text())
+        except OSError:
+            config.logger.warning(f"{page} could not be read from the mirror")
+            continue
+
+        versions = []
+        for link in parser.links:
+            # Distribution names may use - or _ for the same separator
+            dist = link.strip()
+            prefix = re.match(r"^[A-Za-z0-9._-]+?(?=-[0-9])", dist)
+            if not prefix or normalize(prefix.group()) != name:
+                continue
+            found = DIST_VERSION.match(dist[prefix.end() :])
+            if found:
+                versions.append(found.group("version"))
+
+        ver = outdated.get_newest(versions)
+        if ver:
+            latest[name] = ver
+
+    return latest
+
+
+def get_sources(path: Path) -> list[Path]:
+    """Get the parts of a mirror that versions are read from.
+
+    Args:
+        path: path to a mirror directory or a bulk metadata dump
+
+    Returns:
+        list[Path]: the dump, or the JSON and simple index directories
+
+    """
+    if path.is_file():
+        return [path]
+    return [
+        path / directory
+        for directory in JSON_DIRS + SIMPLE_DIRS
+        if (path / directory).is_dir()
+    ]
+
+
+def get_signature(sources: list[Path]) -> list[int]:
+    """Get a signature that changes whenever the mirror is synchronized.
+
+    Only the sources and their direct children are checked, which is much
+    cheaper than reading them.
+
+    Args:
+        sources: parts of the mirror, from get_sources()
+
+    Returns:
+        list[int]: number of entries and latest modification time (in ns)
+
+    """
+    entries = 0
+    modified = 0
+    for source in sources:
+        modified = max(modified, source.stat().st_mtime_ns)
+        if source.is_dir():
+            for child in source.iterdir():
+                entries += 1
+                modified = max(modified, child.stat().st_mtime_ns)
+    return [entries, modified]
+
+
+class Mirror:
+    """Looks up the latest versions of packages in a local PyPI mirror.
+
+    The mirror can be a directory with PyPI JSON API documents (`json/`) or a
+    PEP 503 simple index (`simple/`), or a JSON file with a bulk metadata dump.
+    Reading a large mirror is slow, so the lookup table is cached in the state
+    directory until the mirror changes.
+
+    """
+
+    def __init__(
+        self, path: Path, cache_file: Path | None = CACHE_FILE
+    ) -> None:
+        """Initialize the lookup table from the mirror or its cache.
+
+        Args:
+            path: path to a mirror directory or a bulk metadata dump
+            cache_file: optional; path to the cache of the lookup table; if
+                None, the table isn't cached
+
+        Raises:
+            ValueError: the mirror could not be read
+
+        """
+        self.path = path
+        sources = get_sources(path)
+        if not sources:
+            raise ValueError(f"{path} is not a package index mirror")
+
+        source = str(path.resolve())
+        signature = get_signature(sources)
+        cached = self._load_cache(cache_file)
+        if (
+            cached.get("source") == source
+            and cached.get("signature") == signature
+        ):
+            self.latest: dict[str, formats.Version] = cached["latest"]
+            return
+
+        self.latest = {}
+        for part in sources:
+            if part.is_file():
+                self.latest.update(read_dump(part))
+            elif part.name == "json":
+                self.latest.update(read_json_dir(part))
+            else:
+                for name, ver in read_simple_dir(part).items():
+                    self.latest.setdefault(name, ver)
+
+        if cache_file:
+            with cache_file.open("w") as f:
+                json.dump(
+                    {
+                        "source": source,
+                        "signature": signature,
+                        "latest": self.latest,
+                    },
+                    fp=f,
+                )
+
+    @staticmethod
+    def _load_cache(cache_file: Path | None) -> dict[str, Any]:
+        if not cache_file:
+            return {}
+        try:
+            with cache_file.open() as f:
+                cached = json.load(f)
+        except (OSError, json.decoder.JSONDecodeError):
+            return {}
+        return cached if isinstance(cached, dict) else {}
+
+    def __len__(self) -> int:
+        """Get the number of packages in the mirror."""
+        return len(self.latest)
+
+    def get_latest(self, pkg: str) -> formats.Version | None:
+        """Get the latest version of a package.
+
+        Args:
+            pkg: name of a package, normalized or not
+
+        Returns:
+            formats.Version | None: the latest version; None if the package
+                isn't in the mirror
+
+        """
+        return self.latest.get(normalize(pkg))
+
+    def get_version(self, pkg: str) -> specifier.Specifier:
+        """Get the latest version of a package, to restrict listings with.
+
+        Args:
+            pkg: name of a package, normalized or not
+
+        Returns:
+            specifier.Specifier: any version below the latest version
+
+        Raises:
+            ValueError: the package isn't in the mirror, or its latest version
+                isn't supported by version.Version
+
+        """
+        latest = self.get_latest(pkg)
+        if latest is None:
+            raise ValueError(f"{pkg} is not in the mirror {self.path}")
+        config.logger.info(f"Latest version of {pkg} is {latest}")
+        return specifier.Specifier(latest)
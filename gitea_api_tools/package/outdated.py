@@ -0,0 +1,244 @@
+import json
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from pathlib import Path
+from typing import TypeAlias
+
+from . import formats
+from . import python
+from . import version
+from .. import config
+from .. import gitea
+from .. import package
+
+
+# Versions of a package mapped to the repositories using them
+Histogram: TypeAlias = dict[formats.Version, list[str]]
+Histograms: TypeAlias = dict[formats.Package, Histogram]
+# The newest version of a package, and the histogram of older versions
+Lagging: TypeAlias = tuple[formats.Version, Histogram]
+
+
+def add_requirements(
+    histograms: Histograms, repo: str, requirements: formats.Requirements
+) -> None:
+    """Count the requirements of a repository in the histograms.
+
+    Args:
+        histograms: histograms of every package, updated in place
+        repo: full repository name
+        requirements: dictionary of packages to versions
+
+    """
+    for pkg, ver in requirements.items():
+        histograms.setdefault(pkg, {}).setdefault(ver, []).append(repo)
+
+
+def merge_histograms(histograms: Histograms, other: Histograms) -> None:
+    """Merge other histograms into the histograms, e.g. from another shard.
+
+    Args:
+        histograms: histograms of every package, updated in place
+        other: histograms to add
+
+    """
+    for pkg, histogram in other.items():
+        merged = histograms.setdefault(pkg, {})
+        for ver, repos in histogram.items():
+            merged.setdefault(ver, []).extend(repos)
+
+
+def get_newest(versions: Iterable[formats.Version]) -> formats.Version | None:
+    """Get the newest of some versions of a package.
+
+    Versions that can't be compared (e.g. release candidates) are skipped.
+
+    Args:
+        versions: versions of a package
+
+    Returns:
+        formats.Version | None: the newest version; None if no version can be
+            compared
+
+    """
+    keys = {ver: version.get_sort_key(ver) for ver in versions}
+    comparable = {ver: key for ver, key in keys.items() if key is not None}
+    if not comparable:
+        return None
+    return max(comparable, key=lambda ver: comparable[ver])
+
+
+def get_lagging(
+    histogram: Histogram, newest: formats.Version | None = None
+) -> Lagging | None:
+    """Find the versions in a histogram behind the newest version.
+
+    Versions that can't be compared are neither the newest nor lagging.
+
+    Args:
+        histogram: versions of a package mapped to their repositories
+        newest: optional; the version to compare against, e.g. the latest
+            release; defaults to the newest version in the histogram
+
+    Returns:
+        Lagging | None: the newest version and the histogram of older
+            versions; None if no version can be compared
+
+    """
+    if newest is None:
+        newest = get_newest(histogram)
+    newest_key = version.get_sort_key(newest) if newest else None
+    if newest is None or newest_key is None:
+        return None
+
+    keys = {ver: version.get_sort_key(ver) for ver in histogram}
+    older = {
+        ver: key
+        for ver, key in keys.items()
+        if key is not None and key < newest_key
+    }
+    lagging = {
+        ver: sorted(histogram[ver])
+        for ver in sorted(older, key=lambda ver: older[ver])
+    }
+    return (newest, lagging)
+
+
+def find_outdated(
+    shard: gitea.shard.Shard | None = None,
+    workers: int = 1,
+    processes: int = 0,
+    since: datetime | None = None,
+    resume: bool = False,
+) -> Histograms:
+    """Count the versions of every package used by Python repositories.
+
+    Requirements are aggregated as they're scanned, so only the histograms
+    are kept in memory.
+
+    Args:
+        shard: optional; if provided, only search repositories in this shard
+        workers: optional; number of threads fetching from the instance
+        processes: optional; number of worker processes decoding and parsing
+            package files; if 0, they're decoded and parsed in threads
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, resume an interrupted scan from its
+            checkpoint
+
+    Returns:
+        Histograms: histograms of every package
+
+    """
+    histograms: Histograms = {}
+    for repo, requirements in python.get_all_requirements(
+        shard, workers, processes, since, resume
+    ):
+        add_requirements(histograms, repo, requirements)
+
+    return histograms
+
+
+def list_outdated(
+    histograms: Histograms,
+    get_latest: Callable[[str], formats.Version | None] | None = None,
+) -> None:
+    """List packages that some repositories use older versions of.
+
+    Args:
+        histograms: histograms of every package
+        get_latest: optional; looks up the latest version of a package, e.g.
+            package.mirror.Mirror.get_latest; if provided, versions are
+            compared against the latest instead of the newest in histograms
+
+    """
+    unknown = 0
+    for pkg in sorted(histograms, key=str.lower):
+        newest = None
+        if get_latest:
+            newest = get_latest(pkg)
+            if newest is None:
+                unknown += 1
+                continue
+        lagging = get_lagging(histograms[pkg], newest)
+        if not lagging or not lagging[1]:
+            continue
+        newest, older = lagging
+        behind = sum(len(repos) for repos in older.values())
+        status = "is latest" if get_latest else "is newest"
+        config.logger.info(f"{pkg}: {newest} {status}; {behind} behind")
+        for ver, repos in older.items():
+            config.logger.info(f"    {ver} ({len(repos)}): {', '.join(repos)}")
+
+    if unknown:
+        config.logger.info(f"{unknown} package(s) were not in the mirror")
+
+
+def dump_outdated(
+    histograms: Histograms,
+    file: Path,
+    shard: gitea.shard.Shard | None = None,
+    mirror: Path | None = None,
+    failed: Iterable[str] = (),
+) -> None:
+    """Write the histograms to a JSON file.
+
+    The file can later be combined with others using `gitea-api merge`.
+
+    Args:
+        histograms: histograms of every package
+        file: path to the JSON file
+        shard: optional; the shard the results were collected from
+        mirror: optional; path to the mirror to compare against when merging
+        failed: optional; profiles that couldn't be scanned, so the results
+            are missing them
+
+    """
+    with file.open("w") as f:
+        json.dump(
+            {
+                "command": "outdated",
+                "shard": gitea.shard.to_str(shard) if shard else None,
+                "failed_profiles": sorted(failed),
+                "mirror": str(mirror) if mirror else None,
+                "results": histograms,
+            },
+            fp=f,
+            indent=4,
+        )
+
+
+def list_outdated_repos(
+    shard: gitea.shard.Shard | None = None,
+    output: Path | None = None,
+    workers: int = 1,
+    processes: int = 0,
+    mirror: Path | None = None,
+    since: datetime | None = None,
+    resume: bool = False,
+) -> None:
+    """List repositories using older versions of packages.
+
+    Args:
+        shard: optional; if provided, only search repositories in this shard
+        output: optional; if provided, write results to this JSON file
+            instead of listing them
+        workers: optional; number of threads fetching from the instance
+        processes: optional; number of worker processes decoding and parsing
+            package files; if 0, they're decoded and parsed in threads
+        mirror: optional; path to a local package index mirror; if provided,
+            versions are compared against the latest in the mirror instead
+            of the newest in use
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, resume an interrupted scan from its
+            checkpoint
+
+    """
+    # Read the mirror first, so a bad mirror doesn't waste a scan
+    get_latest = package.mirror.Mirror(mirror).get_latest if mirror else None
+    histograms = find_outdated(shard, workers, processes, since, resume)
+    if output:
+        dump_outdated(histograms, output, shard, mirror)
+    else:
+        list_outdated(histograms, get_latest)
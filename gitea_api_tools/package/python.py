@@ -1,9 +1,28 @@
+import json
+import re
 import tomllib
-
-from . import version
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from types import TracebackType
+from typing import Any, TypeAlias
+
+from . import cache
+from . import manifests
+from . import specifier
 from .. import config
 from .. import gitea
 from .. import package
+from .. import pipeline
+from .. import profiling
+
+
+# A PEP 508 dependency pinned to an exact version, e.g. "requests[socks]==2.0"
+PINNED_DEPENDENCY = re.compile(
+    r"^\s*(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?"
+    r"\s*==\s*(?P<version>[^\s,;]+)\s*(?:;.*)?$"
+)
 
 
 def process_requirementstxt_OLD(repo: str) -> package.formats.Requirements:
@@ -22,16 +41,10 @@ def process_requirementstxt_OLD(repo: str) -> package.formats.Requirements:
 
     """
     try:
-        file_contents = gitea.repo.get_file_contents(repo, "requirements.txt")
+        contents = gitea.repo.get_file_contents(repo, "requirements.txt")
     except gitea.repo.ERR_NO_FILE as e:
         raise ValueError("File could not be read") from e
 
-    try:
-        contents = gitea.api.decode(file_contents)
-    except ValueError as e:
-        # Unknown encoding
-        raise e
-
     requirements: package.formats.Requirements = {}
 
     for req in contents.split("\n"):
@@ -63,16 +76,10 @@ def process_poetrylock_OLD(repo: str) -> package.formats.Requirements:
 
     """
     try:
-        file_contents = gitea.repo.get_file_contents(repo, "poetry.lock")
+        contents = gitea.repo.get_file_contents(repo, "poetry.lock")
     except gitea.repo.ERR_NO_FILE as e:
         raise ValueError("File could not be read") from e
 
-    try:
-        contents = gitea.api.decode(file_contents)
-    except ValueError as e:
-        # Unknown encoding
-        raise e
-
     poetry_reqs = tomllib.loads(contents)
     requirements: package.formats.Requirements = {}
 
@@ -87,15 +94,9 @@ def process_poetrylock_OLD(repo: str) -> package.formats.Requirements:
 def process_requirements(repo: str) -> package.formats.Requirements:
     """Process requirements in any and all formats.
 
-    This function is a wrapper for processing the requirements in a set
-    priority.
-
-    Priority is the following:
-
-        1. poetry.lock
-        2. requirements.txt
-
-    Whichever file is found/met first will be used.
+    The root directory of the repository is listed, and only the package file
+    with the highest priority among those registered in `manifests` is read.
+    For example, poetry.lock is preferred over requirements.txt.
 
     Args:
         repo: repository URL
@@ -107,23 +108,25 @@ def process_requirements(repo: str) -> package.formats.Requirements:
         ValueError: no requirements could be parsed
 
     """
-    try:
-        return process_poetrylock_OLD(repo)
-    except ValueError:
-        pass
+    file = manifests.select(gitea.repo.get_root_files(repo))
+    if not file:
+        raise ValueError("Could not process any requirements at all.")
 
     try:
-        return process_requirementstxt_OLD(repo)
-    except (ValueError, package.CouldNotParse):
-        pass
+        contents = gitea.repo.get_file_contents(repo, file)
+    except gitea.repo.ERR_NO_FILE as e:
+        raise ValueError("File could not be read") from e
 
-    raise ValueError("Could not process any requirements at all.")
+    return manifests.parse(file, contents)
 
 
+@manifests.register("requirements.txt", priority=20)
 def process_requirements_txt(contents: str) -> package.formats.Requirements:
     """Process Python requirements in the file format requirements.txt.
 
-    requirements.txt is typically generated from using `pip freeze`.
+    requirements.txt is typically generated from using `pip freeze`, or
+    `pip-compile --generate-hashes`, which adds comments and continues each
+    requirement with its hashes over several lines.
 
     Args:
         contents: contents of package file
@@ -134,7 +137,11 @@ def process_requirements_txt(contents: str) -> package.formats.Requirements:
     """
     requirements: package.formats.Requirements = {}
 
-    for req in contents.split("\n"):
+    for line in contents.replace("\\\n", " ").split("\n"):
+        # Drop comments and options like --hash after the requirement
+        req = line.split("#", 1)[0].split(" --", 1)[0].strip()
+        if not req:
+            continue
         try:
             pkg, version = req.split("==")
         except ValueError as e:
@@ -144,6 +151,32 @@ def process_requirements_txt(contents: str) -> package.formats.Requirements:
     return requirements
 
 
+def process_toml_lock(contents: str) -> package.formats.Requirements:
+    """Process Python requirements in a TOML lock file.
+
+    poetry.lock, uv.lock and pdm.lock all list locked packages in a `package`
+    array of tables, each with a name and version.
+
+    Args:
+        contents: contents of package file
+
+    Returns:
+        package.formats.Requirements: dictionary of packages to versions
+
+    """
+    lock_reqs = tomllib.loads(contents)
+    requirements: package.formats.Requirements = {}
+
+    for requirement in lock_reqs.get("package", []):
+        # Packages like the project itself may have a dynamic version
+        if "version" not in requirement:
+            continue
+        requirements[requirement["name"]] = requirement["version"]
+
+    return requirements
+
+
+@manifests.register("poetry.lock", priority=60)
 def process_poetry_lock(contents: str) -> package.formats.Requirements:
     """Process Python requirements in the file format poetry.lock.
 
@@ -167,38 +200,516 @@ def process_poetry_lock(contents: str) -> package.formats.Requirements:
     return requirements
 
 
+@manifests.register("uv.lock", priority=50)
+def process_uv_lock(contents: str) -> package.formats.Requirements:
+    """Process Python requirements in the file format uv.lock.
+
+    uv.lock is typically generated from using `uv lock`.
+
+    Args:
+        contents: contents of package file
+
+    Returns:
+        package.formats.Requirements: dictionary of packages to versions
+
+    """
+    return process_toml_lock(contents)
+
+
+@manifests.register("pdm.lock", priority=40)
+def process_pdm_lock(contents: str) -> package.formats.Requirements:
+    """Process Python requirements in the file format pdm.lock.
+
+    pdm.lock is typically generated from using `pdm lock`.
+
+    Args:
+        contents: contents of package file
+
+    Returns:
+        package.formats.Requirements: dictionary of packages to versions
+
+    """
+    return process_toml_lock(contents)
+
+
+@manifests.register("Pipfile.lock", priority=30)
+def process_pipfile_lock(contents: str) -> package.formats.Requirements:
+    """Process Python requirements in the file format Pipfile.lock.
+
+    Pipfile.lock is typically generated from using `pipenv lock`. Both the
+    default and develop packages are included.
+
+    Args:
+        contents: contents of package file
+
+    Returns:
+        package.formats.Requirements: dictionary of packages to versions
+
+    """
+    pipfile_reqs = json.loads(contents)
+    requirements: package.formats.Requirements = {}
+
+    for section in ("default", "develop"):
+        for name, requirement in pipfile_reqs.get(section, {}).items():
+            # Packages from VCS or paths don't have a version
+            version = requirement.get("version", "")
+            if version.startswith("=="):
+                requirements[name] = version.removeprefix("==")
+
+    return requirements
+
+
+@manifests.register("pyproject.toml", priority=10)
+def process_pyproject_toml(contents: str) -> package.formats.Requirements:
+    """Process Python requirements in pyproject.toml (PEP 621).
+
+    Unlike lock files, pyproject.toml usually doesn't pin versions, so only
+    dependencies pinned with `==` are included. Dependencies from both
+    `project.dependencies` and `project.optional-dependencies` are read.
+
+    Args:
+        contents: contents of package file
+
+    Returns:
+        package.formats.Requirements: dictionary of packages to versions
+
+    """
+    project = tomllib.loads(contents).get("project", {})
+    dependencies = list(project.get("dependencies", []))
+    for optional in project.get("optional-dependencies", {}).values():
+        dependencies.extend(optional)
+
+    requirements: package.formats.Requirements = {}
+    for dependency in dependencies:
+        pinned = PINNED_DEPENDENCY.match(dependency)
+        if pinned:
+            requirements[pinned.group("name")] = pinned.group("version")
+
+    return requirements
+
+
+# Repository name, package file name, blob SHA, and either the undecoded
+# response or the contents of the file, depending on the pipeline stage; the
+# last is None if the requirements are cached
+PkgFile: TypeAlias = tuple[str, str, str, str | bytes | None]
+# Repository name, package file name, blob SHA, and requirements, which are
+# None if cached
+ParsedPkgFile: TypeAlias = tuple[
+    str, str, str, package.formats.Requirements | None
+]
+
+
+def decode_pkg_file(pkg_file: PkgFile) -> list[PkgFile]:
+    """Decode the response of a Python package file.
+
+    This is a pipeline stage and may be run in a worker process.
+
+    Args:
+        pkg_file: repository name, package file name, blob SHA, undecoded
+            response
+
+    Returns:
+        list[PkgFile]: repository name, package file name, blob SHA, contents;
+            empty if the response could not be decoded
+
+    """
+    repo, file, sha, response = pkg_file
+    if response is None:
+        return [pkg_file]
+
+    try:
+        return [(repo, file, sha, gitea.api.decode(response))]
+    except ValueError as e:
+        config.logger.warning(f"{file} in {repo} was skipped: {e}")
+        return []
+
+
+def parse_pkg_file(pkg_file: PkgFile) -> list[ParsedPkgFile]:
+    """Parse the contents of a Python package file.
+
+    This is a pipeline stage and may be run in a worker process.
+
+    Args:
+        pkg_file: repository name, package file name, blob SHA, contents
+
+    Returns:
+        list[ParsedPkgFile]: repository name, package file name, blob SHA,
+            dictionary of packages to versions; empty if the file is unknown
+            or could not be parsed
+
+    """
+    repo, file, sha, contents = pkg_file
+    if contents is None:
+        return [(repo, file, sha, None)]
+
+    try:
+        return [(repo, file, sha, manifests.parse(file, contents))]
+    except ValueError as e:
+        config.logger.warning(f"{file} in {repo} was skipped: {e}")
+        return []
+
+
+class RequirementsStages:
+    """Builds the pipeline stages that resolve requirements of repositories.
+
+    Package files are fetched from the instance, then decoded and parsed
+    (in worker processes, if any), then resolved against the cache of parsed
+    requirements. Scans with other results (e.g. `gitea-api scan`) wrap these
+    stages instead of building their own.
+
+    Use it as a context manager: the worker processes are shut down, and the
+    cache saved, when it exits.
+
+    """
+
+    def __init__(self, processes: int = 0) -> None:
+        """Initialize the stages.
+
+        Args:
+            processes: optional; number of worker processes decoding and
+                parsing package files; if 0, they're decoded and parsed in
+                threads
+
+        """
+        self.processes = processes
+        self.executor: ProcessPoolExecutor | None = None
+        self.cache = cache.RequirementsCache()
+        self.pkg_files = manifests.get_files()
+
+    def __enter__(self) -> "RequirementsStages":
+        """Start the worker processes, if any."""
+        if self.processes:
+            self.executor = ProcessPoolExecutor(self.processes)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Shut down the worker processes and save the cache."""
+        if self.executor:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+        self.cache.save()
+        self.cache.record_stats()
+
+    def fetch(
+        self,
+        record: gitea.records.RepoRecord,
+        check_language: bool | None = None,
+    ) -> list[PkgFile]:
+        """Fetch the package file of a repository.
+
+        Args:
+            record: record of the repository
+            check_language: optional; whether to request the languages of
+                the repository first; defaults to whether its primary language
+                isn't Python
+
+        Returns:
+            list[PkgFile]: repository name, package file name, blob SHA,
+                undecoded response (None if cached); empty if the repository
+                has no package file
+
+        """
+        if check_language is None:
+            check_language = record.language != "Python"
+        return gitea.repo.get_python_pkg_responses(
+            record.full_name, self.pkg_files, self.cache, check_language
+        )
+
+    def resolve(
+        self, parsed: ParsedPkgFile
+    ) -> package.formats.Requirements | None:
+        """Resolve a parsed package file, caching its requirements.
+
+        Args:
+            parsed: repository name, package file name, blob SHA,
+                requirements (None if cached)
+
+        Returns:
+            package.formats.Requirements | None: dictionary of packages to
+                versions; None if there are none
+
+        """
+        _, file, sha, requirements = parsed
+        if requirements is None:
+            return self.cache.get(file, sha)
+        self.cache.put(file, sha, requirements)
+        return requirements
+
+    def read(self, pkg_file: PkgFile) -> package.formats.Requirements | None:
+        """Decode, parse and resolve a fetched package file in this thread.
+
+        Args:
+            pkg_file: repository name, package file name, blob SHA,
+                undecoded response (None if cached)
+
+        Returns:
+            package.formats.Requirements | None: dictionary of packages to
+                versions; None if the file could not be decoded or parsed
+
+        """
+        parsed = [
+            parsed
+            for decoded in decode_pkg_file(pkg_file)
+            for parsed in parse_pkg_file(decoded)
+        ]
+        return self.resolve(parsed[0]) if parsed else None
+
+    def get_stages(
+        self,
+        fetch: Callable[[Any], Iterable[Any]],
+        resolve: Callable[[Any], Iterable[Any]],
+        workers: int = 1,
+        decode: Callable[[Any], list[Any]] = decode_pkg_file,
+        parse: Callable[[Any], list[Any]] = parse_pkg_file,
+    ) -> list[pipeline.Stage]:
+        """Get the stages: fetch -> decode -> parse -> resolve.
+
+        Args:
+            fetch: function fetching package files of a repository, e.g.
+                wrapping fetch()
+            resolve: function resolving parsed package files, e.g. wrapping
+                resolve()
+            workers: optional; number of threads fetching from the instance
+            decode: optional; function decoding package files; must be
+                picklable; defaults to decode_pkg_file()
+            parse: optional; function parsing package files; must be
+                picklable; defaults to parse_pkg_file()
+
+        Returns:
+            list[pipeline.Stage]: the stages, in order
+
+        """
+        return [
+            pipeline.Stage("fetch", fetch, workers),
+            pipeline.Stage("decode", decode, self.processes, self.executor),
+            pipeline.Stage("parse", parse, self.processes, self.executor),
+            pipeline.Stage("resolve", resolve),
+        ]
+
+
+@profiling.phase("match")
+def match_versions(
+    usages: Iterable[tuple[str, package.formats.Version]],
+    ver_restrict: specifier.Specifier = specifier.ANY_VERSION,
+) -> package.formats.Dependents:
+    """Match the versions of a package used by repositories.
+
+    Args:
+        usages: full repository names and the version of the package they use
+        ver_restrict: optional; a specifier to restrict listings; defaults to
+            any version
+
+    Returns:
+        package.formats.Dependents: repositories mapped to the version they
+            use, if it's in the range of `ver_restrict`
+
+    """
+    return specifier.VersionIndex(usages).find(ver_restrict)
+
+
+def get_all_requirements(
+    shard: gitea.shard.Shard | None = None,
+    workers: int = 1,
+    processes: int = 0,
+    since: datetime | None = None,
+    resume: bool = False,
+) -> Iterator[tuple[str, package.formats.Requirements]]:
+    """Get the requirements of all Python repositories.
+
+    Repositories go through a pipeline: fetch -> decode -> parse -> resolve.
+    Empty repositories are skipped, and languages aren't requested for
+    repositories whose primary language is Python.
+    Package files with cached requirements are neither downloaded nor parsed.
+    Requirements are yielded as they're resolved, so callers can aggregate
+    them without holding every repository in memory.
+
+    Finished repositories are recorded in a checkpoint (see
+    gitea.checkpoint), so an interrupted scan can be resumed.
+
+    Args:
+        shard: optional; if provided, only search repositories in this shard
+        workers: optional; number of threads fetching from the instance
+        processes: optional; number of worker processes decoding and parsing
+            package files; if 0, they're decoded and parsed in threads
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, reuse the requirements of repositories
+            finished by an interrupted scan
+
+    Returns:
+        Iterator[tuple[str, package.formats.Requirements]]: for each
+            iteration: full repository name, its requirements
+
+    """
+    checkpoint = gitea.checkpoint.Checkpoint(
+        gitea.checkpoint.get_file("python", shard), resume
+    )
+    stages = RequirementsStages(processes)
+
+    def fetch(record: gitea.records.RepoRecord) -> list[PkgFile]:
+        pkg_files = stages.fetch(record)
+        if not pkg_files:
+            checkpoint.add(record.full_name)
+        return pkg_files
+
+    def resolve(
+        parsed: ParsedPkgFile,
+    ) -> list[tuple[str, package.formats.Requirements]]:
+        packages = stages.resolve(parsed)
+        checkpoint.add(parsed[0], packages)
+        return [(parsed[0], packages)] if packages is not None else []
+
+    # Empty repositories have no package files to request
+    records, finished = checkpoint.split(
+        gitea.records.keep(
+            gitea.api.list_records(shard, since),
+            gitea.records.RepoRecord.has_files,
+            "empty",
+        )
+    )
+    with checkpoint, stages:
+        scan = pipeline.Pipeline(
+            "python", stages.get_stages(fetch, resolve, workers)
+        )
+        for repo, packages in finished.items():
+            if packages is not None:
+                yield repo, packages
+        yield from scan.run(records)
+
+
+def find_dependent_repos(
+    pkg: str,
+    ver_restrict: specifier.Specifier = specifier.ANY_VERSION,
+    shard: gitea.shard.Shard | None = None,
+    workers: int = 1,
+    processes: int = 0,
+    since: datetime | None = None,
+    resume: bool = False,
+) -> package.formats.Dependents:
+    """Find repositories dependent on given `pkg`.
+
+    Args:
+        pkg: a third party package
+        ver_restrict: optional; a specifier to restrict listings; defaults
+            to any version
+        shard: optional; if provided, only search repositories in this shard
+        workers: optional; number of threads fetching from the instance
+        processes: optional; number of worker processes decoding and parsing
+            package files; if 0, they're decoded and parsed in threads
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, resume an interrupted scan from its
+            checkpoint
+
+    Returns:
+        package.formats.Dependents: repositories mapped to the version of
+            `pkg` that they use
+
+    """
+    usages = [
+        (repo, packages[pkg])
+        for repo, packages in get_all_requirements(
+            shard, workers, processes, since, resume
+        )
+        if pkg in packages
+    ]
+    return match_versions(usages, ver_restrict)
+
+
+def list_found_repos(
+    dependents: package.formats.Dependents,
+    ver_restrict: specifier.Specifier = specifier.ANY_VERSION,
+) -> None:
+    """List repositories found by find_dependent_repos().
+
+    Args:
+        dependents: repositories mapped to the version of the package
+        ver_restrict: optional; the specifier used to restrict listings
+
+    """
+    for repo, repo_version in sorted(dependents.items()):
+        if not ver_restrict:
+            config.logger.info(f"{repo}: {repo_version}")
+        elif ver_restrict.below:
+            config.logger.info(f"{repo} is outdated: {repo_version}")
+        else:
+            config.logger.info(f"{repo} is in {ver_restrict}: {repo_version}")
+
+
+def dump_dependent_repos(
+    dependents: package.formats.Dependents,
+    pkg: str,
+    ver_restrict: specifier.Specifier,
+    file: Path,
+    shard: gitea.shard.Shard | None = None,
+    failed: Iterable[str] = (),
+) -> None:
+    """Write the repositories dependent on `pkg` to a JSON file.
+
+    The file can later be combined with others using `gitea-api merge`.
+
+    Args:
+        dependents: repositories mapped to the version of the package
+        pkg: the package that was searched
+        ver_restrict: the specifier used to restrict listings
+        file: path to the JSON file
+        shard: optional; the shard the results were collected from
+        failed: optional; profiles that couldn't be scanned, so the results
+            are missing them
+
+    """
+    with file.open("w") as f:
+        json.dump(
+            {
+                "command": "python",
+                "shard": gitea.shard.to_str(shard) if shard else None,
+                "failed_profiles": sorted(failed),
+                "package": pkg,
+                "version": str(ver_restrict) if ver_restrict else None,
+                "results": dependents,
+            },
+            fp=f,
+            indent=4,
+        )
+
+
 def list_dependent_repos(
-    package: str, ver_restrict: version.Version = version.SENTINEL_VERSION
+    package: str,
+    ver_restrict: specifier.Specifier = specifier.ANY_VERSION,
+    shard: gitea.shard.Shard | None = None,
+    output: Path | None = None,
+    workers: int = 1,
+    processes: int = 0,
+    since: datetime | None = None,
+    resume: bool = False,
 ) -> None:
     """List repositories dependent on given `package`.
 
     Args:
         package: a third party package
-        ver_restrict: optional; a version to restrict listings; any below;
-            defaults to the sentinel version
-
-    """
-    for repo, file, contents in gitea.repo.get_all_python_pkg_files():
-        match file:
-            case "poetry.lock":
-                packages = process_poetry_lock(contents)
-            case "requirements.txt":
-                packages = process_requirements_txt(contents)
-            case _:
-                config.logger.error(f"Unknown Python package file {file}")
-                continue
-        if package not in packages:
-            continue
+        ver_restrict: optional; a specifier to restrict listings; defaults
+            to any version
+        shard: optional; if provided, only search repositories in this shard
+        output: optional; if provided, write results to this JSON file
+            instead of listing them
+        workers: optional; number of threads fetching from the instance
+        processes: optional; number of worker processes decoding and parsing
+            package files; if 0, they're decoded and parsed in threads
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, resume an interrupted scan from its
+            checkpoint
 
-        if not ver_restrict:
-            config.logger.info(f"{repo}: {packages[package]}")
-        else:
-            repo_version = version.Version(packages[package])
-            try:
-                if ver_restrict > repo_version:
-                    config.logger.info(f"{repo} is outdated: {repo_version}")
-            except (TypeError, ValueError):
-                config.logger.warning(
-                    f"{ver_restrict} can't be compared against {repo_version}"
-                )
-                continue
+    """
+    dependents = find_dependent_repos(
+        package, ver_restrict, shard, workers, processes, since, resume
+    )
+    if output:
+        dump_dependent_repos(dependents, package, ver_restrict, output, shard)
+    else:
+        list_found_repos(dependents, ver_restrict)
@@ -0,0 +1,370 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from typing import TypeAlias
+
+from . import formats
+from . import version
+from .. import config
+
+
+# A version without trailing zeros, from version.get_sort_key()
+Key: TypeAlias = version.SortKey
+# A bound of an interval: a key and whether it's included; None if unbounded
+Bound: TypeAlias = tuple[Key, bool] | None
+# Versions between a lower and an upper bound
+Interval: TypeAlias = tuple[Bound, Bound]
+
+# A clause of a specifier, e.g. ">=2.0" or "!=1.4.*"
+CLAUSE = re.compile(r"^(?P<op>~=|===|==|!=|<=|>=|<|>)?\s*(?P<version>\S+)$")
+WILDCARD = ".*"
+
+
+def get_key(ver: str) -> Key:
+    """Get the key of a version in a specifier.
+
+    Args:
+        ver: version in string form
+
+    Returns:
+        Key: the key
+
+    Raises:
+        ValueError: the version isn't supported by version.Version
+
+    """
+    key = version.get_sort_key(ver)
+    if key is None:
+        raise ValueError(f"Unsupported version {ver}")
+    return key
+
+
+def is_empty(interval: Interval) -> bool:
+    """Check whether an interval contains no versions.
+
+    Args:
+        interval: the interval
+
+    Returns:
+        bool: True if the lower bound is past the upper bound
+
+    """
+    low, high = interval
+    if low is None or high is None:
+        return False
+    return low[0] > high[0] or (low[0] == high[0] and not (low[1] and high[1]))
+
+
+def get_lower_order(low: Bound) -> tuple:
+    """Get a key to order lower bounds by, from loosest to tightest.
+
+    Args:
+        low: the lower bound
+
+    Returns:
+        tuple: the key
+
+    """
+    return (0,) if low is None else (1, low[0], not low[1])
+
+
+def get_upper_order(high: Bound) -> tuple:
+    """Get a key to order upper bounds by, from tightest to loosest.
+
+    Args:
+        high: the upper bound
+
+    Returns:
+        tuple: the key
+
+    """
+    return (1,) if high is None else (0, high[0], high[1])
+
+
+def normalize(intervals: Iterable[Interval]) -> list[Interval]:
+    """Sort intervals, dropping empty ones and merging those that touch.
+
+    Args:
+        intervals: the intervals
+
+    Returns:
+        list[Interval]: disjoint intervals, from lowest to highest
+
+    """
+    merged: list[Interval] = []
+    for low, high in sorted(
+        (i for i in intervals if not is_empty(i)),
+        key=lambda i: get_lower_order(i[0]),
+    ):
+        if merged:
+            last_low, last_high = merged[-1]
+            if (
+                last_high is None
+                or low is None
+                or low[0] < last_high[0]
+                or (low[0] == last_high[0] and (low[1] or last_high[1]))
+            ):
+                merged[-1] = (
+                    last_low,
+                    max(last_high, high, key=get_upper_order),
+                )
+                continue
+        merged.append((low, high))
+
+    return merged
+
+
+def intersect(these: list[Interval], those: list[Interval]) -> list[Interval]:
+    """Get the versions in both sets of intervals.
+
+    Args:
+        these: normalized intervals
+        those: normalized intervals
+
+    Returns:
+        list[Interval]: normalized intervals
+
+    """
+    return normalize(
+        (
+            max(this[0], that[0], key=get_lower_order),
+            min(this[1], that[1], key=get_upper_order),
+        )
+        for this in these
+        for that in those
+    )
+
+
+def complement(intervals: list[Interval]) -> list[Interval]:
+    """Get the versions not in a set of intervals.
+
+    Args:
+        intervals: normalized intervals
+
+    Returns:
+        list[Interval]: normalized intervals
+
+    """
+    gaps: list[Interval] = []
+    lower: Bound = None
+    for low, high in intervals:
+        if low is not None:
+            gaps.append((lower, (low[0], not low[1])))
+        if high is None:
+            return normalize(gaps)
+        lower = (high[0], not high[1])
+    gaps.append((lower, None))
+
+    return normalize(gaps)
+
+
+def compile_wildcard(prefix: str) -> Interval:
+    """Compile a version with a wildcard, e.g. 1.4.*, into an interval.
+
+    Args:
+        prefix: the version without the wildcard, e.g. 1.4
+
+    Returns:
+        Interval: from the prefix, up to the next prefix (e.g. 1.5)
+
+    Raises:
+        ValueError: the prefix isn't supported by version.Version, or has a
+            letter suffix
+
+    """
+    key = get_key(prefix)
+    if key[1] != version.NO_SUFFIX:
+        raise ValueError(f"{prefix}{WILDCARD} can't have a letter suffix")
+    parts = version.Version(prefix).parts
+    # The last part of the next prefix isn't 0, so it needs no stripping
+    following = tuple(parts[:-1]) + (parts[-1] + 1,)
+    return ((key, True), ((following, version.NO_SUFFIX), False))
+
+
+def compile_clause(op: str, ver: str) -> list[Interval]:
+    """Compile a clause of a specifier into intervals.
+
+    Pre-releases and local versions aren't supported by version.Version, so
+    they're rejected instead of being handled like PEP 440 does.
+
+    Args:
+        op: the operator, e.g. >=
+        ver: the version, e.g. 2.0 or 1.4.*
+
+    Returns:
+        list[Interval]: normalized intervals
+
+    Raises:
+        ValueError: the clause is malformed or its version isn't supported
+
+    """
+    if ver.endswith(WILDCARD):
+        if op not in ("==", "!="):
+            raise ValueError(f"{op} can't be used with a wildcard")
+        matched = [compile_wildcard(ver.removesuffix(WILDCARD))]
+        return matched if op == "==" else complement(matched)
+
+    key = get_key(ver)
+    match op:
+        case "==" | "===":
+            return [((key, True), (key, True))]
+        case "!=":
+            return complement([((key, True), (key, True))])
+        case "<" | "<=":
+            return [(None, (key, op == "<="))]
+        case ">" | ">=":
+            return [((key, op == ">="), None)]
+        case "~=":
+            prefix = ver.rsplit(".", 1)[0]
+            if prefix == ver:
+                raise ValueError(f"~={ver} needs at least two parts")
+            return intersect([((key, True), None)], [compile_wildcard(prefix)])
+
+    raise ValueError(f"Unknown operator {op}")
+
+
+class Specifier:
+    """Defines a range of versions, from PEP 440 version specifiers.
+
+    Specifiers are separated by commas and all must match, e.g.
+    ">=2.0,<2.31.1" or "!=1.4.*". They're compiled once into disjoint
+    intervals of versions, so finding the repositories in a range of a
+    VersionIndex is a binary search per interval.
+
+    A version on its own, e.g. "2.31.1", means any version below it.
+
+    """
+
+    def __init__(self, text: str) -> None:
+        """Initialize the specifier by compiling it.
+
+        Args:
+            text: the specifier; if empty, any version matches
+
+        Raises:
+            ValueError: the specifier is malformed or uses a version that
+                isn't supported by version.Version
+
+        """
+        self.original = text.strip()
+        # Whether the specifier is a bare version, i.e. any version below it
+        self.below = False
+        self.intervals: list[Interval] = [(None, None)]
+        if not self.original:
+            return
+
+        clauses = [clause.strip() for clause in self.original.split(",")]
+        for clause in clauses:
+            matched = CLAUSE.match(clause)
+            if not matched:
+                raise ValueError(f"Invalid specifier {clause!r}")
+            op = matched.group("op")
+            if not op:
+                if len(clauses) > 1:
+                    raise ValueError(f"{clause} is missing an operator")
+                self.below = True
+                op = "<"
+            self.intervals = intersect(
+                self.intervals, compile_clause(op, matched.group("version"))
+            )
+
+    def __str__(self) -> str:
+        """Return the original string representation."""
+        return self.original
+
+    def __bool__(self) -> bool:
+        """Check if the specifier restricts versions at all."""
+        return bool(self.original)
+
+    def match(self, ver: str) -> bool:
+        """Check whether a version is in the range of the specifier.
+
+        Args:
+            ver: version in string form
+
+        Returns:
+            bool: True if the version is in the range
+
+        Raises:
+            ValueError: the version isn't supported by version.Version
+
+        """
+        if not self:
+            return True
+
+        key = get_key(ver)
+        return any(
+            (low is None or key > low[0] or (key == low[0] and low[1]))
+            and (high is None or key < high[0] or (key == high[0] and high[1]))
+            for low, high in self.intervals
+        )
+
+
+ANY_VERSION = Specifier("")
+
+
+class VersionIndex:
+    """Indexes the versions of a package used by repositories.
+
+    Versions are sorted by key, so the repositories in each interval of a
+    specifier are found with a binary search instead of comparing every
+    version.
+
+    """
+
+    def __init__(self, usages: Iterable[tuple[str, formats.Version]]) -> None:
+        """Initialize the index.
+
+        Args:
+            usages: full repository names and the version of the package
+                they use
+
+        """
+        keyed: list[tuple[Key, str, formats.Version]] = []
+        # Versions that can't be compared, like 2.0.0rc1
+        self.unsupported: formats.Dependents = {}
+        for repo, ver in usages:
+            key = version.get_sort_key(ver)
+            if key is None:
+                self.unsupported[repo] = ver
+            else:
+                keyed.append((key, repo, ver))
+        keyed.sort()
+
+        self.keys = [key for key, _, _ in keyed]
+        self.usages = [(repo, ver) for _, repo, ver in keyed]
+
+    def find(
+        self, ver_restrict: Specifier = ANY_VERSION
+    ) -> formats.Dependents:
+        """Find the repositories using a version in the range of a specifier.
+
+        Args:
+            ver_restrict: optional; a specifier to restrict listings; defaults
+                to any version
+
+        Returns:
+            formats.Dependents: repositories mapped to the version they use
+
+        """
+        if not ver_restrict:
+            return dict(self.usages) | self.unsupported
+
+        for repo, ver in sorted(self.unsupported.items()):
+            config.logger.warning(
+                f"{ver_restrict} can't be compared against {ver} in {repo}"
+            )
+
+        found: formats.Dependents = {}
+        for low, high in ver_restrict.intervals:
+            start = 0
+            if low is not None:
+                bisect = bisect_left if low[1] else bisect_right
+                start = bisect(self.keys, low[0])
+            end = len(self.keys)
+            if high is not None:
+                bisect = bisect_right if high[1] else bisect_left
+                end = bisect(self.keys, high[0])
+            found.update(self.usages[start:end])
+
+        return found
@@ -1,4 +1,5 @@
 import re
+from typing import TypeAlias
 
 
 VERSION_PATTERN = re.compile(r"^[0-9]+\.[0-9]+\.[0-9]+$")
@@ -101,6 +102,43 @@ class Version:
 SENTINEL_VERSION = Version("0.0.0")
 
 
+# Suffix rank of versions without a letter suffix, which sort below those
+# with one, like Version: e.g. 1.0 < 1.0a < 1.0b < 1.0.1
+NO_SUFFIX = -1
+
+# A key to sort versions by: the numeric parts without trailing zeros, and
+# the rank of the letter suffix (NO_SUFFIX if there's none)
+SortKey: TypeAlias = tuple[tuple[int, ...], int]
+
+
+def get_sort_key(ver: str) -> SortKey | None:
+    """Get a key to sort versions by, even with different numbers of parts.
+
+    Trailing zeros are dropped, so 2.0 and 2.0.0 sort as equal. The letter
+    suffix is kept apart from the numeric parts, so 1.0b doesn't sort as
+    1.0.1.
+
+    Args:
+        ver: version in string form
+
+    Returns:
+        SortKey | None: the key; None if the version isn't supported by
+            Version (e.g. 2.0.0rc1)
+
+    """
+    try:
+        parts = Version(ver).parts
+    except ValueError:
+        return None
+
+    suffix = NO_SUFFIX
+    if Version.suffix.match(ver.split(".")[-1]):
+        *parts, suffix = parts
+    while parts and parts[-1] == 0:
+        parts = parts[:-1]
+    return (tuple(parts), suffix)
+
+
 class MismatchedFormat(ValueError):
     """Package had a different format and couldn't be directly compared."""
 
@@ -0,0 +1,325 @@
+import contextvars
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor
+from typing import Any
+
+from . import deadline
+from . import progress
+from . import stats
+
+
+# Marks the end of items in a queue; each worker of a stage consumes one
+_DONE = object()
+# How often (in seconds) blocked workers check whether the pipeline stopped
+_POLL_INTERVAL = 0.1
+
+
+class _Stopped(Exception):
+    """The pipeline stopped before a worker finished."""
+
+
+def _spawn(target: Callable[..., None], *args: Any) -> threading.Thread:
+    """Create a worker thread that runs in a copy of the current context.
+
+    Context variables (e.g. the Gitea instance being scanned) would otherwise
+    be reset in new threads.
+
+    Args:
+        target: function run by the thread
+        args: arguments of `target`
+
+    Returns:
+        threading.Thread: the thread, not started yet
+
+    """
+    context = contextvars.copy_context()
+    return threading.Thread(
+        target=context.run, args=(target, *args), daemon=True
+    )
+
+
+class Stage:
+    """Defines a step in a pipeline, run concurrently by one or more workers.
+
+    Each item received by the stage is passed to `func`, which returns the
+    items for the next stage. Returning no items filters the item out, while
+    returning several fans out.
+
+    A stage is connected to the next by a bounded queue. When the queue is
+    full, workers block until the next stage catches up (backpressure), so
+    memory use doesn't grow with the number of items.
+
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Iterable[Any]],
+        workers: int = 1,
+        executor: Executor | None = None,
+        queue_size: int = 0,
+    ) -> None:
+        """Initialize the stage.
+
+        Args:
+            name: name of the stage, used in statistics
+            func: function run on each item, returning items for the next
+                stage
+            workers: optional; number of worker threads; defaults to 1
+            executor: optional; if provided, `func` is run in this executor
+                instead of the worker threads, e.g. a ProcessPoolExecutor for
+                CPU-bound work; `func` must then be picklable and return a
+                list
+            queue_size: optional; capacity of the queue feeding this stage;
+                defaults to twice the number of workers
+
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.executor = executor
+        self.queue_size = queue_size or 2 * self.workers
+
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def process(self, item: Any) -> list[Any]:
+        """Process an item, counting it in the stage's statistics.
+
+        Args:
+            item: item from the previous stage
+
+        Returns:
+            list[Any]: items for the next stage
+
+        """
+        start = time.perf_counter()
+        if self.executor:
+            results = list(self.executor.submit(self.func, item).result())
+        else:
+            results = list(self.func(item))
+        busy = time.perf_counter() - start
+
+        with self._lock:
+            self.items_in += 1
+            self.items_out += len(results)
+            self.busy += busy
+
+        return results
+
+
+class Pipeline:
+    """Defines stages connected by bounded queues.
+
+    Items flow from a source through each stage in order. Every stage runs in
+    its own worker threads, so slow stages (e.g. fetching over the network)
+    can be sized independently of fast ones (e.g. matching).
+
+    Once the deadline passes (see deadline.start()), items left for the first
+    stage are skipped instead of processed, so the pipeline finishes with
+    partial results.
+
+    """
+
+    def __init__(self, name: str, stages: list[Stage]) -> None:
+        """Initialize the pipeline.
+
+        Args:
+            name: name of the pipeline, used in statistics
+            stages: stages in the order that items flow through them
+
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+
+        self.name = name
+        self.stages = stages
+        self._stop = threading.Event()
+        self._error: BaseException | None = None
+        self._lock = threading.Lock()
+
+    def _fail(self, error: BaseException) -> None:
+        """Stop the pipeline because of an error.
+
+        Args:
+            error: the first error stops the pipeline; others are ignored
+
+        """
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def _put(self, q: queue.Queue[Any], item: Any) -> None:
+        """Put an item into a queue, blocking while it's full.
+
+        Raises:
+            _Stopped: the pipeline stopped while waiting
+
+        """
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+        raise _Stopped
+
+    def _get(self, q: queue.Queue[Any]) -> Any:
+        """Get an item from a queue, blocking while it's empty.
+
+        Raises:
+            _Stopped: the pipeline stopped while waiting
+
+        """
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        raise _Stopped
+
+    def _feed(self, items: Iterable[Any], q: queue.Queue[Any]) -> None:
+        """Feed items from the source into the first stage."""
+        try:
+            for item in items:
+                self._put(q, item)
+            for _ in range(self.stages[0].workers):
+                self._put(q, _DONE)
+        except _Stopped:
+            pass
+        except Exception as e:
+            self._fail(e)
+
+    def _work(
+        self,
+        stage: Stage,
+        q_in: queue.Queue[Any],
+        q_out: queue.Queue[Any],
+        remaining: list[int],
+        n_next: int,
+    ) -> None:
+        """Run a worker of a stage until its input is exhausted.
+
+        Args:
+            stage: the stage this worker belongs to
+            q_in: queue feeding the stage
+            q_out: queue feeding the next stage (or the output)
+            remaining: number of workers still running in the stage; the
+                last worker to finish signals the next stage
+            n_next: number of workers in the next stage
+
+        """
+        # Items of the first stage are repositories, as counted by --progress
+        # and skipped once the deadline passes
+        first = stage is self.stages[0]
+        try:
+            while (item := self._get(q_in)) is not _DONE:
+                if first and deadline.expired():
+                    deadline.skip(item)
+                    continue
+                try:
+                    results = stage.process(item)
+                except Exception:
+                    # Requests in flight fail when the deadline passes
+                    if not (first and deadline.expired()):
+                        raise
+                    deadline.skip(item)
+                    continue
+                for result in results:
+                    self._put(q_out, result)
+                if first:
+                    progress.advance()
+
+            with self._lock:
+                remaining[0] -= 1
+                last = not remaining[0]
+            if last:
+                for _ in range(n_next):
+                    self._put(q_out, _DONE)
+        except _Stopped:
+            pass
+        except Exception as e:
+            self._fail(e)
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Run the pipeline on the items.
+
+        Args:
+            items: items fed into the first stage
+
+        Returns:
+            Iterator[Any]: items from the last stage, in order of completion
+
+        Raises:
+            Exception: any unhandled error from a stage or the source
+
+        """
+        self._stop.clear()
+        self._error = None
+
+        queues: list[queue.Queue[Any]] = [
+            queue.Queue(stage.queue_size) for stage in self.stages
+        ]
+        queues.append(queue.Queue(self.stages[-1].queue_size))
+
+        threads = [_spawn(self._feed, items, queues[0])]
+        for i, stage in enumerate(self.stages):
+            n_next = (
+                self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            )
+            remaining = [stage.workers]
+            threads.extend(
+                _spawn(
+                    self._work,
+                    stage,
+                    queues[i],
+                    queues[i + 1],
+                    remaining,
+                    n_next,
+                )
+                for _ in range(stage.workers)
+            )
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        try:
+            while (result := self._get(queues[-1])) is not _DONE:
+                yield result
+        except _Stopped:
+            pass
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self.record_stats(time.perf_counter() - start)
+
+        if self._error:
+            raise self._error
+
+    def record_stats(self, elapsed: float) -> None:
+        """Record the throughput of each stage.
+
+        Args:
+            elapsed: seconds the pipeline ran for
+
+        """
+        section = f"pipeline ({self.name})"
+        for stage in self.stages:
+            rate = stage.items_in / elapsed if elapsed else 0.0
+            usage = stage.busy / (elapsed * stage.workers) if elapsed else 0.0
+            stats.record(
+                section,
+                stage.name,
+                f"{stage.items_in} in, {stage.items_out} out,"
+                f" {rate:.1f}/s with {stage.workers} worker(s),"
+                f" {usage:.0%} busy",
+            )
+        stats.record(section, "elapsed", f"{elapsed:.2f}s")
@@ -0,0 +1,268 @@
+import contextvars
+from collections import defaultdict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import TypeVar
+
+from . import config
+from . import gitea
+from . import package
+
+
+T = TypeVar("T")
+
+
+class ProfilesFailed(RuntimeError):
+    """Some instances couldn't be scanned; the report is missing them."""
+
+    def __init__(self, failed: list[str]) -> None:
+        """Initialize the error.
+
+        Args:
+            failed: names of the profiles that failed
+
+        """
+        super().__init__(f"Could not scan {', '.join(failed)}")
+        self.failed = failed
+
+
+def tag(profile: str, u_repo: str) -> str:
+    """Tag a full repository name with the profile of its instance.
+
+    Args:
+        profile: name of the profile
+        u_repo: full repository name
+
+    Returns:
+        str: the tagged name, e.g. work:user/repo
+
+    """
+    return f"{profile}:{u_repo}"
+
+
+def scan_profile(
+    profile: str, scan: Callable[[int], T], workers: int | None = None
+) -> T:
+    """Scan the instance of a profile.
+
+    Args:
+        profile: name of the profile
+        scan: function scanning the current instance, given the number of
+            threads fetching from it
+        workers: optional; number of threads fetching from the instance;
+            defaults to the profile's own, or 1
+
+    Returns:
+        T: the results of `scan`
+
+    """
+    with (
+        gitea.instance.Instance(config.get_profile(profile)) as instance,
+        gitea.instance.use(instance),
+    ):
+        config.logger.info(f"Scanning {profile} ({instance.config.host})")
+        return scan(workers or instance.workers or 1)
+
+
+def scan_profiles(
+    profiles: list[str], scan: Callable[[int], T], workers: int | None = None
+) -> tuple[dict[str, T], list[str]]:
+    """Scan the instances of several profiles at once.
+
+    Each instance is scanned in its own thread, with its own session. A scan
+    that fails (including a refused token) is logged, and the others
+    continue; callers report the failures once the others are reported.
+
+    Args:
+        profiles: names of the profiles
+        scan: function scanning the current instance, given the number of
+            threads fetching from it
+        workers: optional; number of threads fetching from each instance;
+            defaults to each profile's own, or 1
+
+    Returns:
+        tuple[dict[str, T], list[str]]: results of `scan` for each profile
+            that succeeded, and the profiles that failed
+
+    """
+    results: dict[str, T] = {}
+    failed: list[str] = []
+    with ThreadPoolExecutor(len(profiles)) as executor:
+        futures = {
+            profile: executor.submit(
+                contextvars.copy_context().run,
+                scan_profile,
+                profile,
+                scan,
+                workers,
+            )
+            for profile in profiles
+        }
+        for profile, future in futures.items():
+            try:
+                results[profile] = future.result()
+            except Exception as e:
+                config.logger.error(f"Could not scan {profile}: {e}")
+                failed.append(profile)
+
+    return results, failed
+
+
+def get_keyed_repos(
+    profiles: list[str],
+    shard: gitea.shard.Shard | None = None,
+    output: Path | None = None,
+    workers: int | None = None,
+    since: datetime | None = None,
+    resume: bool = False,
+) -> None:
+    """Get the deploy keys for all repositories of several instances.
+
+    Args:
+        profiles: names of the profiles of the instances
+        shard: optional; if provided, only search repositories in this shard
+        output: optional; if provided, write results to this JSON file
+            instead of listing them
+        workers: optional; number of threads fetching from each instance;
+            defaults to each profile's own, or 1
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, resume an interrupted scan from its
+            checkpoint
+
+    """
+    results, failed = scan_profiles(
+        profiles,
+        lambda n: gitea.repo.deploy_key.find_keyed_repos(
+            shard, n, since, resume
+        ),
+        workers,
+    )
+
+    repos_keys: gitea.repo.deploy_key.ReposKeys = defaultdict(list)
+    for profile, found in results.items():
+        for key, repos in found.items():
+            repos_keys[key].extend(tag(profile, repo) for repo in repos)
+
+    if output:
+        gitea.repo.deploy_key.dump_keyed_repos(
+            repos_keys, output, shard, failed
+        )
+    else:
+        gitea.repo.deploy_key.list_keyed_repos(repos_keys)
+    if failed:
+        raise ProfilesFailed(failed)
+
+
+def list_dependent_repos(
+    profiles: list[str],
+    pkg: str,
+    ver_restrict: package.specifier.Specifier = package.specifier.ANY_VERSION,
+    shard: gitea.shard.Shard | None = None,
+    output: Path | None = None,
+    workers: int | None = None,
+    processes: int = 0,
+    since: datetime | None = None,
+    resume: bool = False,
+) -> None:
+    """List repositories of several instances dependent on given `pkg`.
+
+    Args:
+        profiles: names of the profiles of the instances
+        pkg: a third party package
+        ver_restrict: optional; a specifier to restrict listings
+        shard: optional; if provided, only search repositories in this shard
+        output: optional; if provided, write results to this JSON file
+            instead of listing them
+        workers: optional; number of threads fetching from each instance;
+            defaults to each profile's own, or 1
+        processes: optional; number of worker processes decoding and parsing
+            package files of each instance
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, resume an interrupted scan from its
+            checkpoint
+
+    """
+    results, failed = scan_profiles(
+        profiles,
+        lambda n: package.python.find_dependent_repos(
+            pkg, ver_restrict, shard, n, processes, since, resume
+        ),
+        workers,
+    )
+
+    dependents: package.formats.Dependents = {}
+    for profile, found in results.items():
+        for repo, repo_version in found.items():
+            dependents[tag(profile, repo)] = repo_version
+
+    if output:
+        package.python.dump_dependent_repos(
+            dependents, pkg, ver_restrict, output, shard, failed
+        )
+    else:
+        package.python.list_found_repos(dependents, ver_restrict)
+    if failed:
+        raise ProfilesFailed(failed)
+
+
+def list_outdated_repos(
+    profiles: list[str],
+    shard: gitea.shard.Shard | None = None,
+    output: Path | None = None,
+    workers: int | None = None,
+    processes: int = 0,
+    mirror: Path | None = None,
+    since: datetime | None = None,
+    resume: bool = False,
+) -> None:
+    """List repositories of several instances using older package versions.
+
+    Args:
+        profiles: names of the profiles of the instances
+        shard: optional; if provided, only search repositories in this shard
+        output: optional; if provided, write results to this JSON file
+            instead of listing them
+        workers: optional; number of threads fetching from each instance;
+            defaults to each profile's own, or 1
+        processes: optional; number of worker processes decoding and parsing
+            package files of each instance
+        mirror: optional; path to a local package index mirror to compare
+            against
+        since: optional; if provided, only search repositories updated after
+            this time
+        resume: optional; if True, resume an interrupted scan from its
+            checkpoint
+
+    """
+    get_latest = package.mirror.Mirror(mirror).get_latest if mirror else None
+    results, failed = scan_profiles(
+        profiles,
+        lambda n: package.outdated.find_outdated(
+            shard, n, processes, since, resume
+        ),
+        workers,
+    )
+
+    histograms: package.outdated.Histograms = {}
+    for profile, found in results.items():
+        tagged = {
+            pkg: {
+                ver: [tag(profile, repo) for repo in repos]
+                for ver, repos in histogram.items()
+            }
+            for pkg, histogram in found.items()
+        }
+        package.outdated.merge_histograms(histograms, tagged)
+
+    if output:
+        package.outdated.dump_outdated(
+            histograms, output, shard, mirror, failed
+        )
+    else:
+        package.outdated.list_outdated(histograms, get_latest)
+    if failed:
+        raise ProfilesFailed(failed)
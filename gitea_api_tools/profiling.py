@@ -0,0 +1,229 @@
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, ParamSpec, TypeVar
+
+from . import config
+from . import stats
+
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# Reports are written here, named after when profiling started
+REPORT_DIR = config.cache_dir
+# Number of entries in each report
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 30
+# Number of frames kept for each allocation
+ALLOCATION_FRAMES = 10
+
+# Phases are only timed while profiling
+_active = False
+# Each phase maps to how many times it ran and for how long in total
+_phases: dict[str, list[float]] = {}
+_lock = threading.Lock()
+
+
+def phase(name: str) -> Callable[[Callable[P, T]], Callable[P, T]]:
+    """Annotate a function as a phase of a scan, as a decorator.
+
+    While profiling, the time spent in each phase is summed up and added to
+    the reports, e.g. to compare listing repositories with decoding files.
+    Otherwise, the function is called as is. Phases run in worker processes
+    aren't counted.
+
+    Args:
+        name: name of the phase, e.g. decode
+
+    Returns:
+        Callable[[Callable[P, T]], Callable[P, T]]: decorator timing the
+            function
+
+    """
+
+    def decorator(func: Callable[P, T]) -> Callable[P, T]:
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            if not _active:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with _lock:
+                    totals = _phases.setdefault(name, [0, 0.0])
+                    totals[0] += 1
+                    totals[1] += elapsed
+
+        return wrapper
+
+    return decorator
+
+
+def format_phases() -> str:
+    """Format the time spent in each phase.
+
+    Phases in threads overlap, so their times can add up to more than the
+    time the sub-command took.
+
+    Returns:
+        str: one line per phase
+
+    """
+    with _lock:
+        phases = {name: tuple(totals) for name, totals in _phases.items()}
+
+    return "\n".join(
+        f"{name}: {int(count)} call(s), {seconds:.3f}s"
+        for name, (count, seconds) in sorted(
+            phases.items(), key=lambda item: -item[1][1]
+        )
+    )
+
+
+class _CpuProfiler:
+    """Profiles the current thread and every thread started afterwards.
+
+    cProfile only profiles the thread it's enabled in, so each new thread
+    gets its own profiler; they're combined into one report.
+
+    """
+
+    def __init__(self) -> None:
+        """Initialize the profiler."""
+        self.profiles: list[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _profile_thread(self, *args: Any) -> None:
+        """Start profiling a new thread; set with threading.setprofile()."""
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def start(self) -> None:
+        """Start profiling."""
+        threading.setprofile(self._profile_thread)
+        self._profile_thread()
+
+    def stop(self) -> list[cProfile.Profile]:
+        """Stop profiling.
+
+        Returns:
+            list[cProfile.Profile]: the profiles of all threads
+
+        """
+        threading.setprofile(None)
+        with self._lock:
+            profiles = list(self.profiles)
+        # Threads started during profiling have finished by now
+        profiles[0].disable()
+        return profiles
+
+
+def write_cpu_report(profiles: list[cProfile.Profile], prefix: Path) -> None:
+    """Write a CPU profile combined from all threads, raw and as text.
+
+    Args:
+        profiles: the profiles of all threads
+        prefix: path of the reports, without a suffix
+
+    """
+    text = io.StringIO()
+    combined = pstats.Stats(*profiles, stream=text)
+    combined.dump_stats(prefix.with_suffix(".pstats"))
+    combined.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    combined.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+    with prefix.with_suffix(".txt").open("w") as f:
+        f.write(f"Phases:\n{format_phases()}\n")
+        f.write(text.getvalue())
+
+
+def write_memory_report(snapshot: tracemalloc.Snapshot, file: Path) -> None:
+    """Write the top allocations of a memory profile.
+
+    Args:
+        snapshot: snapshot of allocations taken at the end
+        file: path of the report
+
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = snapshot.filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    )
+    with file.open("w") as f:
+        f.write(f"Current: {current / 1024:.1f} KiB\n")
+        f.write(f"Peak: {peak / 1024:.1f} KiB\n")
+        f.write(f"\nPhases:\n{format_phases()}\n")
+        f.write(f"\nTop {TOP_ALLOCATIONS} allocations by line:\n")
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+        f.write(f"\nTop {TOP_ALLOCATIONS} allocations by traceback:\n")
+        for stat in snapshot.statistics("traceback")[:TOP_ALLOCATIONS]:
+            f.write(f"\n{stat}\n")
+            for line in stat.traceback.format():
+                f.write(f"{line}\n")
+
+
+@contextmanager
+def profile(cpu: bool = False, memory: bool = False) -> Iterator[None]:
+    """Profile what runs inside the context, writing reports at the end.
+
+    Reports are written to the state directory, named after when profiling
+    started: profile-*.pstats and profile-*.txt for CPU, and memory-*.txt for
+    memory.
+
+    Args:
+        cpu: optional; if True, profile CPU time with cProfile
+        memory: optional; if True, trace allocations with tracemalloc
+
+    Returns:
+        Iterator[None]: for use in a with statement
+
+    """
+    global _active
+    if not cpu and not memory:
+        yield
+        return
+
+    with _lock:
+        _phases.clear()
+    _active = True
+    started = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    if memory:
+        tracemalloc.start(ALLOCATION_FRAMES)
+    profiler = _CpuProfiler() if cpu else None
+    if profiler:
+        profiler.start()
+
+    try:
+        yield
+    finally:
+        profiles = profiler.stop() if profiler else None
+        snapshot = tracemalloc.take_snapshot() if memory else None
+        _active = False
+
+        if profiles:
+            prefix = REPORT_DIR / f"profile-{started}"
+            write_cpu_report(profiles, prefix)
+            config.logger.info(f"CPU profile written to {prefix}.txt")
+        if snapshot:
+            file = REPORT_DIR / f"memory-{started}.txt"
+            write_memory_report(snapshot, file)
+            tracemalloc.stop()
+            config.logger.info(f"Memory profile written to {file}")
+
+        with _lock:
+            for name, (count, seconds) in _phases.items():
+                stats.record("phases", name, f"{int(count)}x, {seconds:.3f}s")
@@ -0,0 +1,228 @@
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TextIO
+
+from . import config
+
+
+# Seconds between redraws of the progress line
+REDRAW_INTERVAL = 0.5
+# Returns to the start of the line and clears it
+CLEAR_LINE = "\r\x1b[K"
+
+
+class _ClearingFormatter(logging.Formatter):
+    """Clears the progress line before each log record.
+
+    Records are formatted while their handler's lock is held, which the
+    reporter also holds while drawing, so the two never interleave.
+
+    """
+
+    def __init__(self, formatter: logging.Formatter | None) -> None:
+        """Initialize the formatter.
+
+        Args:
+            formatter: the formatter being wrapped
+
+        """
+        super().__init__()
+        self.formatter = formatter or logging.Formatter()
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format the record after clearing the line."""
+        return CLEAR_LINE + self.formatter.format(record)
+
+
+class Reporter:
+    """Shows the progress of a scan on a single line of a terminal.
+
+    Counters are only updated by scans; the line is redrawn by a background
+    thread at most every REDRAW_INTERVAL seconds, so scans pay for a lock and
+    an addition, not for drawing.
+
+    """
+
+    def __init__(
+        self, stream: TextIO, interval: float = REDRAW_INTERVAL
+    ) -> None:
+        """Initialize the reporter.
+
+        Args:
+            stream: the terminal to draw on
+            interval: optional; seconds between redraws
+
+        """
+        self.stream = stream
+        self.interval = interval
+        # Number of repositories expected, and scanned so far
+        self.total = 0
+        self.done = 0
+        # Other counters, like requests and cache hits
+        self.counts: dict[str, int] = defaultdict(int)
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._redraw, daemon=True)
+
+        # Log records to the same terminal clear the line first
+        self._handler: logging.Handler | None = None
+        self._formatter: logging.Formatter | None = None
+        for handler in config.logger.handlers:
+            if (
+                isinstance(handler, logging.StreamHandler)
+                and handler.stream is stream
+            ):
+                self._handler = handler
+                self._formatter = handler.formatter
+
+    def add_total(self, amount: int) -> None:
+        """Add to the number of repositories expected."""
+        with self._lock:
+            self.total += amount
+
+    def advance(self, amount: int = 1) -> None:
+        """Add to the number of repositories scanned."""
+        with self._lock:
+            self.done += amount
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a counter, e.g. requests."""
+        with self._lock:
+            self.counts[name] += amount
+
+    def format(self) -> str:
+        """Format the progress line.
+
+        Returns:
+            str: repositories done and expected, requests per second, cache
+                hit rate and estimated time left, as far as they're known
+
+        """
+        with self._lock:
+            total = max(self.total, self.done)
+            done = self.done
+            requests = self.counts["requests"]
+            hits = self.counts["cache hits"]
+            misses = self.counts["cache misses"]
+        elapsed = time.monotonic() - self.started
+
+        if total:
+            parts = [f"{done}/{total} repos ({done / total:.0%})"]
+        else:
+            parts = [f"{done} repos"]
+        if elapsed:
+            parts.append(f"{requests / elapsed:.1f} req/s")
+        if hits + misses:
+            parts.append(f"cache {hits / (hits + misses):.0%} hits")
+        if done and total > done:
+            left = int(elapsed / done * (total - done))
+            parts.append(f"ETA {left // 60}m{left % 60:02d}s")
+
+        return " | ".join(parts)
+
+    def draw(self) -> None:
+        """Redraw the progress line."""
+        line = CLEAR_LINE + self.format()
+        if self._handler:
+            self._handler.acquire()
+        try:
+            self.stream.write(line)
+            self.stream.flush()
+        finally:
+            if self._handler:
+                self._handler.release()
+
+    def _redraw(self) -> None:
+        """Redraw the progress line periodically until stopped."""
+        while not self._stop.wait(self.interval):
+            self.draw()
+
+    def start(self) -> None:
+        """Start drawing."""
+        if self._handler:
+            self._handler.setFormatter(_ClearingFormatter(self._formatter))
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop drawing, leaving the last progress line."""
+        self._stop.set()
+        self._thread.join()
+        self.draw()
+        self.stream.write("\n")
+        if self._handler:
+            self._handler.setFormatter(self._formatter)
+
+
+_reporter: Reporter | None = None
+
+
+def add_total(amount: int) -> None:
+    """Add to the number of repositories expected, if progress is shown.
+
+    Args:
+        amount: number of repositories; negative to correct an estimate
+
+    """
+    if _reporter:
+        _reporter.add_total(amount)
+
+
+def advance(amount: int = 1) -> None:
+    """Add to the number of repositories scanned, if progress is shown.
+
+    Args:
+        amount: optional; number of repositories
+
+    """
+    if _reporter:
+        _reporter.advance(amount)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add to a counter, e.g. requests, if progress is shown.
+
+    Args:
+        name: name of the counter
+        amount: optional; amount to add
+
+    """
+    if _reporter:
+        _reporter.count(name, amount)
+
+
+@contextmanager
+def report(
+    enabled: bool = True, stream: TextIO | None = None
+) -> Iterator[None]:
+    """Show progress while running what's inside the context.
+
+    Progress is only shown on terminals, so it's disabled when the output is
+    redirected, e.g. to a file or a pipe.
+
+    Args:
+        enabled: optional; if False, don't show progress
+        stream: optional; the terminal to draw on; defaults to stderr
+
+    Returns:
+        Iterator[None]: for use in a with statement
+
+    """
+    global _reporter
+    stream = stream or sys.stderr
+    if not enabled or not stream.isatty():
+        yield
+        return
+
+    _reporter = Reporter(stream)
+    _reporter.start()
+    try:
+        yield
+    finally:
+        _reporter.stop()
+        _reporter = None
@@ -0,0 +1,387 @@
+import json
+from collections import defaultdict
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TypeAlias
+
+from . import config
+from . import gitea
+from . import package
+from . import pipeline
+
+
+# An item flowing through a scan: what it is (e.g. deploy_keys, or pkg_file
+# for a package file still being decoded and parsed), and its data
+Item: TypeAlias = tuple[str, Any]
+# Repositories mapped to their languages, and the bytes of code in each
+Languages: TypeAlias = dict[str, dict[str, int]]
+
+# Names of the files written to the output directory, for each report
+OUTPUT_FILES = {
+    "deploy_keys": "deploy_keys.json",
+    "python": "python.json",
+    "outdated": "outdated.json",
+    "languages": "languages.json",
+}
+
+
+class Collectors:
+    """Defines which reports a scan collects results for.
+
+    Each report is the same as its own sub-command's, e.g. `deploy_keys`.
+
+    """
+
+    def __init__(
+        self,
+        deploy_keys: bool = False,
+        python: str | None = None,
+        ver_restrict: package.specifier.Specifier = (
+            package.specifier.ANY_VERSION
+        ),
+        outdated: bool = False,
+        languages: bool = False,
+        mirror: Path | None = None,
+    ) -> None:
+        """Initialize the collectors.
+
+        Args:
+            deploy_keys: optional; whether to collect deploy keys
+            python: optional; if provided, find repositories dependent on
+                this package
+            ver_restrict: optional; a specifier to restrict repositories
+                dependent on `python`
+            outdated: optional; whether to collect packages that some
+                repositories use older versions of
+            languages: optional; whether to collect the languages of
+                repositories
+            mirror: optional; path to a local package index mirror that
+                outdated packages are compared against
+
+        """
+        self.deploy_keys = deploy_keys
+        self.python = python
+        self.ver_restrict = ver_restrict
+        self.outdated = outdated
+        self.languages = languages
+        self.mirror = mirror
+
+    def __bool__(self) -> bool:
+        """Check whether any report is collected."""
+        return bool(
+            self.deploy_keys or self.python or self.outdated or self.languages
+        )
+
+    @property
+    def requirements(self) -> bool:
+        """Check whether Python requirements are needed by any report."""
+        return bool(self.python or self.outdated)
+
+
+class Results:
+    """Gathers the results of every report during a scan."""
+
+    def __init__(self) -> None:
+        """Initialize the results, empty."""
+        self.repos_keys: gitea.repo.deploy_key.ReposKeys = defaultdict(list)
+        self.usages: list[tuple[str, package.formats.Version]] = []
+        self.histograms: package.outdated.Histograms = {}
+        self.languages: Languages = {}
+
+    def add(self, item: Item, collectors: Collectors) -> None:
+        """Add an item from the scan to the reports it belongs to.
+
+        Args:
+            item: the item
+            collectors: the reports being collected
+
+        """
+        kind, data = item
+        match kind:
+            case "deploy_keys":
+                u_repo, keys = data
+                for key in keys:
+                    self.repos_keys[key].append(u_repo)
+            case "languages":
+                u_repo, languages = data
+                self.languages[u_repo] = languages
+            case "requirements":
+                u_repo, requirements = data
+                if collectors.python and collectors.python in requirements:
+                    self.usages.append(
+                        (u_repo, requirements[collectors.python])
+                    )
+                if collectors.outdated:
+                    package.outdated.add_requirements(
+                        self.histograms, u_repo, requirements
+                    )
+
+
+def decode_item(item: Item) -> list[Item]:
+    """Decode a package file, passing other items through.
+
+    This is a pipeline stage and may be run in a worker process.
+
+    Args:
+        item: an item from the scan
+
+    Returns:
+        list[Item]: the item, or the decoded package file; empty if it could
+            not be decoded
+
+    """
+    kind, data = item
+    if kind != "pkg_file":
+        return [item]
+    return [
+        (kind, decoded) for decoded in package.python.decode_pkg_file(data)
+    ]
+
+
+def parse_item(item: Item) -> list[Item]:
+    """Parse a package file, passing other items through.
+
+    This is a pipeline stage and may be run in a worker process.
+
+    Args:
+        item: an item from the scan
+
+    Returns:
+        list[Item]: the item, or the parsed package file; empty if it could
+            not be parsed
+
+    """
+    kind, data = item
+    if kind != "pkg_file":
+        return [item]
+    return [
+        ("parsed", parsed) for parsed in package.python.parse_pkg_file(data)
+    ]
+
+
+def collect(
+    collectors: Collectors,
+    shard: gitea.shard.Shard | None = None,
+    workers: int = 1,
+    processes: int = 0,
+    since: datetime | None = None,
+) -> Results:
+    """Scan every repository once, collecting results for several reports.
+
+    Repositories go through a pipeline: fetch -> decode -> parse -> resolve.
+    Each repository is listed once and only requested what its reports
+    need; e.g. its languages are requested once, even when they're both
+    collected and used to find Python repositories.
+
+    Args:
+        collectors: the reports to collect results for
+        shard: optional; if provided, only search repositories in this shard
+        workers: optional; number of threads fetching from the instance
+        processes: optional; number of worker processes decoding and parsing
+            package files; if 0, they're decoded and parsed in threads
+        since: optional; if provided, only search repositories updated after
+            this time
+
+    Returns:
+        Results: the results of every report
+
+    """
+    stages = package.python.RequirementsStages(processes)
+
+    def fetch(record: gitea.records.RepoRecord) -> list[Item]:
+        u_repo = record.full_name
+        items: list[Item] = []
+        if collectors.deploy_keys and record.can_read_keys():
+            items.extend(
+                ("deploy_keys", found)
+                for found in gitea.repo.deploy_key.get_keys_of_repo(u_repo)
+            )
+        if not record.has_files():
+            return items
+
+        needs_requirements = collectors.requirements
+        check_language = None
+        if collectors.languages:
+            languages = gitea.repo.get_languages(u_repo)
+            items.append(("languages", (u_repo, languages)))
+            needs_requirements = needs_requirements and "Python" in languages
+            check_language = False
+        if needs_requirements:
+            items.extend(
+                ("pkg_file", pkg_file)
+                for pkg_file in stages.fetch(record, check_language)
+            )
+
+        return items
+
+    def resolve(item: Item) -> list[Item]:
+        kind, data = item
+        if kind != "parsed":
+            return [item]
+        requirements = stages.resolve(data)
+        if requirements is None:
+            return []
+        return [("requirements", (data[0], requirements))]
+
+    results = Results()
+    records = gitea.api.list_records(shard, since)
+    with stages:
+        scan = pipeline.Pipeline(
+            "scan",
+            stages.get_stages(
+                fetch, resolve, workers, decode_item, parse_item
+            ),
+        )
+        for item in scan.run(records):
+            results.add(item, collectors)
+
+    return results
+
+
+def list_languages(languages: Languages) -> None:
+    """List languages by the number of repositories using them.
+
+    Args:
+        languages: repositories mapped to their languages
+
+    """
+    using: dict[str, list[str]] = defaultdict(list)
+    for u_repo, used in languages.items():
+        for language in used:
+            using[language].append(u_repo)
+
+    for language, repos in sorted(
+        using.items(), key=lambda pair: (-len(pair[1]), pair[0])
+    ):
+        config.logger.info(f"{language}: {len(repos)} repos")
+
+
+def dump_languages(
+    languages: Languages,
+    file: Path,
+    shard: gitea.shard.Shard | None = None,
+) -> None:
+    """Write the languages of repositories to a JSON file.
+
+    The file can later be combined with others using `gitea-api merge`.
+
+    Args:
+        languages: repositories mapped to their languages
+        file: path to the JSON file
+        shard: optional; the shard the results were collected from
+
+    """
+    with file.open("w") as f:
+        json.dump(
+            {
+                "command": "languages",
+                "shard": gitea.shard.to_str(shard) if shard else None,
+                "results": languages,
+            },
+            fp=f,
+            indent=4,
+        )
+
+
+def report(
+    results: Results,
+    collectors: Collectors,
+    output: Path | None = None,
+    shard: gitea.shard.Shard | None = None,
+    get_latest: Callable[[str], package.formats.Version | None] | None = None,
+) -> None:
+    """List or write the results of every report collected.
+
+    Args:
+        results: the results
+        collectors: the reports that were collected
+        output: optional; if provided, write each report to a JSON file in
+            this directory (see OUTPUT_FILES) instead of listing them
+        shard: optional; the shard the results were collected from
+        get_latest: optional; looks up the latest version of a package, to
+            compare outdated packages against
+
+    """
+    if output:
+        output.mkdir(parents=True, exist_ok=True)
+
+    if collectors.deploy_keys:
+        if output:
+            gitea.repo.deploy_key.dump_keyed_repos(
+                results.repos_keys, output / OUTPUT_FILES["deploy_keys"], shard
+            )
+        else:
+            config.logger.info("Deploy keys:")
+            gitea.repo.deploy_key.list_keyed_repos(results.repos_keys)
+
+    if collectors.python:
+        dependents = package.python.match_versions(
+            results.usages, collectors.ver_restrict
+        )
+        if output:
+            package.python.dump_dependent_repos(
+                dependents,
+                collectors.python,
+                collectors.ver_restrict,
+                output / OUTPUT_FILES["python"],
+                shard,
+            )
+        else:
+            config.logger.info(f"Repositories using {collectors.python}:")
+            package.python.list_found_repos(
+                dependents, collectors.ver_restrict
+            )
+
+    if collectors.outdated:
+        if output:
+            package.outdated.dump_outdated(
+                results.histograms,
+                output / OUTPUT_FILES["outdated"],
+                shard,
+                collectors.mirror,
+            )
+        else:
+            config.logger.info("Outdated packages:")
+            package.outdated.list_outdated(results.histograms, get_latest)
+
+    if collectors.languages:
+        if output:
+            dump_languages(
+                results.languages, output / OUTPUT_FILES["languages"], shard
+            )
+        else:
+            config.logger.info("Languages:")
+            list_languages(results.languages)
+
+
+def scan_repos(
+    collectors: Collectors,
+    shard: gitea.shard.Shard | None = None,
+    output: Path | None = None,
+    workers: int = 1,
+    processes: int = 0,
+    since: datetime | None = None,
+) -> None:
+    """Scan every repository once for several reports.
+
+    Args:
+        collectors: the reports to collect results for
+        shard: optional; if provided, only search repositories in this shard
+        output: optional; if provided, write each report to a JSON file in
+            this directory instead of listing them
+        workers: optional; number of threads fetching from the instance
+        processes: optional; number of worker processes decoding and parsing
+            package files; if 0, they're decoded and parsed in threads
+        since: optional; if provided, only search repositories updated after
+            this time
+
+    """
+    # Read the mirror first, so a bad mirror doesn't waste a scan
+    get_latest = (
+        package.mirror.Mirror(collectors.mirror).get_latest
+        if collectors.outdated and collectors.mirror and not output
+        else None
+    )
+    results = collect(collectors, shard, workers, processes, since)
+    report(results, collectors, output, shard, get_latest)
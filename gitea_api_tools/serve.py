@@ -0,0 +1,676 @@
+import contextvars
+import hashlib
+import json
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from . import config
+from . import gitea
+from . import package
+from . import pipeline
+from . import webhook
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8734
+# Seconds between background refreshes of the index
+DEFAULT_INTERVAL = 900
+# Every this many refreshes, all repositories are rescanned; otherwise, only
+# repositories updated since the last refresh are. Deploy keys can change
+# without updating a repository, so they're only picked up by full refreshes.
+FULL_REFRESH_EVERY = 12
+# Seconds the client waits for the server
+CLIENT_TIMEOUT = 30
+
+
+def get_index_file() -> Path:
+    """Get the file the index of the instance is persisted to.
+
+    Servers of different instances (e.g. with --profile) keep their own
+    indexes.
+
+    Returns:
+        Path: path to the index file in the state directory
+
+    """
+    host = getattr(gitea.api.get_config(), "host_api", "")
+    digest = hashlib.sha256(host.encode()).hexdigest()[:16]
+    return config.cache_dir / f"index-{digest}.json"
+
+
+def scan_repo(
+    record: gitea.records.RepoRecord,
+    stages: package.python.RequirementsStages,
+) -> list[tuple[str, dict[str, Any]]]:
+    """Scan a repository for its entry in the index.
+
+    This is a pipeline stage. Requests that can't have results, according to
+    the record of the repository, are skipped.
+
+    Args:
+        record: record of the repository
+        stages: stages resolving requirements, run here one after another
+
+    Returns:
+        list[tuple[str, dict[str, Any]]]: full repository name and its entry:
+            when it was updated, its requirements (None if it has none) and
+            its deploy keys (None if they couldn't be read)
+
+    """
+    u_repo = record.full_name
+    requirements = None
+    if record.has_files():
+        for pkg_file in stages.fetch(record):
+            requirements = stages.read(pkg_file)
+
+    keys = None
+    if record.can_read_keys():
+        keyed = gitea.repo.deploy_key.get_keys_of_repo(u_repo)
+        keys = keyed[0][1] if keyed else None
+
+    return [
+        (
+            u_repo,
+            {
+                "updated": record.updated,
+                "requirements": requirements,
+                "keys": keys,
+            },
+        )
+    ]
+
+
+class Index:
+    """Holds repositories with their requirements and deploy keys in memory.
+
+    The index can be refreshed while it's being queried. It's also persisted
+    to the state directory, so a restarted server only needs to rescan what
+    changed in the meantime.
+
+    Refreshes and webhooks share the same stages, and so the same cache of
+    requirements, for the lifetime of the index. Enter `stages` while the
+    index is used, so the cache is saved and its statistics recorded at the
+    end.
+
+    """
+
+    def __init__(self, workers: int = 1, file: Path | None = None) -> None:
+        """Initialize the index, loading it from `file` if it exists.
+
+        Args:
+            workers: optional; number of threads fetching from the instance
+                when refreshing
+            file: optional; path to persist the index to, e.g. from
+                get_index_file(); if None, the index is kept in memory only
+
+        """
+        self.workers = workers
+        self.file = file
+        self.stages = package.python.RequirementsStages()
+        self.repos: dict[str, dict[str, Any]] = {}
+        self.refreshes = 0
+        self.last_refresh: str | None = None
+        # Version indexes of packages, dropped whenever repositories change
+        self._versions: dict[str, package.specifier.VersionIndex] = {}
+        # Counts changes from webhooks, and maps repositories to their last
+        # change; refreshes keep changes made after they started
+        self._changes = 0
+        self._changed: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if not file:
+            return
+
+        try:
+            with file.open() as f:
+                stored = json.load(f)
+            self.repos = stored["repos"]
+            self.last_refresh = stored["last_refresh"]
+        except FileNotFoundError:
+            pass
+        except (OSError, KeyError, TypeError, json.decoder.JSONDecodeError):
+            config.logger.warning(f"{file} is malformed; starting over")
+
+    def save(self) -> None:
+        """Persist the index to its file, if it has one, and the cache.
+
+        The file is replaced at once, so a server stopped while saving leaves
+        the previous index intact.
+
+        """
+        self.stages.cache.save()
+        if not self.file:
+            return
+
+        with self._lock:
+            stored = {"repos": self.repos, "last_refresh": self.last_refresh}
+            partial = self.file.with_suffix(".tmp")
+            with partial.open("w") as f:
+                json.dump(stored, fp=f)
+            partial.replace(self.file)
+
+    def _mark_changed(self, u_repo: str) -> None:
+        """Mark a repository as changed by a webhook; hold the lock."""
+        self._changes += 1
+        self._changed[u_repo] = self._changes
+
+    def rescan(self, u_repo: str, updated: str | None) -> None:
+        """Rescan a single repository.
+
+        Args:
+            u_repo: full repository name
+            updated: when the repository was last updated
+
+        """
+        # Webhooks don't send the full record, so nothing is skipped
+        record = gitea.records.RepoRecord(
+            {"full_name": u_repo, "updated_at": updated}
+        )
+        entries = dict(scan_repo(record, self.stages))
+
+        with self._lock:
+            self.repos.update(entries)
+            for name in entries:
+                self._mark_changed(name)
+            self._versions.clear()
+
+    def apply(self, action: webhook.Action) -> None:
+        """Apply an action from a webhook event to the index.
+
+        Args:
+            action: the action from webhook.parse_event()
+
+        """
+        kind, u_repo, updated = action
+        with self._lock:
+            known = u_repo in self.repos
+            if kind == webhook.REMOVE:
+                self.repos.pop(u_repo, None)
+                self._mark_changed(u_repo)
+                self._versions.clear()
+            elif kind == webhook.TOUCH and known:
+                self.repos[u_repo]["updated"] = updated
+                self._mark_changed(u_repo)
+
+        if kind == webhook.RESCAN or (kind == webhook.TOUCH and not known):
+            self.rescan(u_repo, updated)
+
+        config.logger.info(f"Webhook: {kind} {u_repo}")
+        self.save()
+
+    def refresh(self, full: bool = False) -> int:
+        """Refresh the index from the instance.
+
+        Repositories changed by webhooks while refreshing are left as they
+        are, since the refresh may have scanned them before the change.
+
+        Args:
+            full: optional; if True, rescan every repository; otherwise, only
+                rescan repositories that were updated since they were scanned
+
+        Returns:
+            int: number of repositories that were scanned
+
+        """
+        with self._lock:
+            start = self._changes
+        listed = {
+            record.full_name: record for record in gitea.api.list_records()
+        }
+        with self._lock:
+            known = {
+                name: entry["updated"] for name, entry in self.repos.items()
+            }
+
+        stale = [
+            record
+            for name, record in listed.items()
+            if full or name not in known or known[name] != record.updated
+        ]
+
+        scan = pipeline.Pipeline(
+            "serve",
+            [
+                pipeline.Stage(
+                    "fetch",
+                    lambda repo: scan_repo(repo, self.stages),
+                    self.workers,
+                )
+            ],
+        )
+        entries = dict(scan.run(stale))
+
+        with self._lock:
+            kept = {
+                name
+                for name, change in self._changed.items()
+                if change > start
+            }
+            for name in set(self.repos) - set(listed) - kept:
+                del self.repos[name]
+            for name in set(entries) - kept:
+                self.repos[name] = entries[name]
+            self._versions.clear()
+            self.refreshes += 1
+            self.last_refresh = datetime.now(timezone.utc).isoformat()
+
+        config.logger.info(
+            f"Refreshed index: scanned {len(entries)} of {len(listed)} repos"
+        )
+        self.save()
+        return len(entries)
+
+    def find_dependent_repos(
+        self,
+        pkg: str,
+        ver_restrict: package.specifier.Specifier = (
+            package.specifier.ANY_VERSION
+        ),
+    ) -> package.formats.Dependents:
+        """Find repositories dependent on given `pkg`.
+
+        Args:
+            pkg: a third party package
+            ver_restrict: optional; a specifier to restrict listings
+
+        Returns:
+            package.formats.Dependents: repositories mapped to the version of
+                `pkg` that they use
+
+        """
+        with self._lock:
+            versions = self._versions.get(pkg)
+            if versions is None:
+                versions = package.specifier.VersionIndex(
+                    (name, entry["requirements"][pkg])
+                    for name, entry in self.repos.items()
+                    if pkg in (entry["requirements"] or {})
+                )
+                self._versions[pkg] = versions
+
+        return versions.find(ver_restrict)
+
+    def find_outdated(self) -> package.outdated.Histograms:
+        """Count the versions of every package used by the repositories.
+
+        Returns:
+            package.outdated.Histograms: histograms of every package
+
+        """
+        with self._lock:
+            repos = list(self.repos.items())
+
+        histograms: package.outdated.Histograms = {}
+        for name, entry in repos:
+            if entry["requirements"]:
+                package.outdated.add_requirements(
+                    histograms, name, entry["requirements"]
+                )
+
+        return histograms
+
+    def get_keyed_repos(self) -> gitea.repo.deploy_key.ReposKeys:
+        """Get the repositories that belong to each deploy key.
+
+        Returns:
+            gitea.repo.deploy_key.ReposKeys: keys tied to repositories
+
+        """
+        with self._lock:
+            repos = list(self.repos.items())
+
+        repos_keys: gitea.repo.deploy_key.ReposKeys = defaultdict(list)
+        for name, entry in repos:
+            for fingerprint, pubkey in entry["keys"] or []:
+                repos_keys[(fingerprint, pubkey)].append(name)
+
+        return repos_keys
+
+    def get_status(self) -> dict[str, Any]:
+        """Get the status of the index.
+
+        Returns:
+            dict[str, Any]: number of repositories and refreshes, and when the
+                index was last refreshed
+
+        """
+        with self._lock:
+            return {
+                "repos": len(self.repos),
+                "refreshes": self.refreshes,
+                "last_refresh": self.last_refresh,
+            }
+
+
+class IndexRequestHandler(BaseHTTPRequestHandler):
+    """Answers queries against the index of the server.
+
+    Gitea webhooks can also be delivered to the server, to update the index
+    as soon as repositories change.
+
+    """
+
+    server: "IndexServer"
+
+    def send_json(self, status: HTTPStatus, body: Any) -> None:
+        """Send a JSON response.
+
+        Args:
+            status: HTTP status of the response
+            body: object to send as JSON
+
+        """
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        """Answer a query."""
+        url = urlsplit(self.path)
+        query = {
+            key: values[-1] for key, values in parse_qs(url.query).items()
+        }
+        index = self.server.index
+
+        match url.path:
+            case "/python":
+                if "package" not in query:
+                    self.send_json(
+                        HTTPStatus.BAD_REQUEST, {"error": "missing package"}
+                    )
+                    return
+                try:
+                    ver_restrict = package.specifier.Specifier(
+                        query.get("version") or ""
+                    )
+                except ValueError:
+                    self.send_json(
+                        HTTPStatus.BAD_REQUEST, {"error": "invalid version"}
+                    )
+                    return
+                results = index.find_dependent_repos(
+                    query["package"], ver_restrict
+                )
+                self.send_json(HTTPStatus.OK, {"results": results})
+            case "/outdated":
+                results = index.find_outdated()
+                self.send_json(HTTPStatus.OK, {"results": results})
+            case "/deploy_keys":
+                results = gitea.repo.deploy_key.dump_results(
+                    index.get_keyed_repos()
+                )
+                self.send_json(HTTPStatus.OK, {"results": results})
+            case "/status":
+                self.send_json(HTTPStatus.OK, index.get_status())
+            case _:
+                self.send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        """Receive a webhook delivery from Gitea."""
+        if urlsplit(self.path).path != "/webhook":
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            length = -1
+        if length < 0:
+            self.send_json(
+                HTTPStatus.BAD_REQUEST, {"error": "invalid Content-Length"}
+            )
+            return
+        body = self.rfile.read(length)
+
+        secret = self.server.secret
+        signature = self.headers.get("X-Gitea-Signature", "")
+        if secret and not webhook.verify_signature(secret, body, signature):
+            self.send_json(HTTPStatus.FORBIDDEN, {"error": "bad signature"})
+            return
+
+        try:
+            payload = json.loads(body)
+        except json.decoder.JSONDecodeError:
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": "invalid JSON"})
+            return
+
+        event = self.headers.get("X-Gitea-Event", "")
+        action = webhook.parse_event(event, payload)
+        if action:
+            # Gitea times out deliveries, so rescanning happens afterwards
+            self.server.apply_later(action)
+
+        self.send_json(
+            HTTPStatus.OK, {"action": action[0] if action else None}
+        )
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log requests to the log file only."""
+        config.logger.debug(format % args)
+
+
+class IndexServer(ThreadingHTTPServer):
+    """Serves queries against an index over HTTP."""
+
+    def __init__(
+        self, address: tuple[str, int], index: Index, secret: str | None = None
+    ) -> None:
+        """Initialize the server with its index.
+
+        Args:
+            address: host and port to listen on
+            index: the index to answer queries with
+            secret: optional; if provided, webhook deliveries must be signed
+                with this secret
+
+        """
+        super().__init__(address, IndexRequestHandler)
+        self.index = index
+        self.secret = secret
+        # Requests are handled in new threads, which don't inherit context
+        # variables (e.g. the Gitea instance of --profile), so webhooks are
+        # applied in the context the server was created in
+        self.context = contextvars.copy_context()
+
+    def apply(self, action: webhook.Action) -> None:
+        """Apply an action from a webhook event to the index.
+
+        Args:
+            action: the action from webhook.parse_event()
+
+        """
+        try:
+            self.index.apply(action)
+        except Exception as e:
+            config.logger.error(f"Could not apply webhook {action}: {e}")
+
+    def apply_later(self, action: webhook.Action) -> None:
+        """Apply an action from a webhook event in a background thread.
+
+        Args:
+            action: the action from webhook.parse_event()
+
+        """
+        # A context can only be entered by one thread at once
+        threading.Thread(
+            target=self.context.copy().run,
+            args=(self.apply, action),
+            daemon=True,
+        ).start()
+
+
+def refresh_periodically(
+    index: Index, interval: float, stop: threading.Event
+) -> None:
+    """Refresh the index in the background until stopped.
+
+    Args:
+        index: the index to refresh
+        interval: seconds between refreshes
+        stop: event to stop refreshing
+
+    """
+    while not stop.wait(interval):
+        full = not index.refreshes % FULL_REFRESH_EVERY
+        try:
+            index.refresh(full)
+        except Exception as e:
+            # Keep serving the last index; the next refresh may succeed
+            config.logger.error(f"Could not refresh the index: {e}")
+
+
+def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    interval: float = DEFAULT_INTERVAL,
+    workers: int = 1,
+    secret: str | None = None,
+) -> None:
+    """Serve queries from an index that's refreshed in the background.
+
+    Args:
+        host: optional; host to listen on; defaults to localhost
+        port: optional; port to listen on
+        interval: optional; seconds between refreshes
+        workers: optional; number of threads fetching from the instance
+        secret: optional; if provided, webhook deliveries must be signed with
+            this secret
+
+    """
+    index = Index(workers, get_index_file())
+    with index.stages:
+        # A persisted index only needs what changed since it was saved
+        index.refresh(full=not index.repos)
+
+        stop = threading.Event()
+        # Refreshes must request the same instance, e.g. of --profile
+        refresher = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(refresh_periodically, index, interval, stop),
+            daemon=True,
+        )
+        refresher.start()
+
+        with IndexServer((host, port), index, secret) as server:
+            config.logger.info(f"Serving on http://{host}:{port}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                config.logger.info("Stopping the server")
+            finally:
+                stop.set()
+
+
+def query(server: str, path: str, params: dict[str, str] | None = None) -> Any:
+    """Query a server started with `gitea-api serve`.
+
+    Args:
+        server: URL of the server, e.g. http://127.0.0.1:8734
+        path: path of the query, e.g. python
+        params: optional; parameters of the query
+
+    Returns:
+        Any: the response, decoded from JSON
+
+    Raises:
+        RuntimeError: server could not be reached or rejected the query
+
+    """
+    try:
+        response = requests.get(
+            f"{server.rstrip('/')}/{path}",
+            params=params,
+            timeout=CLIENT_TIMEOUT,
+        )
+    except requests.RequestException as e:
+        raise RuntimeError(f"Could not reach {server}") from e
+
+    try:
+        body = response.json()
+    except ValueError as e:
+        raise RuntimeError(f"{server} sent an invalid response") from e
+
+    if response.status_code != HTTPStatus.OK:
+        raise RuntimeError(f"{server} rejected the query: {body.get('error')}")
+
+    return body
+
+
+def list_dependent_repos(
+    server: str,
+    pkg: str,
+    ver_restrict: package.specifier.Specifier = package.specifier.ANY_VERSION,
+    output: Path | None = None,
+) -> None:
+    """List repositories dependent on given `pkg`, using a server.
+
+    Args:
+        server: URL of the server
+        pkg: a third party package
+        ver_restrict: optional; a specifier to restrict listings
+        output: optional; if provided, write results to this JSON file
+            instead of listing them
+
+    """
+    params = {"package": pkg}
+    if ver_restrict:
+        params["version"] = str(ver_restrict)
+    dependents = query(server, "python", params)["results"]
+
+    if output:
+        package.python.dump_dependent_repos(
+            dependents, pkg, ver_restrict, output
+        )
+    else:
+        package.python.list_found_repos(dependents, ver_restrict)
+
+
+def get_keyed_repos(server: str, output: Path | None = None) -> None:
+    """Get the deploy keys for all repositories, using a server.
+
+    Args:
+        server: URL of the server
+        output: optional; if provided, write results to this JSON file
+            instead of listing them
+
+    """
+    results = query(server, "deploy_keys")["results"]
+    repos_keys = gitea.repo.deploy_key.load_keyed_repos(results)
+
+    if output:
+        gitea.repo.deploy_key.dump_keyed_repos(repos_keys, output)
+    else:
+        gitea.repo.deploy_key.list_keyed_repos(repos_keys)
+
+
+def list_outdated_repos(
+    server: str, output: Path | None = None, mirror: Path | None = None
+) -> None:
+    """List repositories using older versions of packages, using a server.
+
+    Args:
+        server: URL of the server
+        output: optional; if provided, write results to this JSON file
+            instead of listing them
+        mirror: optional; path to a local package index mirror to compare
+            against
+
+    """
+    get_latest = package.mirror.Mirror(mirror).get_latest if mirror else None
+    histograms = query(server, "outdated")["results"]
+
+    if output:
+        package.outdated.dump_outdated(histograms, output, mirror=mirror)
+    else:
+        package.outdated.list_outdated(histograms, get_latest)
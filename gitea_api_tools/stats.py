@@ -0,0 +1,69 @@
+import threading
+
+from . import config
+
+
+# Statistics are grouped by section (e.g. a pipeline or a cache), and each
+# section maps a name to a value. They're shown at the end of a run when
+# `gitea-api --stats` is used.
+Section = dict[str, str | int | float]
+
+_sections: dict[str, Section] = {}
+_lock = threading.Lock()
+
+
+def record(section: str, name: str, value: str | int | float) -> None:
+    """Record a statistic, replacing any previous value.
+
+    Args:
+        section: the section the statistic belongs to
+        name: name of the statistic
+        value: value of the statistic
+
+    """
+    with _lock:
+        _sections.setdefault(section, {})[name] = value
+
+
+def increment(section: str, name: str, amount: int = 1) -> None:
+    """Increment a counting statistic.
+
+    Args:
+        section: the section the statistic belongs to
+        name: name of the statistic
+        amount: optional; the amount to increment by; defaults to 1
+
+    """
+    with _lock:
+        values = _sections.setdefault(section, {})
+        values[name] = int(values.get(name, 0)) + amount
+
+
+def get(section: str) -> Section:
+    """Get a copy of the statistics in a section.
+
+    Args:
+        section: the section of statistics
+
+    Returns:
+        Section: statistics in the section; empty if none were recorded
+
+    """
+    with _lock:
+        return dict(_sections.get(section, {}))
+
+
+def log_stats() -> None:
+    """Log all recorded statistics."""
+    with _lock:
+        sections = {name: dict(values) for name, values in _sections.items()}
+
+    if not sections:
+        config.logger.info("No statistics were recorded")
+        return
+
+    for section, values in sections.items():
+        lines = "\n".join(
+            f"    {name}: {value}" for name, value in values.items()
+        )
+        config.logger.info(f"{section}:\n{lines}")
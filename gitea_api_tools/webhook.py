@@ -0,0 +1,98 @@
+import hashlib
+import hmac
+from typing import Any, TypeAlias
+
+from . import package
+
+
+# An action on the index, from a webhook event: what to do, the full
+# repository name, and when the repository was updated
+Action: TypeAlias = tuple[str, str, str | None]
+
+RESCAN = "rescan"
+REMOVE = "remove"
+TOUCH = "touch"
+
+
+def verify_signature(secret: str, body: bytes, signature: str) -> bool:
+    """Verify the signature Gitea sends with each webhook delivery.
+
+    Args:
+        secret: the secret configured for the webhook
+        body: raw body of the delivery
+        signature: value of the X-Gitea-Signature header
+
+    Returns:
+        bool: True if the body was signed with the secret; False otherwise
+
+    """
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def get_touched_files(payload: dict[str, Any]) -> set[str] | None:
+    """Get the files touched by the commits of a push.
+
+    Args:
+        payload: payload of a push event
+
+    Returns:
+        set[str] | None: paths of added, removed and modified files; None if
+            the payload doesn't list them (e.g. too many commits)
+
+    """
+    commits = payload.get("commits")
+    if not commits:
+        return None
+
+    touched: set[str] = set()
+    for commit in commits:
+        for change in ("added", "removed", "modified"):
+            files = commit.get(change)
+            if files is None:
+                return None
+            touched.update(files)
+
+    return touched
+
+
+def parse_event(event: str, payload: dict[str, Any]) -> Action | None:
+    """Decide what to do with the index for a webhook event.
+
+    Only pushes to the default branch that touch a Python package file are
+    rescanned; other pushes only record that the repository was updated, so
+    the next incremental refresh skips it. Deploy keys are rescanned along
+    with package files.
+
+    Args:
+        event: value of the X-Gitea-Event header
+        payload: payload of the event
+
+    Returns:
+        Action | None: the action on the index; None if nothing needs to be
+            done
+
+    """
+    repository = payload.get("repository")
+    if not isinstance(repository, dict) or "full_name" not in repository:
+        return None
+
+    u_repo = repository["full_name"]
+    updated = repository.get("updated_at")
+
+    match event, payload.get("action"):
+        case "repository", "deleted":
+            return (REMOVE, u_repo, None)
+        case "repository", "created":
+            return (RESCAN, u_repo, updated)
+        case "push", _:
+            default_branch = repository.get("default_branch")
+            if payload.get("ref") != f"refs/heads/{default_branch}":
+                return None
+            touched = get_touched_files(payload)
+            pkg_files = set(package.manifests.get_files())
+            if touched is None or touched & pkg_files:
+                return (RESCAN, u_repo, updated)
+            return (TOUCH, u_repo, updated)
+
+    return None
@@ -0,0 +1,40 @@
+import unittest
+
+from benchmarks import generate
+from benchmarks import run
+from gitea_api_tools.gitea import api
+from gitea_api_tools.package import python
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Tests for the inputs and baselines of the benchmarks."""
+
+    def test_generate(self) -> None:
+        """Test that generated package files parse to every package."""
+        packages = dict(generate.get_packages(50))
+        poetry_lock = generate.generate_poetry_lock(50)
+        expected = [
+            ("poetry.lock", python.process_poetry_lock(poetry_lock)),
+            (
+                "requirements.txt",
+                python.process_requirements_txt(
+                    generate.generate_requirements_txt(50)
+                ),
+            ),
+            (
+                "response",
+                python.process_poetry_lock(
+                    api.decode(generate.generate_response(poetry_lock))
+                ),
+            ),
+        ]
+        for name, requirements in expected:
+            with self.subTest(name=name):
+                self.assertEqual(requirements, packages)
+
+    def test_get_slowdowns(self) -> None:
+        """Test that only benchmarks slower past the threshold fail."""
+        timings = {"fast": 1.0, "slow": 2.0, "new": 5.0}
+        baselines = {"fast": 0.9, "slow": 1.0}
+        self.assertEqual(run.get_slowdowns(timings, baselines), {"slow": 2.0})
+        self.assertEqual(run.get_slowdowns(timings, baselines, 2.5), {})
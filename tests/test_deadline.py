@@ -0,0 +1,84 @@
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from gitea_api_tools import config
+from gitea_api_tools import deadline
+from gitea_api_tools import gitea
+from gitea_api_tools import pipeline
+
+
+class TestDeadline(unittest.TestCase):
+    """Tests for cutting scans short at a deadline."""
+
+    def setUp(self) -> None:
+        """Start a deadline, removing it after each test."""
+        deadline.start(60)
+        self.addCleanup(deadline.start, None)
+
+    def expire(self) -> None:
+        """Make the deadline pass now."""
+        deadline._current.get().deadline = time.monotonic()
+
+    def test_no_deadline(self) -> None:
+        """Test that nothing expires without a deadline."""
+        deadline.start(None)
+        self.assertIsNone(deadline.remaining())
+        self.assertFalse(deadline.expired())
+
+    def test_pipeline(self) -> None:
+        """Test that items left at the deadline are skipped, not processed."""
+
+        def fetch(n: int) -> list[int]:
+            if n == 2:
+                # The deadline passes while the item is being processed
+                self.expire()
+                raise deadline.Expired
+            if n > 2:
+                self.fail(f"{n} was processed after the deadline")
+            return [n]
+
+        scan = pipeline.Pipeline("test", [pipeline.Stage("fetch", fetch)])
+        self.assertEqual(list(scan.run(range(5))), [0, 1])
+        self.assertEqual(deadline.get_skipped(), ["2", "3", "4"])
+
+    def test_errors_before_deadline(self) -> None:
+        """Test that errors still stop scans before the deadline."""
+
+        def fetch(n: int) -> list[int]:
+            raise ValueError(n)
+
+        scan = pipeline.Pipeline("test", [pipeline.Stage("fetch", fetch)])
+        with self.assertRaises(ValueError):
+            list(scan.run(range(3)))
+        self.assertEqual(deadline.get_skipped(), [])
+
+    def test_send_request(self) -> None:
+        """Test that no requests are sent after the deadline."""
+        self.expire()
+        get = mock.Mock()
+        client = gitea.client.GiteaClient.connect("http://gitea", "token")
+        with (
+            gitea.instance.use(client),
+            mock.patch.object(requests.Session, "get", get),
+        ):
+            with self.assertRaises(deadline.Expired):
+                gitea.api.send_request("repos/search")
+        get.assert_not_called()
+
+    def test_report(self) -> None:
+        """Test that skipped repositories are listed."""
+        for n in range(deadline.MAX_LISTED + 2):
+            deadline.skip(f"u/r{n:03}")
+
+        with self.assertLogs(config.logger, "WARNING") as logs:
+            deadline.report()
+        self.assertIn("52 repo(s) were skipped", logs.output[0])
+        self.assertIn("u/r000", logs.output[1])
+        self.assertIn("and 2 more", logs.output[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
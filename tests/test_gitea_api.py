@@ -0,0 +1,52 @@
+import json
+import unittest
+from base64 import b64encode
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+
+from gitea_api_tools import gitea
+
+
+class TestApi(unittest.TestCase):
+    """Tests for requesting and parsing responses of the API."""
+
+    def test_get_json(self) -> None:
+        """Test that JSON is parsed from bytes, and errors are ValueError."""
+        bodies = [
+            (b'{"id": 1, "login": "caf\\u00e9"}', {"id": 1, "login": "café"}),
+            ('["café"]'.encode(), ["café"]),
+            (b"<html>", None),
+        ]
+        for body, parsed in bodies:
+            response = SimpleNamespace(
+                status_code=200, encoding="utf-8", content=body
+            )
+            client = gitea.client.GiteaClient.connect("", "token")
+            with (
+                self.subTest(body=body),
+                gitea.instance.use(client),
+                mock.patch.object(
+                    requests.Session, "get", return_value=response
+                ),
+            ):
+                if parsed is None:
+                    with self.assertRaises(ValueError):
+                        gitea.api.get_json("user")
+                else:
+                    self.assertEqual(gitea.api.get_json("user"), parsed)
+
+    def test_decode(self) -> None:
+        """Test that file responses are decoded from bytes or strings."""
+        response = json.dumps(
+            {
+                "encoding": "base64",
+                "content": b64encode("requests==2.31.0\n".encode()).decode(),
+            }
+        )
+        for undecoded in [response, response.encode()]:
+            with self.subTest(type=type(undecoded).__name__):
+                self.assertEqual(
+                    gitea.api.decode(undecoded), "requests==2.31.0"
+                )
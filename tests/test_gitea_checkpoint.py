@@ -0,0 +1,123 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from gitea_api_tools import gitea
+from gitea_api_tools import package
+
+
+def make_records(updated: str) -> list[gitea.records.RepoRecord]:
+    """Make records of three repositories, all updated at the same time."""
+    return [
+        gitea.records.RepoRecord({"full_name": name, "updated_at": updated})
+        for name in ("u/a", "u/b", "u/c")
+    ]
+
+
+class TestCheckpoint(unittest.TestCase):
+    """Tests for resuming interrupted scans."""
+
+    def setUp(self) -> None:
+        """Write checkpoints to a temporary directory."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.file = Path(tmp.name) / "test.json"
+
+    def interrupt(self) -> None:
+        """Scan two of three repositories before failing."""
+        checkpoint = gitea.checkpoint.Checkpoint(self.file)
+        pending, finished = checkpoint.split(make_records("t1"))
+        self.assertEqual(len(pending), 3)
+        self.assertEqual(finished, {})
+
+        with self.assertRaises(RuntimeError), checkpoint:
+            checkpoint.add("u/a", {"requests": "2.0.0"})
+            checkpoint.add("u/b")
+            raise RuntimeError("token expired")
+
+    def test_resume(self) -> None:
+        """Test that finished repositories are reused by resumed scans."""
+        self.interrupt()
+        with self.file.open() as f:
+            self.assertEqual(len(json.load(f)["repos"]), 2)
+
+        checkpoint = gitea.checkpoint.Checkpoint(self.file, resume=True)
+        pending, finished = checkpoint.split(make_records("t1"))
+        self.assertEqual([record.full_name for record in pending], ["u/c"])
+        self.assertEqual(finished, {"u/a": {"requests": "2.0.0"}, "u/b": None})
+
+        with checkpoint:
+            checkpoint.add("u/c")
+        self.assertFalse(self.file.exists())
+
+    def test_no_resume(self) -> None:
+        """Test that checkpoints are ignored without resuming."""
+        self.interrupt()
+        checkpoint = gitea.checkpoint.Checkpoint(self.file)
+        pending, _ = checkpoint.split(make_records("t1"))
+        self.assertEqual(len(pending), 3)
+
+    def test_updated(self) -> None:
+        """Test that repositories updated since then are rescanned."""
+        self.interrupt()
+        checkpoint = gitea.checkpoint.Checkpoint(self.file, resume=True)
+        pending, finished = checkpoint.split(make_records("t2"))
+        self.assertEqual(len(pending), 3)
+        self.assertEqual(finished, {})
+
+    def test_periodic_save(self) -> None:
+        """Test that checkpoints are saved while scanning."""
+        checkpoint = gitea.checkpoint.Checkpoint(self.file, interval=0)
+        checkpoint.split(make_records("t1"))
+        checkpoint.add("u/a")
+        self.assertTrue(self.file.exists())
+
+    def test_access_denied(self) -> None:
+        """Test that a refused token stops the scan with a checkpoint."""
+
+        def get_content(url: str) -> bytes:
+            if url.startswith("repos/u/a/"):
+                return b'{"Go": 100}'
+            raise gitea.api.AccessDenied(url, 401)
+
+        records = [
+            gitea.records.RepoRecord(
+                {"full_name": name, "updated_at": "t1", "language": "Go"}
+            )
+            for name in ("u/a", "u/b")
+        ]
+        with (
+            mock.patch.object(
+                gitea.checkpoint, "CHECKPOINT_DIR", self.file.parent
+            ),
+            mock.patch.object(gitea.api, "get_content", get_content),
+            mock.patch.object(gitea.api, "list_records", lambda *_: records),
+            mock.patch.object(
+                package.cache.RequirementsCache, "save", lambda _: None
+            ),
+        ):
+            with self.assertRaises(gitea.api.AccessDenied):
+                list(package.python.get_all_requirements())
+            with gitea.checkpoint.get_file("python").open() as f:
+                self.assertEqual(list(json.load(f)["repos"]), ["u/a"])
+
+    def test_get_file(self) -> None:
+        """Test that scans of other shards have their own checkpoints."""
+        with mock.patch.object(
+            gitea.checkpoint, "CHECKPOINT_DIR", self.file.parent
+        ):
+            files = {
+                gitea.checkpoint.get_file("python"),
+                gitea.checkpoint.get_file("python", (1, 2)),
+                gitea.checkpoint.get_file("python", (2, 2)),
+                gitea.checkpoint.get_file("deploy_keys"),
+            }
+        self.assertEqual(len(files), 4)
+        for file in files:
+            self.assertEqual(file.parent, self.file.parent)
+
+
+if __name__ == "__main__":
+    unittest.main()
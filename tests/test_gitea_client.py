@@ -0,0 +1,145 @@
+import contextvars
+import gc
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+
+from gitea_api_tools import deadline
+from gitea_api_tools import gitea
+
+
+def fake_get(
+    session: requests.Session, url: str, timeout: float | None = None
+) -> SimpleNamespace:
+    """Answer the search with a repository on the host, or the user."""
+    if "repos/search" in url:
+        host = url.split("/")[2]
+        page = int(url.rsplit("=", 1)[1])
+        data = [{"full_name": f"{host}/repo"}] if page == 1 else []
+        content = {"data": data}
+    else:
+        content = {"id": len(session.headers["Authorization"])}
+    return SimpleNamespace(
+        status_code=200,
+        encoding="utf-8",
+        content=json.dumps(content).encode(),
+        headers={},
+    )
+
+
+class TestClient(unittest.TestCase):
+    """Tests for clients of several instances, used from any thread."""
+
+    def setUp(self) -> None:
+        """Fake the instances."""
+        patches = [
+            mock.patch.object(requests.Session, "get", fake_get),
+            mock.patch("time.sleep"),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_sessions(self) -> None:
+        """Test that each thread has its own session, until it exits."""
+        client = gitea.client.GiteaClient.connect("http://a", "token")
+        sessions = []
+        closed = mock.Mock()
+
+        def get_session() -> None:
+            sessions.append(client.session)
+
+        with mock.patch.object(requests.adapters.HTTPAdapter, "close", closed):
+            threads = [threading.Thread(target=get_session) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len({id(session) for session in sessions}), 3)
+            self.assertIs(client.session, client.session)
+
+            # Sessions of threads that exited are closed and released
+            sessions.clear()
+            gc.collect()
+            self.assertEqual(closed.call_count, 3)
+            self.assertEqual(len(client._sessions), 1)
+
+        session = client.session
+        client.close()
+        self.assertIsNot(client.session, session)
+
+    def test_clients(self) -> None:
+        """Test that each client requests its own instance."""
+        a = gitea.client.GiteaClient.connect("http://a", "short")
+        b = gitea.client.GiteaClient.connect("http://b", "longer-token")
+        with a, b:
+            self.assertEqual(a.get_id(), len("token short"))
+            self.assertEqual(b.get_id(), len("token longer-token"))
+            self.assertEqual(a.list_repos(), [["a", "repo"]])
+        # The clients were only used for their own calls
+        self.assertIsNone(gitea.instance.current())
+
+    def test_isolation(self) -> None:
+        """Test that clients and their callers don't share filters."""
+        client = gitea.client.GiteaClient.connect("http://a", "token")
+        excluding = gitea.client.GiteaClient.connect(
+            "http://a",
+            "token",
+            repo_filter=gitea.filters.RepoFilter(exclude=["a/*"]),
+        )
+
+        def caller() -> None:
+            gitea.api.use_filter(gitea.filters.RepoFilter(include=["b/*"]))
+            deadline.start(0)
+            self.assertEqual(client.list_repos(), [["a", "repo"]])
+            self.assertEqual(excluding.list_repos(), [])
+            caller_filter = gitea.api.get_filter()
+            self.assertTrue(caller_filter and caller_filter.match_name("b/c"))
+
+        contextvars.copy_context().run(caller)
+
+    def test_limiter(self) -> None:
+        """Test that clients share limiters by host, unless given one."""
+        limiter = gitea.concurrency.Limiter("own", maximum=2)
+        self.assertIs(
+            gitea.client.GiteaClient.connect("http://c", "1").limiter,
+            gitea.client.GiteaClient.connect("http://c", "2").limiter,
+        )
+        self.assertIs(
+            gitea.client.GiteaClient.connect("http://c", "3", limiter).limiter,
+            limiter,
+        )
+
+    def test_cache(self) -> None:
+        """Test that responses are reused until they expire."""
+        cached = gitea.client.GiteaClient.connect("http://a", "token")
+        uncached = gitea.client.GiteaClient.connect(
+            "http://a", "token", cache_ttl=0
+        )
+        with mock.patch.object(
+            requests.Session, "get", side_effect=fake_get, autospec=True
+        ) as get:
+            for client in (cached, uncached, cached, uncached):
+                self.assertEqual(client.get_id(), len("token token"))
+            self.assertEqual(get.call_count, 3)
+
+            with mock.patch("time.monotonic", return_value=float("inf")):
+                cached.get_id()
+            self.assertEqual(get.call_count, 4)
+
+            cached.close()
+            cached.get_id()
+            self.assertEqual(get.call_count, 5)
+
+    def test_no_token(self) -> None:
+        """Test that a configuration without a token is refused."""
+        with self.assertRaises(ValueError):
+            gitea.instance.Instance(SimpleNamespace(host_api="http://d"))
+
+
+if __name__ == "__main__":
+    unittest.main()
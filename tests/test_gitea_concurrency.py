@@ -0,0 +1,161 @@
+import random
+import threading
+import time
+import unittest
+from unittest import mock
+
+from gitea_api_tools import gitea
+from gitea_api_tools import stats
+
+
+concurrency = gitea.concurrency
+
+
+class TestConcurrency(unittest.TestCase):
+    """Tests for adapting requests in flight to the load of an instance."""
+
+    def fill(self, limiter: concurrency.Limiter) -> int:
+        """Send as many requests as the limiter allows.
+
+        Returns:
+            int: number of requests sent
+
+        """
+        sent = 0
+        while limiter.acquire(timeout=0):
+            sent += 1
+        return sent
+
+    def test_is_overloaded(self) -> None:
+        """Test that throttled and failed responses mean overload."""
+        for status_code, overloaded in [
+            (200, False),
+            (404, False),
+            (429, True),
+            (500, True),
+            (503, True),
+        ]:
+            with self.subTest(status_code=status_code):
+                self.assertEqual(
+                    concurrency.is_overloaded(status_code), overloaded
+                )
+
+    def test_increase(self) -> None:
+        """Test that the limit grows by one per round while saturated."""
+        limiter = concurrency.Limiter("increase", initial=2)
+        self.assertEqual(self.fill(limiter), 2)
+        limiter.release(0.01)
+        limiter.release(0.01)
+        self.assertAlmostEqual(limiter.limit, 2.9)
+
+        self.assertEqual(self.fill(limiter), 2)
+        limiter.release(0.01)
+        limiter.release(0.01)
+        self.assertEqual(int(limiter.limit), 3)
+        self.assertEqual(stats.get(limiter.section)["limit"], 3)
+
+        # Without requests held back, there's no reason to grow
+        limiter.acquire()
+        limiter.release(0.01)
+        self.assertEqual(int(limiter.limit), 3)
+
+    def test_decrease_on_errors(self) -> None:
+        """Test that the limit shrinks once per round of overloads."""
+        limiter = concurrency.Limiter("errors", initial=10)
+        self.assertEqual(self.fill(limiter), 10)
+        for _ in range(10):
+            limiter.release(0.01, overloaded=True)
+
+        self.assertEqual(int(limiter.limit), 7)
+        self.assertEqual(stats.get(limiter.section)["decreases (errors)"], 1)
+
+    def test_decrease_on_latency(self) -> None:
+        """Test that the limit shrinks when latency rises past baseline."""
+        limiter = concurrency.Limiter("latency", initial=10, maximum=10)
+        window = concurrency.WINDOW
+        slow = concurrency.SLOW_WINDOWS * window
+        for latency in [0.01] * 2 * window + [0.05] * slow:
+            limiter.acquire()
+            limiter.release(latency)
+
+        self.assertEqual(int(limiter.limit), 7)
+        self.assertEqual(stats.get(limiter.section)["decreases (latency)"], 1)
+
+    def test_tail_latency(self) -> None:
+        """Test that latency not rising with load doesn't hold back limits."""
+        workers = 32
+        limiter = concurrency.Limiter("tail", maximum=workers)
+        rng = random.Random(0)
+        clock = [0.0]
+        limits = []
+        with mock.patch.object(
+            concurrency.time, "monotonic", lambda: clock[0]
+        ):
+            for _ in range(200):
+                # Lognormal latencies: mostly fast, with a long tail
+                latencies = [
+                    0.01 * rng.lognormvariate(0, 0.9)
+                    for _ in range(self.fill(limiter))
+                ]
+                clock[0] += max(latencies)
+                for latency in latencies:
+                    limiter.release(latency)
+                limits.append(limiter.limit)
+
+        self.assertEqual(round(max(limits)), workers)
+        recent = limits[len(limits) // 2 :]
+        self.assertGreater(sum(recent) / len(recent), 0.9 * workers)
+        self.assertLessEqual(
+            stats.get(limiter.section).get("decreases (latency)", 0), 5
+        )
+
+    def test_bounds(self) -> None:
+        """Test that the limit stays within its bounds."""
+        limiter = concurrency.Limiter("bounds", initial=2, maximum=2)
+        for _ in range(10):
+            self.fill(limiter)
+            limiter.release(0.01)
+            limiter.release(0.01, overloaded=True)
+        self.assertGreaterEqual(limiter.limit, concurrency.MIN_LIMIT)
+        self.assertLessEqual(limiter.limit, 2)
+
+    def test_waiting_order(self) -> None:
+        """Test that waiting requests are sent in the order they came."""
+        limiter = concurrency.Limiter("order", initial=1, maximum=1)
+        limiter.acquire()
+        sent = []
+
+        def send(n: int) -> None:
+            limiter.acquire()
+            sent.append(n)
+            limiter.release(0.01)
+
+        threads = []
+        for n in range(5):
+            thread = threading.Thread(target=send, args=(n,))
+            thread.start()
+            threads.append(thread)
+            while len(limiter._waiting) <= n:
+                time.sleep(0.001)
+        # Timed out requests give up their place
+        self.assertFalse(limiter.acquire(timeout=0.01))
+
+        limiter.release(0.01)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(sent, list(range(5)))
+
+    def test_get_limiter(self) -> None:
+        """Test that each instance has its own limiter."""
+        self.assertIs(
+            concurrency.get_limiter("http://a"),
+            concurrency.get_limiter("http://a"),
+        )
+        self.assertIsNot(
+            concurrency.get_limiter("http://a"),
+            concurrency.get_limiter("http://b"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
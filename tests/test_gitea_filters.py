@@ -0,0 +1,76 @@
+import unittest
+
+from gitea_api_tools import gitea
+
+
+class TestFilters(unittest.TestCase):
+    """Tests for narrowing down repositories before scanning them."""
+
+    def test_match_name(self) -> None:
+        """Test that include and exclude globs are combined."""
+        repo_filter = gitea.filters.RepoFilter(
+            include=["org/*", "user/tool-*"], exclude=["*-archive"]
+        )
+        expected = [
+            ("org/api", True),
+            ("org/api-archive", False),
+            ("user/tool-cli", True),
+            ("user/site", False),
+        ]
+        for full_name, matched in expected:
+            with self.subTest(full_name=full_name):
+                self.assertEqual(repo_filter.match_name(full_name), matched)
+
+    def test_get_params(self) -> None:
+        """Test that only filters in use are sent with the search."""
+        expected = [
+            (gitea.filters.RepoFilter(), {}),
+            (
+                gitea.filters.RepoFilter(
+                    query="python", topic=True, mode="source", private=False
+                ),
+                {
+                    "q": "python",
+                    "topic": "true",
+                    "mode": "source",
+                    "is_private": "false",
+                },
+            ),
+            (
+                gitea.filters.RepoFilter(exclusive=True, template=False),
+                {"exclusive": "true", "template": "false"},
+            ),
+        ]
+        for repo_filter, params in expected:
+            with self.subTest(params=params):
+                self.assertEqual(repo_filter.get_params(), params)
+
+    def test_match(self) -> None:
+        """Test that records are checked against every filter offline."""
+        record = {
+            "full_name": "org/python-lib",
+            "fork": True,
+            "mirror": False,
+            "private": True,
+            "template": False,
+            "topics": ["python"],
+            "owner": {"id": 2},
+        }
+        expected = [
+            (gitea.filters.RepoFilter(query="lib"), True),
+            (gitea.filters.RepoFilter(query="org"), False),
+            (gitea.filters.RepoFilter(query="python", topic=True), True),
+            (gitea.filters.RepoFilter(mode="source"), False),
+            (gitea.filters.RepoFilter(mode="fork"), True),
+            (gitea.filters.RepoFilter(private=False), False),
+            (gitea.filters.RepoFilter(exclusive=True), False),
+            (gitea.filters.RepoFilter(exclude=["org/*"]), False),
+        ]
+        for i, (repo_filter, matched) in enumerate(expected):
+            with self.subTest(filter=i):
+                self.assertEqual(repo_filter.match(record, uid=1), matched)
+
+    def test_invalid_mode(self) -> None:
+        """Test that unknown modes are rejected."""
+        with self.assertRaises(ValueError):
+            gitea.filters.RepoFilter(mode="archived")
@@ -0,0 +1,108 @@
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from gitea_api_tools import config
+from gitea_api_tools import gitea
+
+
+def git(*args: str, cwd: Path) -> None:
+    """Run a git command quietly."""
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@unittest.skipUnless(shutil.which("git"), "git is not installed")
+class TestLocalMirrors(unittest.TestCase):
+    """Tests for reading repositories from bare mirrors on disk."""
+
+    def setUp(self) -> None:
+        """Mirror a repository with a package file and a directory."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+
+        work = root / "work"
+        (work / "src").mkdir(parents=True)
+        (work / "requirements.txt").write_text("requests==2.31.0\n")
+        (work / "src" / "main.py").write_text("")
+        git("init", "-q", cwd=work)
+        git("add", ".", cwd=work)
+        git(
+            "-c",
+            "user.name=test",
+            "-c",
+            "user.email=test@example.com",
+            "commit",
+            "-qm",
+            "Initial commit",
+            cwd=work,
+        )
+        mirrors = root / "mirrors"
+        (mirrors / "user").mkdir(parents=True)
+        git("clone", "-q", "--bare", str(work), "user/repo.git", cwd=mirrors)
+        git("init", "-q", "--bare", "user/empty.git", cwd=mirrors)
+
+        self.mirrors = gitea.local.LocalMirrors(mirrors, max_processes=1)
+        self.addCleanup(self.mirrors.close)
+
+    def test_get_root_files(self) -> None:
+        """Test that only regular files are listed, and fallbacks signaled."""
+        expected = [
+            ("user/repo", ["requirements.txt"]),
+            ("User/Repo", ["requirements.txt"]),
+            ("user/empty", []),
+        ]
+        for u_repo, files in expected:
+            with self.subTest(u_repo=u_repo):
+                root_files = self.mirrors.get_root_files(u_repo)
+                self.assertEqual(sorted(root_files or {}), files)
+        self.assertIsNone(self.mirrors.get_root_files("user/other"))
+
+    def test_get_file_response(self) -> None:
+        """Test that files are read like responses from the API."""
+        response = self.mirrors.get_file_response(
+            "user/repo", "requirements.txt"
+        )
+        self.assertEqual(gitea.api.decode(response or ""), "requests==2.31.0")
+        with self.assertRaises(FileNotFoundError):
+            self.mirrors.get_file_response("user/repo", "poetry.lock")
+        with self.assertRaises(FileNotFoundError):
+            self.mirrors.get_file_response("user/repo", "src")
+
+    def test_fallback(self) -> None:
+        """Test that repositories without mirrors are requested instead."""
+        with (
+            mock.patch.object(
+                config.user_config,
+                "git_mirrors",
+                str(self.mirrors.root),
+                create=True,
+            ),
+            mock.patch.object(
+                gitea.api, "get_content", return_value=b"[]"
+            ) as get_content,
+        ):
+            self.assertIn(
+                "requirements.txt", gitea.repo.get_root_files("user/repo")
+            )
+            self.assertEqual(gitea.repo.get_root_files("user/other"), {})
+
+        get_content.assert_called_once_with("repos/user/other/contents")
+
+    def test_git_unavailable(self) -> None:
+        """Test that mirrors are skipped, not empty, if git can't start."""
+        with (
+            mock.patch.object(
+                subprocess, "Popen", side_effect=FileNotFoundError("git")
+            ),
+            self.assertLogs(config.logger, "WARNING") as logs,
+        ):
+            self.assertIsNone(self.mirrors.get_root_files("user/empty"))
+            self.assertIsNone(self.mirrors.find("user/repo"))
+            self.assertIsNone(self.mirrors.get_root_files("user/repo"))
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("git could not be started", logs.output[0])
@@ -0,0 +1,87 @@
+import json
+import unittest
+from unittest import mock
+
+from gitea_api_tools import gitea
+from gitea_api_tools import package
+
+
+RECORDS = [
+    {
+        "full_name": "u/python",
+        "language": "Python",
+        "permissions": {"admin": True},
+    },
+    {"full_name": "u/empty", "empty": True, "permissions": {"admin": True}},
+    {
+        "full_name": "u/other",
+        "language": "Go",
+        "permissions": {"admin": False},
+    },
+    {"full_name": "u/old"},
+]
+
+
+class TestRecords(unittest.TestCase):
+    """Tests for skipping requests using the metadata of repositories."""
+
+    def setUp(self) -> None:
+        """Fake the instance, keeping the URLs that were requested."""
+        self.urls: list[str] = []
+
+        def get_content(url: str) -> bytes:
+            self.urls.append(url)
+            if url.endswith("/languages"):
+                return json.dumps({"Python": 100}).encode()
+            elif url.endswith("/contents"):
+                return json.dumps(
+                    [{"name": "requirements.txt", "sha": "0", "type": "file"}]
+                ).encode()
+            elif url.endswith("/keys"):
+                return b"[]"
+            raise FileNotFoundError(url)
+
+        records = [gitea.records.RepoRecord(record) for record in RECORDS]
+        patches = [
+            mock.patch.object(gitea.api, "get_content", get_content),
+            mock.patch.object(gitea.api, "list_records", lambda *_: records),
+            mock.patch.object(
+                package.cache.RequirementsCache, "save", lambda _: None
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_checks(self) -> None:
+        """Test that only fields in records skip repositories."""
+        expected = [
+            ("u/python", True, True),
+            ("u/empty", False, True),
+            ("u/other", True, False),
+            ("u/old", True, True),
+        ]
+        for record, (full_name, has_files, can_read_keys) in zip(
+            RECORDS, expected
+        ):
+            with self.subTest(full_name=full_name):
+                repo_record = gitea.records.RepoRecord(record)
+                self.assertEqual(repo_record.has_files(), has_files)
+                self.assertEqual(repo_record.can_read_keys(), can_read_keys)
+
+    def test_python(self) -> None:
+        """Test that empty repositories and Python languages are skipped."""
+        list(package.python.get_all_requirements())
+        self.assertEqual(
+            sorted(url for url in self.urls if "/contents" not in url),
+            ["repos/u/old/languages", "repos/u/other/languages"],
+        )
+        self.assertNotIn("repos/u/empty/contents", self.urls)
+
+    def test_deploy_keys(self) -> None:
+        """Test that keys are only requested from repositories with access."""
+        gitea.repo.deploy_key.find_keyed_repos()
+        self.assertEqual(
+            sorted(self.urls),
+            ["repos/u/empty/keys", "repos/u/old/keys", "repos/u/python/keys"],
+        )
@@ -0,0 +1,31 @@
+import argparse
+import unittest
+
+from gitea_api_tools.gitea import shard
+
+
+class TestShard(unittest.TestCase):
+    """Tests splitting repositories into shards."""
+
+    repos = [f"user/repo{i}" for i in range(100)]
+
+    def test_parse(self) -> None:
+        """Test that valid shards are parsed and invalid ones rejected."""
+        self.assertEqual(shard.parse("1/4"), (1, 4))
+        self.assertEqual(shard.parse("4/4"), (4, 4))
+        for invalid in ("0/4", "5/4", "1/0", "1", "a/b", "1/2/3"):
+            with self.subTest(shard=invalid):
+                with self.assertRaises(argparse.ArgumentTypeError):
+                    shard.parse(invalid)
+
+    def test_shards_are_disjoint_and_complete(self) -> None:
+        """Test that every repository belongs to exactly one shard."""
+        for count in (1, 2, 3, 7):
+            with self.subTest(count=count):
+                for repo in self.repos:
+                    owners = [
+                        index
+                        for index in range(1, count + 1)
+                        if shard.in_shard(repo, (index, count))
+                    ]
+                    self.assertEqual(len(owners), 1)
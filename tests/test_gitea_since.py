@@ -0,0 +1,78 @@
+import argparse
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from gitea_api_tools import config
+from gitea_api_tools import gitea
+
+
+class TestSince(unittest.TestCase):
+    """Tests for scanning only recently updated repositories."""
+
+    def test_parse(self) -> None:
+        """Test that timestamps and durations are parsed."""
+        now = datetime.now(timezone.utc)
+        expected = [
+            (
+                "2024-05-20T10:00:00Z",
+                datetime(2024, 5, 20, 10, tzinfo=timezone.utc),
+            ),
+            (
+                "2024-05-20T12:00:00+02:00",
+                datetime(2024, 5, 20, 10, tzinfo=timezone.utc),
+            ),
+            ("1h30m", now - timedelta(hours=1, minutes=30)),
+            ("2d", now - timedelta(days=2)),
+        ]
+        for text, cutoff in expected:
+            with self.subTest(text=text):
+                parsed = gitea.since.parse(text)
+                self.assertLess(abs(parsed - cutoff), timedelta(seconds=5))
+
+        for text in ["yesterday", "1y", ""]:
+            with self.subTest(text=text):
+                with self.assertRaises(argparse.ArgumentTypeError):
+                    gitea.since.parse(text)
+
+    def test_search_repos(self) -> None:
+        """Test that paging stops at the first repository that's too old."""
+        pages = [
+            [
+                {"full_name": "u/a", "updated_at": "2024-05-20T12:00:00Z"},
+                {"full_name": "u/b", "updated_at": "2024-05-20T11:00:00Z"},
+            ],
+            [
+                {"full_name": "u/c", "updated_at": "2024-05-20T10:30:00Z"},
+                {"full_name": "u/d", "updated_at": "2024-05-19T09:00:00Z"},
+            ],
+            [{"full_name": "u/e", "updated_at": "2024-05-18T09:00:00Z"}],
+        ]
+        urls = []
+
+        def send_request(url: str) -> SimpleNamespace:
+            urls.append(url)
+            page = int(url.rsplit("page=", 1)[1])
+            data = pages[page - 1] if page <= len(pages) else []
+            return SimpleNamespace(
+                content=json.dumps({"data": data}).encode(),
+                headers={"X-Total-Count": "5"},
+            )
+
+        since = gitea.since.parse("2024-05-20T10:00:00Z")
+        with (
+            mock.patch.object(gitea.api, "send_request", send_request),
+            mock.patch.object(
+                config.user_config, "search_archived_repos", False, create=True
+            ),
+            mock.patch("time.sleep"),
+        ):
+            repos = gitea.api.search_repos(since=since)
+
+        self.assertEqual(
+            [repo["full_name"] for repo in repos], ["u/a", "u/b", "u/c"]
+        )
+        self.assertEqual(len(urls), 2)
+        self.assertIn("sort=updated&order=desc", urls[0])
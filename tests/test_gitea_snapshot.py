@@ -0,0 +1,87 @@
+import json
+import tempfile
+import unittest
+from base64 import b64decode
+from pathlib import Path
+
+from gitea_api_tools.gitea.snapshot import Snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+    """Tests answering API requests from a snapshot."""
+
+    def setUp(self) -> None:
+        """Create a snapshot with one scanned repository."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = Path(self.tmp.name) / "snapshot.db"
+
+        writer = Snapshot(self.file, writable=True)
+        writer.add_repo({"full_name": "user/repo"}, '{"Python": 100}')
+        writer.add_repo({"full_name": "user/empty"}, None)
+        writer.add_root_files("user/repo", {"requirements.txt": "abc"})
+        writer.add_manifest(
+            "user/repo",
+            "requirements.txt",
+            "abc",
+            "idna==3.7",
+            {"idna": "3.7"},
+        )
+        writer.add_keys("user/repo", [{"fingerprint": "fp", "key": "ssh k"}])
+        writer.close()
+
+        self.snapshot = Snapshot(self.file)
+
+    def tearDown(self) -> None:
+        """Remove the snapshot."""
+        self.snapshot.close()
+        self.tmp.cleanup()
+
+    def test_failed_export(self) -> None:
+        """Test that a failed export keeps the previous snapshot."""
+        with self.assertRaises(RuntimeError):
+            with Snapshot(self.file, writable=True) as writer:
+                writer.add_repo({"full_name": "user/other"}, None)
+                raise RuntimeError("network dropped")
+
+        search = json.loads(self.snapshot.get_response("repos/search"))
+        names = [repo["full_name"] for repo in search["data"]]
+        self.assertEqual(names, ["user/empty", "user/repo"])
+        self.assertEqual(list(self.file.parent.iterdir()), [self.file])
+
+    def test_search(self) -> None:
+        """Test that all repositories are on the first page only."""
+        first = json.loads(self.snapshot.get_response("repos/search?page=1"))
+        second = json.loads(self.snapshot.get_response("repos/search?page=2"))
+        names = [repo["full_name"] for repo in first["data"]]
+        self.assertEqual(names, ["user/empty", "user/repo"])
+        self.assertEqual(second["data"], [])
+
+    def test_repo_endpoints(self) -> None:
+        """Test that stored endpoints respond like the instance."""
+        languages = self.snapshot.get_response("repos/user/repo/languages")
+        self.assertIn("Python", languages)
+
+        root = json.loads(
+            self.snapshot.get_response("repos/user/repo/contents")
+        )
+        self.assertEqual(root[0]["sha"], "abc")
+
+        url = "repos/user/repo/contents/requirements.txt"
+        contents = json.loads(self.snapshot.get_response(url))
+        self.assertEqual(b64decode(contents["content"]).decode(), "idna==3.7")
+
+        keys = json.loads(self.snapshot.get_response("repos/user/repo/keys"))
+        self.assertEqual(keys[0]["fingerprint"], "fp")
+
+    def test_missing_endpoints(self) -> None:
+        """Test that missing data is reported like a missing file."""
+        for url in (
+            "repos/user/empty/languages",
+            "repos/user/empty/contents",
+            "repos/user/empty/keys",
+            "repos/user/repo/contents/poetry.lock",
+            "user",
+        ):
+            with self.subTest(url=url):
+                with self.assertRaises(FileNotFoundError):
+                    self.snapshot.get_response(url)
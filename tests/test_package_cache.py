@@ -0,0 +1,76 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from gitea_api_tools import package
+
+
+class TestRequirementsCache(unittest.TestCase):
+    """Tests for the cache of parsed requirements."""
+
+    def setUp(self) -> None:
+        """Write the cache to a temporary directory."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.file = Path(tmp.name) / "cache.json"
+
+    def test_roundtrip(self) -> None:
+        """Test that saved requirements are found by file name and SHA."""
+        cache = package.cache.RequirementsCache(self.file)
+        cache.put("requirements.txt", "0", {"requests": "2.0.0"})
+        cache.save()
+
+        cache = package.cache.RequirementsCache(self.file)
+        self.assertIn(("requirements.txt", "0"), cache)
+        self.assertNotIn(("poetry.lock", "0"), cache)
+        self.assertEqual(
+            cache.get("requirements.txt", "0"), {"requests": "2.0.0"}
+        )
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_parser_version(self) -> None:
+        """Test that requirements of older parsers aren't used."""
+        cache = package.cache.RequirementsCache(self.file)
+        cache.put("requirements.txt", "0", {"requests": "2.0.0"})
+        cache.save()
+
+        manifest = package.manifests._registry["requirements.txt"]
+        with mock.patch.object(manifest, "version", manifest.version + 1):
+            cache = package.cache.RequirementsCache(self.file)
+            self.assertNotIn(("requirements.txt", "0"), cache)
+
+    def test_old_format(self) -> None:
+        """Test that caches keyed by SHA only are started over."""
+        with self.file.open("w") as f:
+            json.dump({"0": {"requests": "2.0.0"}}, fp=f)
+        cache = package.cache.RequirementsCache(self.file)
+        self.assertEqual(cache.entries, {})
+
+    def test_prune(self) -> None:
+        """Test that old entries, then the least recently used, are dropped."""
+        cache = package.cache.RequirementsCache(self.file)
+        today = package.cache.get_day()
+        for day in range(4):
+            key = package.cache.get_key("requirements.txt", str(day))
+            cache.entries[key] = {"requirements": {}, "used": today - day}
+        stale = package.cache.get_key("requirements.txt", "stale")
+        cache.entries[stale] = {
+            "requirements": {},
+            "used": today - package.cache.MAX_AGE - 1,
+        }
+
+        with mock.patch.object(package.cache, "MAX_ENTRIES", 2):
+            cache.prune()
+        self.assertEqual(
+            sorted(cache.entries),
+            [
+                package.cache.get_key("requirements.txt", "0"),
+                package.cache.get_key("requirements.txt", "1"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
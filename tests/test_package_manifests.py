@@ -0,0 +1,108 @@
+import json
+import unittest
+
+from gitea_api_tools import package
+
+
+UV_LOCK = """\
+version = 1
+
+[[package]]
+name = "project"
+source = { editable = "." }
+
+[[package]]
+name = "requests"
+version = "2.31.0"
+"""
+
+PIPFILE_LOCK = json.dumps(
+    {
+        "_meta": {"hash": {"sha256": "0"}},
+        "default": {
+            "requests": {"version": "==2.31.0"},
+            "local": {"path": "."},
+        },
+        "develop": {"pytest": {"version": "==8.0.0"}},
+    }
+)
+
+PYPROJECT_TOML = """\
+[project]
+name = "project"
+dependencies = [
+    "requests[socks] == 2.31.0",
+    "urllib3>=2",
+    "tomli==2.0.1; python_version < '3.11'",
+]
+
+[project.optional-dependencies]
+test = ["pytest==8.0.0"]
+"""
+
+REQUIREMENTS_TXT = """\
+#
+# This file is autogenerated by pip-compile
+#
+requests==2.31.0 \\
+    --hash=sha256:0000 \\
+    --hash=sha256:1111
+    # via -r requirements.in
+
+urllib3==2.2.1 --hash=sha256:2222
+"""
+
+
+class TestManifests(unittest.TestCase):
+    """Tests for the registry of Python package files."""
+
+    def test_select(self) -> None:
+        """Test that the package file with the highest priority is chosen."""
+        expected = [
+            (["README.md"], None),
+            (["requirements.txt", "pyproject.toml"], "requirements.txt"),
+            (["requirements.txt", "poetry.lock"], "poetry.lock"),
+            (["Pipfile.lock", "uv.lock"], "uv.lock"),
+        ]
+        for files, selected in expected:
+            with self.subTest(files=files):
+                self.assertEqual(package.manifests.select(files), selected)
+
+    def test_parse(self) -> None:
+        """Test that registered package files are parsed."""
+        expected = [
+            ("uv.lock", UV_LOCK, {"requests": "2.31.0"}),
+            ("pdm.lock", UV_LOCK, {"requests": "2.31.0"}),
+            (
+                "requirements.txt",
+                REQUIREMENTS_TXT,
+                {"requests": "2.31.0", "urllib3": "2.2.1"},
+            ),
+            (
+                "Pipfile.lock",
+                PIPFILE_LOCK,
+                {"requests": "2.31.0", "pytest": "8.0.0"},
+            ),
+            (
+                "pyproject.toml",
+                PYPROJECT_TOML,
+                {"requests": "2.31.0", "tomli": "2.0.1", "pytest": "8.0.0"},
+            ),
+        ]
+        for file, contents, requirements in expected:
+            with self.subTest(file=file):
+                self.assertEqual(
+                    package.manifests.parse(file, contents), requirements
+                )
+
+    def test_parse_invalid(self) -> None:
+        """Test that unknown or malformed package files raise ValueError."""
+        for file, contents in [
+            ("setup.py", ""),
+            ("poetry.lock", "[tool]"),
+            ("requirements.txt", "requests>=2"),
+            ("Pipfile.lock", "{"),
+        ]:
+            with self.subTest(file=file):
+                with self.assertRaises(ValueError):
+                    package.manifests.parse(file, contents)
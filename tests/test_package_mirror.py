@@ -0,0 +1,75 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from gitea_api_tools import package
+
+
+DISTS = [
+    "typing_extensions-4.7.1.tar.gz",
+    "typing_extensions-4.8.0-py3-none-any.whl",
+    "typing_extensions-4.9.0rc1.tar.gz",
+]
+SIMPLE_PAGE = "".join(
+    f'<a href="../../packages/{dist}">{dist}</a>\n' for dist in DISTS
+)
+
+
+class TestMirror(unittest.TestCase):
+    """Tests for looking up latest versions in a local mirror."""
+
+    def setUp(self) -> None:
+        """Create a mirror with a JSON directory and a simple index."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        (self.root / "json").mkdir()
+        with (self.root / "json" / "Requests").open("w") as f:
+            json.dump({"info": {"version": "2.31.0"}}, f)
+        page = self.root / "simple" / "typing-extensions" / "index.html"
+        page.parent.mkdir(parents=True)
+        page.write_text(SIMPLE_PAGE)
+        self.cache_file = self.root / "cache.json"
+
+    def tearDown(self) -> None:
+        """Remove the mirror."""
+        self.directory.cleanup()
+
+    def test_get_latest(self) -> None:
+        """Test that names are normalized and pre-releases are skipped."""
+        mirror = package.mirror.Mirror(self.root, self.cache_file)
+        expected = [
+            ("requests", "2.31.0"),
+            ("Typing_Extensions", "4.8.0"),
+            ("idna", None),
+        ]
+        for pkg, latest in expected:
+            with self.subTest(package=pkg):
+                self.assertEqual(mirror.get_latest(pkg), latest)
+
+    def test_cache(self) -> None:
+        """Test that the cached table is used until the mirror changes."""
+        package.mirror.Mirror(self.root, self.cache_file)
+        with self.cache_file.open() as f:
+            cached = json.load(f)
+        cached["latest"]["requests"] = "0.1"
+        with self.cache_file.open("w") as f:
+            json.dump(cached, f)
+        mirror = package.mirror.Mirror(self.root, self.cache_file)
+        self.assertEqual(mirror.get_latest("requests"), "0.1")
+
+        (self.root / "json" / "idna").write_text('{"info": {"version": "3"}}')
+        mirror = package.mirror.Mirror(self.root, self.cache_file)
+        self.assertEqual(mirror.get_latest("requests"), "2.31.0")
+        self.assertEqual(mirror.get_latest("idna"), "3")
+
+    def test_dump(self) -> None:
+        """Test that versions are read from a bulk metadata dump."""
+        dump = self.root / "dump.json"
+        dump.write_text(
+            json.dumps(
+                {"Requests": "2.31.0", "idna": {"info": {"version": "3.7"}}}
+            )
+        )
+        mirror = package.mirror.Mirror(dump, None)
+        self.assertEqual(mirror.latest, {"requests": "2.31.0", "idna": "3.7"})
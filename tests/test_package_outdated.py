@@ -0,0 +1,68 @@
+import unittest
+
+from gitea_api_tools import package
+
+
+class TestOutdated(unittest.TestCase):
+    """Tests for the fleet-wide outdated report."""
+
+    def test_get_lagging(self) -> None:
+        """Test that versions behind the newest are grouped with repos."""
+        histograms: package.outdated.Histograms = {}
+        package.outdated.add_requirements(
+            histograms, "u/a", {"requests": "2.31.0", "idna": "3.7"}
+        )
+        package.outdated.add_requirements(
+            histograms, "u/b", {"requests": "2.28.1", "idna": "3.7"}
+        )
+        package.outdated.add_requirements(
+            histograms, "u/c", {"requests": "2.28.1", "idna": "3.7.0"}
+        )
+        package.outdated.merge_histograms(
+            histograms, {"requests": {"2.9": ["u/d"], "3.0.0rc1": ["u/e"]}}
+        )
+        expected = [
+            (
+                "requests",
+                ("2.31.0", {"2.9": ["u/d"], "2.28.1": ["u/b", "u/c"]}),
+            ),
+            ("idna", ("3.7", {})),
+        ]
+        for pkg, lagging in expected:
+            with self.subTest(package=pkg):
+                self.assertEqual(
+                    package.outdated.get_lagging(histograms[pkg]), lagging
+                )
+
+    def test_get_lagging_incomparable(self) -> None:
+        """Test that histograms without comparable versions are skipped."""
+        self.assertIsNone(
+            package.outdated.get_lagging({"1.0.0rc1": ["u/a"], "dev": ["u/b"]})
+        )
+
+    def test_get_lagging_suffix(self) -> None:
+        """Test that letter suffixes are ordered after their version."""
+        histogram = {
+            "1.0": ["u/a"],
+            "1.0a": ["u/b"],
+            "1.0b": ["u/c"],
+            "1.0.1": ["u/d"],
+        }
+        self.assertEqual(package.outdated.get_newest(histogram), "1.0.1")
+        self.assertEqual(
+            package.outdated.get_lagging(histogram),
+            ("1.0.1", {"1.0": ["u/a"], "1.0a": ["u/b"], "1.0b": ["u/c"]}),
+        )
+        self.assertEqual(
+            package.outdated.get_lagging(histogram, "1.0a"),
+            ("1.0a", {"1.0": ["u/a"]}),
+        )
+
+    def test_get_lagging_zero(self) -> None:
+        """Test that versions like 0 and 0.0.0 are still lagging."""
+        self.assertEqual(
+            package.outdated.get_lagging(
+                {"1.0": ["u/a"], "0": ["u/b"], "0.0.0": ["u/c"]}
+            ),
+            ("1.0", {"0": ["u/b"], "0.0.0": ["u/c"]}),
+        )
@@ -0,0 +1,77 @@
+import unittest
+
+from gitea_api_tools.package.specifier import Specifier, VersionIndex
+
+
+USAGES = [
+    ("user/a", "1.4.2"),
+    ("user/b", "1.5"),
+    ("user/c", "2.0.0"),
+    ("user/d", "2.5"),
+    ("user/e", "2.31.1"),
+    ("user/f", "2.0.0rc1"),
+]
+
+
+class TestSpecifier(unittest.TestCase):
+    """Tests for version ranges from PEP 440 specifiers."""
+
+    def test_match(self) -> None:
+        """Test that versions are matched against compiled intervals."""
+        expected = [
+            ("", ["1.0", "3"], []),
+            ("2.31.1", ["2.31.0", "1"], ["2.31.1", "2.32"]),
+            (">=2.0,<2.31.1", ["2", "2.0.0", "2.31.0"], ["1.9", "2.31.1"]),
+            ("!=1.4.*", ["1.3.9", "1.5.0"], ["1.4", "1.4.0", "1.4.9"]),
+            ("~=1.4.5", ["1.4.5", "1.4.10"], ["1.4.4", "1.5"]),
+            ("~=2.2", ["2.2", "2.9"], ["2.1", "3.0"]),
+            ("==2.0, !=2.0.0", [], ["2", "2.0.0"]),
+        ]
+        for text, matched, unmatched in expected:
+            spec = Specifier(text)
+            for ver in matched + unmatched:
+                with self.subTest(spec=text, ver=ver):
+                    self.assertEqual(spec.match(ver), ver in matched)
+
+    def test_suffix(self) -> None:
+        """Test that letter suffixes sort after their version, not as parts."""
+        expected = [
+            ("==1.0", ["1.0", "1.0.0"], ["1.0a", "1.0b"]),
+            (">1.0", ["1.0a", "1.0b", "1.0.1"], ["1.0"]),
+            ("<1.0.1", ["1.0", "1.0a", "1.0b"], ["1.0.1", "1.0.1a"]),
+            ("==1.0b", ["1.0b", "1.0.0b"], ["1.0.1", "1.0a"]),
+            ("==1.0.*", ["1.0a", "1.0.9b"], ["1.1", "0.9z"]),
+        ]
+        for text, matched, unmatched in expected:
+            spec = Specifier(text)
+            for ver in matched + unmatched:
+                with self.subTest(spec=text, ver=ver):
+                    self.assertEqual(spec.match(ver), ver in matched)
+
+        usages = [("u/a", "1.0"), ("u/b", "1.0b"), ("u/c", "1.0.1")]
+        self.assertEqual(
+            VersionIndex(usages).find(Specifier("==1.0b")), {"u/b": "1.0b"}
+        )
+
+    def test_invalid(self) -> None:
+        """Test that malformed specifiers raise ValueError."""
+        for text in ["<2.*", "2.0, 3.0", "~=2", ">=2.0rc1", "=>2", "==1.0a.*"]:
+            with self.subTest(spec=text):
+                with self.assertRaises(ValueError):
+                    Specifier(text)
+
+    def test_version_index(self) -> None:
+        """Test that finding versions in an index matches each version."""
+        index = VersionIndex(USAGES)
+        self.assertEqual(index.find(), dict(USAGES))
+        for text in ["2.5", ">=2.0,<2.31.1", "!=1.4.*,!=2.5", ">2.31.1"]:
+            spec = Specifier(text)
+            with self.subTest(spec=text):
+                self.assertEqual(
+                    index.find(spec),
+                    {
+                        repo: ver
+                        for repo, ver in USAGES[:-1]
+                        if spec.match(ver)
+                    },
+                )
@@ -0,0 +1,64 @@
+import unittest
+
+from gitea_api_tools.pipeline import Pipeline, Stage
+
+
+def double(item: int) -> list[int]:
+    return [item * 2]
+
+
+def keep_even(item: int) -> list[int]:
+    return [item] if item % 2 == 0 else []
+
+
+def repeat(item: int) -> list[int]:
+    return [item, item]
+
+
+def fail_on_five(item: int) -> list[int]:
+    if item == 5:
+        raise RuntimeError("five")
+    return [item]
+
+
+class TestPipeline(unittest.TestCase):
+    """Tests the staged pipeline engine."""
+
+    items = range(100)
+
+    def test_all_items_flow_through(self) -> None:
+        """Test that every item goes through every stage exactly once."""
+        for workers in (1, 4):
+            with self.subTest(workers=workers):
+                pipeline = Pipeline(
+                    "test",
+                    [
+                        Stage("double", double, workers),
+                        Stage("keep", keep_even, workers, queue_size=1),
+                    ],
+                )
+                results = sorted(pipeline.run(self.items))
+                self.assertEqual(results, [i * 2 for i in self.items])
+
+    def test_filter_and_fan_out(self) -> None:
+        """Test that stages can drop items or produce several per item."""
+        pipeline = Pipeline(
+            "test", [Stage("keep", keep_even, 3), Stage("repeat", repeat, 2)]
+        )
+        results = sorted(pipeline.run(self.items))
+        expected = sorted(2 * [i for i in self.items if i % 2 == 0])
+        self.assertEqual(results, expected)
+
+    def test_counters(self) -> None:
+        """Test that each stage counts the items going in and out."""
+        keep = Stage("keep", keep_even, 2)
+        rep = Stage("repeat", repeat)
+        list(Pipeline("test", [keep, rep]).run(self.items))
+        self.assertEqual((keep.items_in, keep.items_out), (100, 50))
+        self.assertEqual((rep.items_in, rep.items_out), (50, 100))
+
+    def test_errors_stop_the_pipeline(self) -> None:
+        """Test that an error in a stage is raised by run()."""
+        pipeline = Pipeline("test", [Stage("fail", fail_on_five, 2)])
+        with self.assertRaises(RuntimeError):
+            list(pipeline.run(self.items))
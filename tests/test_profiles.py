@@ -0,0 +1,115 @@
+import argparse
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+
+from gitea_api_tools import config
+from gitea_api_tools import gitea
+from gitea_api_tools import merge
+from gitea_api_tools import pipeline
+from gitea_api_tools import profiles
+
+
+PROFILES = {
+    "a": {"host": "https://a.example.com", "token": "token-a"},
+    "b": {"host": "https://b.example.com", "token": "token-b", "workers": 3},
+}
+
+
+def fake_get(
+    session: requests.Session, url: str, timeout: float | None = None
+) -> SimpleNamespace:
+    """Answer a request with the token and URL it was sent with."""
+    token = session.headers["Authorization"]
+    return SimpleNamespace(
+        status_code=200, encoding="utf-8", content=f"{token} {url}".encode()
+    )
+
+
+class TestProfiles(unittest.TestCase):
+    """Tests for scanning several instances at once."""
+
+    def setUp(self) -> None:
+        """Configure the profiles and fake the instances."""
+        patches = [
+            mock.patch.object(
+                config.user_config, "profiles", PROFILES, create=True
+            ),
+            mock.patch.object(requests.Session, "get", fake_get),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_scan_profiles(self) -> None:
+        """Test that each instance is requested with its own session."""
+
+        def scan(workers: int) -> tuple[int, list[str]]:
+            fetch = pipeline.Pipeline(
+                "test",
+                [
+                    pipeline.Stage(
+                        "fetch",
+                        lambda url: [gitea.api.get_response(url)],
+                        workers,
+                    )
+                ],
+            )
+            return (workers, sorted(fetch.run(["user", "version"])))
+
+        results, failed = profiles.scan_profiles(["a", "b"], scan)
+        self.assertEqual(failed, [])
+        expected = {
+            "a": (1, "token token-a https://a.example.com/api/v1"),
+            "b": (3, "token token-b https://b.example.com/api/v1"),
+        }
+        for profile, (workers, prefix) in expected.items():
+            with self.subTest(profile=profile):
+                self.assertEqual(results[profile][0], workers)
+                self.assertEqual(
+                    results[profile][1],
+                    [f"{prefix}/user", f"{prefix}/version"],
+                )
+
+    def test_workers_option(self) -> None:
+        """Test that -w wins over the workers of profiles."""
+        results, _ = profiles.scan_profiles(["a", "b"], lambda n: n, workers=2)
+        self.assertEqual(results, {"a": 2, "b": 2})
+
+    def test_failed_profile(self) -> None:
+        """Test that a failed instance is reported and recorded in output."""
+
+        def find_keyed_repos(*_: object) -> dict[tuple[str, str], list[str]]:
+            if "b.example.com" in gitea.api.get_config().host:
+                raise gitea.api.AccessDenied("repos/search", 401)
+            return {("fp", "ssh-ed25519 AAAA"): ["u/r"]}
+
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            mock.patch.object(
+                gitea.repo.deploy_key, "find_keyed_repos", find_keyed_repos
+            ),
+        ):
+            output = Path(directory) / "keys.json"
+            with self.assertRaises(profiles.ProfilesFailed) as raised:
+                profiles.get_keyed_repos(["a", "b"], output=output)
+            with output.open() as f:
+                dumped = json.load(f)
+            with self.assertLogs(config.logger, "WARNING") as logs:
+                merge.merge_results([output])
+
+        self.assertEqual(raised.exception.failed, ["b"])
+        self.assertEqual(dumped["failed_profiles"], ["b"])
+        self.assertEqual(dumped["results"][0]["repos"], ["a:u/r"])
+        self.assertIn("missing profiles that failed: b", logs.output[0])
+
+    def test_parse_profiles(self) -> None:
+        """Test that profiles are split and checked."""
+        self.assertEqual(gitea.instance.parse_profiles("b, a,b"), ["b", "a"])
+        with self.assertRaises(argparse.ArgumentTypeError):
+            gitea.instance.parse_profiles("a,c")
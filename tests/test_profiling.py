@@ -0,0 +1,59 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from gitea_api_tools import profiling
+
+
+@profiling.phase("test")
+def work(n: int) -> int:
+    """Sum up to `n`, as a phase."""
+    return sum(range(n))
+
+
+class TestProfiling(unittest.TestCase):
+    """Tests for profiling scans."""
+
+    def setUp(self) -> None:
+        """Write reports to a temporary directory."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.report_dir = Path(tmp.name)
+        patch = mock.patch.object(profiling, "REPORT_DIR", self.report_dir)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_phase(self) -> None:
+        """Test that phases are only timed while profiling."""
+        work(10)
+        with profiling.profile(cpu=True):
+            self.assertEqual(work(10), 45)
+            thread = threading.Thread(target=work, args=(10,))
+            thread.start()
+            thread.join()
+        work(10)
+
+        self.assertRegex(profiling.format_phases(), r"^test: 2 call\(s\), ")
+
+    def test_reports(self) -> None:
+        """Test that a report is written for each kind of profiling."""
+        expected = [
+            ({}, []),
+            ({"cpu": True}, ["profile-*.pstats", "profile-*.txt"]),
+            ({"memory": True}, ["memory-*.txt"]),
+        ]
+        for kinds, patterns in expected:
+            with self.subTest(kinds=kinds):
+                for file in self.report_dir.iterdir():
+                    file.unlink()
+                with profiling.profile(**kinds):
+                    work(1000)
+                for pattern in patterns:
+                    self.assertEqual(
+                        len(list(self.report_dir.glob(pattern))), 1
+                    )
+                self.assertEqual(
+                    len(list(self.report_dir.iterdir())), len(patterns)
+                )
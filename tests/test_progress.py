@@ -0,0 +1,66 @@
+import io
+import unittest
+from unittest import mock
+
+from gitea_api_tools import pipeline
+from gitea_api_tools import progress
+
+
+class Terminal(io.StringIO):
+    """A stream that claims to be a terminal."""
+
+    def isatty(self) -> bool:
+        """Pretend to be a terminal."""
+        return True
+
+
+class TestProgress(unittest.TestCase):
+    """Tests for showing the progress of scans."""
+
+    def test_not_a_terminal(self) -> None:
+        """Test that nothing is shown when the stream isn't a terminal."""
+        stream = io.StringIO()
+        with progress.report(stream=stream):
+            self.assertIsNone(progress._reporter)
+            progress.add_total(2)
+            progress.advance()
+        self.assertEqual(stream.getvalue(), "")
+
+        with progress.report(False, Terminal()):
+            self.assertIsNone(progress._reporter)
+
+    def test_format(self) -> None:
+        """Test that the progress line shows what's known so far."""
+        reporter = progress.Reporter(Terminal())
+        with mock.patch("time.monotonic", return_value=reporter.started):
+            self.assertEqual(reporter.format(), "0 repos")
+
+        reporter.add_total(40)
+        reporter.advance(10)
+        reporter.count("requests", 30)
+        reporter.count("cache hits", 3)
+        reporter.count("cache misses")
+        with mock.patch("time.monotonic", return_value=reporter.started + 15):
+            self.assertEqual(
+                reporter.format(),
+                "10/40 repos (25%) | 2.0 req/s | cache 75% hits | ETA 0m45s",
+            )
+
+    def test_report(self) -> None:
+        """Test that scans advance the progress line."""
+        stream = Terminal()
+        scan = pipeline.Pipeline(
+            "test", [pipeline.Stage("double", lambda n: [n, n], 2)]
+        )
+        with progress.report(stream=stream):
+            progress.add_total(3)
+            self.assertEqual(len(list(scan.run(range(3)))), 6)
+        self.assertIsNone(progress._reporter)
+
+        lines = stream.getvalue().split(progress.CLEAR_LINE)
+        self.assertTrue(lines[-1].startswith("3/3 repos (100%)"))
+        self.assertTrue(lines[-1].endswith("\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import base64
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from gitea_api_tools import gitea
+from gitea_api_tools import merge
+from gitea_api_tools import package
+from gitea_api_tools import scan
+
+
+RECORDS = [
+    {"full_name": "u/python", "permissions": {"admin": True}},
+    {"full_name": "u/go", "permissions": {"admin": True}},
+    {"full_name": "u/empty", "empty": True, "permissions": {"admin": True}},
+]
+LANGUAGES = {
+    "u/python": {"Python": 100},
+    "u/go": {"Go": 100},
+}
+REQUIREMENTS = "requests==2.0.0\n"
+
+
+class TestScan(unittest.TestCase):
+    """Tests for running several reports in one pass."""
+
+    def setUp(self) -> None:
+        """Fake the instance, keeping the URLs that were requested."""
+        self.urls: list[str] = []
+
+        def get_content(url: str) -> bytes:
+            self.urls.append(url)
+            u_repo = "/".join(url.split("/")[1:3])
+            if url.endswith("/languages"):
+                return json.dumps(LANGUAGES[u_repo]).encode()
+            elif url.endswith("/contents"):
+                return json.dumps(
+                    [{"name": "requirements.txt", "sha": "0", "type": "file"}]
+                ).encode()
+            elif url.endswith("/requirements.txt"):
+                return json.dumps(
+                    {
+                        "content": base64.b64encode(
+                            REQUIREMENTS.encode()
+                        ).decode(),
+                        "encoding": "base64",
+                    }
+                ).encode()
+            elif url.endswith("/keys"):
+                return json.dumps(
+                    [{"fingerprint": "fp", "key": "ssh-ed25519 AAAA key"}]
+                ).encode()
+            raise FileNotFoundError(url)
+
+        records = [gitea.records.RepoRecord(record) for record in RECORDS]
+        patches = [
+            mock.patch.object(gitea.api, "get_content", get_content),
+            mock.patch.object(gitea.api, "list_records", lambda *_: records),
+            mock.patch.object(
+                package.cache.RequirementsCache, "save", lambda _: None
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_one_pass(self) -> None:
+        """Test that every report is filled, requesting each URL once."""
+        collectors = scan.Collectors(
+            deploy_keys=True, python="requests", outdated=True, languages=True
+        )
+        results = scan.collect(collectors)
+
+        self.assertEqual(len(self.urls), len(set(self.urls)))
+        self.assertNotIn("repos/u/go/contents", self.urls)
+        self.assertNotIn("repos/u/empty/languages", self.urls)
+        self.assertEqual(
+            sorted(results.repos_keys[("fp", "ssh-ed25519 AAAA")]),
+            ["u/empty", "u/go", "u/python"],
+        )
+        self.assertEqual(results.languages, LANGUAGES)
+        self.assertEqual(
+            [u_repo for u_repo, _ in results.usages], ["u/python"]
+        )
+        self.assertIn("requests", results.histograms)
+
+    def test_only_requested(self) -> None:
+        """Test that reports not collected cost no requests."""
+        scan.collect(scan.Collectors(languages=True))
+        self.assertEqual(
+            sorted(self.urls),
+            ["repos/u/go/languages", "repos/u/python/languages"],
+        )
+
+    def test_output(self) -> None:
+        """Test that each report is written to a mergeable file."""
+        collectors = scan.Collectors(deploy_keys=True, languages=True)
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / "results"
+            scan.scan_repos(collectors, output=output)
+            self.assertEqual(
+                sorted(file.name for file in output.iterdir()),
+                [
+                    scan.OUTPUT_FILES["deploy_keys"],
+                    scan.OUTPUT_FILES["languages"],
+                ],
+            )
+            with self.assertLogs(gitea.api.config.logger, "INFO") as logs:
+                merge.merge_results([output / scan.OUTPUT_FILES["languages"]])
+        self.assertTrue(any("Python: 1 repos" in line for line in logs.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
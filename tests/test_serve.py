@@ -0,0 +1,133 @@
+import http.client
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+from gitea_api_tools import gitea
+from gitea_api_tools import package
+from gitea_api_tools import serve
+from gitea_api_tools import webhook
+
+
+class TestServe(unittest.TestCase):
+    """Tests for serving queries from an index."""
+
+    def test_webhook_context(self) -> None:
+        """Test that webhooks request the instance the server started with."""
+        client = gitea.client.GiteaClient.connect("http://a", "token")
+        applied = threading.Event()
+        instances = []
+
+        def apply(action: webhook.Action) -> None:
+            instances.append(gitea.instance.current())
+            applied.set()
+
+        index = serve.Index(file=None)
+        with gitea.instance.use(client):
+            server = serve.IndexServer(("127.0.0.1", 0), index)
+        self.addCleanup(server.server_close)
+
+        action = (webhook.RESCAN, "user/repo", None)
+        with mock.patch.object(index, "apply", apply):
+            # Like a request handler, without the server's context
+            threading.Thread(target=server.apply_later, args=(action,)).start()
+            self.assertTrue(applied.wait(5))
+        self.assertEqual(instances, [client])
+
+    def test_refresh_keeps_webhooks(self) -> None:
+        """Test that a refresh doesn't undo webhooks applied meanwhile."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        file = Path(tmp.name) / "index.json"
+        index = serve.Index(file=file)
+
+        def scan_repo(
+            record: gitea.records.RepoRecord, _: object
+        ) -> list[tuple[str, dict[str, Any]]]:
+            if record.full_name == "u/a" and record.updated == "t1":
+                # Pushed while the refresh is scanning, and created after
+                # repositories were listed
+                index.rescan("u/a", "t2")
+                index.rescan("u/new", "t2")
+            entry = {"updated": record.updated, "requirements": None}
+            return [(record.full_name, entry | {"keys": None})]
+
+        records = [
+            gitea.records.RepoRecord({"full_name": name, "updated_at": "t1"})
+            for name in ("u/a", "u/b")
+        ]
+        with (
+            mock.patch.object(serve, "scan_repo", scan_repo),
+            mock.patch.object(gitea.api, "list_records", lambda: records),
+            mock.patch.object(
+                package.cache.RequirementsCache, "save", lambda _: None
+            ),
+        ):
+            index.refresh()
+
+        updated = {
+            name: entry["updated"] for name, entry in index.repos.items()
+        }
+        self.assertEqual(updated, {"u/a": "t2", "u/b": "t1", "u/new": "t2"})
+        with file.open() as f:
+            self.assertEqual(json.load(f)["repos"], index.repos)
+        self.assertEqual(list(file.parent.iterdir()), [file])
+
+    def test_index_file(self) -> None:
+        """Test that each instance persists its own index."""
+        files = set()
+        for host in ("http://a", "http://b"):
+            client = gitea.client.GiteaClient.connect(host, "token")
+            with gitea.instance.use(client):
+                files.add(serve.get_index_file())
+                files.add(serve.get_index_file())
+        self.assertEqual(len(files), 2)
+
+    def test_rescan_stages(self) -> None:
+        """Test that webhooks reuse the stages and cache of the index."""
+        index = serve.Index(file=None)
+        used = []
+
+        def scan_repo(
+            record: gitea.records.RepoRecord,
+            stages: package.python.RequirementsStages,
+        ) -> list[tuple[str, dict[str, Any]]]:
+            used.append(stages)
+            entry = {"updated": None, "requirements": None, "keys": None}
+            return [(record.full_name, entry)]
+
+        with mock.patch.object(serve, "scan_repo", scan_repo):
+            index.rescan("u/a", None)
+            index.rescan("u/b", None)
+        self.assertEqual(used, [index.stages, index.stages])
+
+    def test_content_length(self) -> None:
+        """Test that webhooks without a valid length are rejected."""
+        server = serve.IndexServer(("127.0.0.1", 0), serve.Index(file=None))
+        self.addCleanup(server.server_close)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.shutdown)
+
+        for length in (None, "many", "-1"):
+            with self.subTest(length=length):
+                conn = http.client.HTTPConnection(*server.server_address)
+                self.addCleanup(conn.close)
+                conn.putrequest("POST", "/webhook")
+                if length is not None:
+                    conn.putheader("Content-Length", length)
+                conn.endheaders()
+                response = conn.getresponse()
+                self.assertEqual(response.status, 400)
+                self.assertEqual(
+                    json.loads(response.read()),
+                    {"error": "invalid Content-Length"},
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
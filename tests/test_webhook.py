@@ -0,0 +1,51 @@
+import hashlib
+import hmac
+import json
+import unittest
+from pathlib import Path
+
+from gitea_api_tools import webhook
+
+
+PAYLOADS = Path(__file__).parent / "payloads"
+
+
+def load(name: str) -> dict:
+    """Load a recorded webhook payload."""
+    with (PAYLOADS / f"{name}.json").open() as f:
+        return json.load(f)
+
+
+class TestWebhook(unittest.TestCase):
+    """Tests deciding what to do with recorded webhook deliveries."""
+
+    def test_parse_event(self) -> None:
+        """Test that only relevant changes cause a rescan."""
+        updated = "2024-05-20T10:15:33Z"
+        expected = [
+            ("push", "push_lockfile", (webhook.RESCAN, "user/repo", updated)),
+            ("push", "push_readme", (webhook.TOUCH, "user/repo", updated)),
+            ("push", "push_branch", None),
+            (
+                "repository",
+                "repository_deleted",
+                (webhook.REMOVE, "user/repo", None),
+            ),
+        ]
+        for event, name, action in expected:
+            with self.subTest(payload=name):
+                self.assertEqual(
+                    webhook.parse_event(event, load(name)), action
+                )
+
+    def test_unknown_events_are_ignored(self) -> None:
+        """Test that events without a repository do nothing."""
+        self.assertIsNone(webhook.parse_event("push", {}))
+        self.assertIsNone(webhook.parse_event("issues", load("push_readme")))
+
+    def test_verify_signature(self) -> None:
+        """Test that deliveries must be signed with the secret."""
+        body = (PAYLOADS / "push_lockfile.json").read_bytes()
+        signature = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+        self.assertTrue(webhook.verify_signature("secret", body, signature))
+        self.assertFalse(webhook.verify_signature("other", body, signature))